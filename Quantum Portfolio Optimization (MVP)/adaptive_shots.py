@@ -0,0 +1,183 @@
+"""
+Adaptive Shots (adaptive_shots.py)
+Its job is to spend sampler shots only where they are needed.
+
+1. During the optimization: AdaptiveShotSampler wraps a sampler and starts with few
+   shots per objective evaluation. ShotSchedule doubles them every time the optimizer
+   stops improving at the current noise level (up to the normal 'shots'); if the
+   optimizer finishes before that, it is restarted from its result with more shots.
+2. Final readout: early_stopped_readout() samples the optimal circuit in small batches
+   and stops as soon as the most frequent FEASIBLE bitstring is statistically ahead
+   of the runner-up (instead of always paying for a fixed number of shots).
+Both keep count of the shots they used.
+"""
+
+# Step 1: Import necessary tools
+import math
+import numpy as np
+from typing import Callable, Dict, List, Optional
+
+from qiskit_algorithms.optimizers import OptimizerResult
+
+from qiskit.primitives import BaseSamplerV2
+from qiskit.primitives.containers.sampler_pub import SamplerPub
+
+# Schedule defaults: starting shots, evaluations per check, relative progress that counts
+MIN_SHOTS = 128
+SHOT_WINDOW = 10
+SHOT_TOLERANCE = 0.01
+
+# Readout defaults: shots per batch, upper limit, z-score needed to stop
+READOUT_BATCH = 256
+MAX_READOUT_SHOTS = 16384
+READOUT_Z = 3.0
+
+
+class AdaptiveShotSampler(BaseSamplerV2):
+    """
+    A SamplerV2 that forwards every job to 'sampler', using 'self.shots' for pubs
+    that do not ask for a shot count themselves, and counts all shots it sends.
+    """
+
+    def __init__(self, sampler: BaseSamplerV2, shots: int):
+        self.sampler = sampler
+        self.shots = shots
+        self.shots_used = 0
+
+    def run(self, pubs, *, shots: Optional[int] = None):
+        shots = self.shots if shots is None else shots
+        for pub in pubs:
+            coerced = SamplerPub.coerce(pub, shots)
+            self.shots_used += coerced.shots * max(1, coerced.parameter_values.size)
+        return self.sampler.run(pubs, shots=shots)
+
+
+class ShotSchedule:
+    """
+    Raises the sampler's shots as the objective stabilizes. It is used as the
+    QAOA callback: after every 'window' evaluations at the current shot count, if the
+    best energy did not improve by more than 'tolerance' (relative), shots are doubled.
+    minimizer() makes sure the optimization also ENDS at 'max_shots'.
+    """
+
+    def __init__(self, sampler: AdaptiveShotSampler, max_shots: int, window: int = SHOT_WINDOW,
+                 tolerance: float = SHOT_TOLERANCE):
+        self.sampler = sampler
+        self.max_shots = max_shots
+        self.window = window
+        self.tolerance = tolerance
+        self.history: List[int] = []  # shots used for each evaluation
+        self._best_before = math.inf
+        self._best_in_window = math.inf
+        self._count = 0
+
+    def callback(self, eval_count: int, parameters: np.ndarray, value: float, metadata: Dict) -> None:
+        self.history.append(self.sampler.shots)
+        self._best_in_window = min(self._best_in_window, float(value))
+        self._count += 1
+        if self._count < self.window or self.sampler.shots >= self.max_shots:
+            return
+
+        progress = self._best_before - self._best_in_window
+        if not progress > self.tolerance * max(abs(self._best_in_window), 1e-12):
+            self.raise_shots()
+        else:
+            self._best_before = min(self._best_before, self._best_in_window)
+            self._best_in_window = math.inf
+            self._count = 0
+
+    def raise_shots(self, shots: Optional[int] = None) -> None:
+        self.sampler.shots = min(shots or 2 * self.sampler.shots, self.max_shots)
+        print(f"[Adaptive Shots]: Objective stabilized, now using {self.sampler.shots} shots.")
+        # Energies at the new noise level are not compared with the old ones
+        self._best_before = math.inf
+        self._best_in_window = math.inf
+        self._count = 0
+
+    def minimizer(self, first: Callable, refine: Callable) -> Callable:
+        """
+        A Qiskit-style minimizer (fun, x0, jac, bounds) -> OptimizerResult that runs
+        'first', and while the shots are below 'max_shots', raises them and continues
+        with 'refine' from the point reached so far. nfev counts all runs.
+        """
+        def minimize(fun: Callable, x0: np.ndarray, jac: Optional[Callable] = None, bounds=None) -> OptimizerResult:
+            result = first(fun, x0, jac, bounds)
+            nfev = result.nfev or 0
+            if self.sampler.shots < self.max_shots:
+                self.raise_shots(self.max_shots)
+                result = refine(fun, result.x, jac, bounds)
+                nfev += result.nfev or 0
+            result.nfev = nfev
+            return result
+
+        return minimize
+
+
+def separation_z(counts: Dict[str, int], is_feasible: Callable[[str], bool]) -> float:
+    """
+    How clearly the most frequent feasible bitstring is ahead of the second one:
+    z = (c1 - c2) / sqrt(c1 + c2), the normal approximation of the test "both are
+    equally likely" (given c1 + c2 draws, c1 is Binomial(c1 + c2, 1/2) under that test).
+    """
+    top = sorted((count for bits, count in counts.items() if is_feasible(bits)), reverse=True)[:2]
+    if not top:
+        return 0.0
+    c1 = top[0]
+    c2 = top[1] if len(top) > 1 else 0
+    return (c1 - c2) / math.sqrt(c1 + c2)
+
+
+def early_stopped_readout(draw: Callable[[int], Dict[str, int]], k: Optional[int] = None,
+                          batch: int = READOUT_BATCH, max_shots: int = MAX_READOUT_SHOTS,
+                          z_threshold: float = READOUT_Z) -> Dict:
+    """
+    Sample in batches with draw(shots) -> {bitstring: count} until the top feasible
+    bitstring (exactly k ones; any bitstring if k is None) is separated from the
+    runner-up by 'z_threshold', or 'max_shots' is reached.
+    Returns {"counts", "shots", "z", "separated"}.
+    """
+    if k is None:
+        is_feasible = lambda bits: True
+    else:
+        is_feasible = lambda bits: bits.count("1") == k
+
+    counts: Dict[str, int] = {}
+    shots, z = 0, 0.0
+    while shots < max_shots:
+        this_batch = min(batch, max_shots - shots)
+        for bits, count in draw(this_batch).items():
+            counts[bits] = counts.get(bits, 0) + count
+        shots += this_batch
+        z = separation_z(counts, is_feasible)
+        if z >= z_threshold:
+            break
+
+    print(f"[Adaptive Shots]: Readout used {shots} shots (separation z = {z:.2f}).")
+    return {"counts": counts, "shots": shots, "z": z, "separated": z >= z_threshold}
+
+
+# --- "Testing Block" ---
+# This code runs only when this file is executed directly.
+if __name__ == "__main__":
+
+    print("\n---------------------------------------------------------")
+    print(">>> 'adaptive_shots.py' was RUN DIRECTLY (Testing Mode) <<<")
+    print("---------------------------------------------------------")
+
+    rng = np.random.default_rng(0)
+    bitstrings = ["0011", "0101", "1001", "0111"]
+
+    def make_draw(probabilities):
+        def draw(shots: int) -> Dict[str, int]:
+            counts = rng.multinomial(shots, probabilities)
+            return {bits: int(count) for bits, count in zip(bitstrings, counts) if count}
+        return draw
+
+    # A clear winner stops after the first batch, a near tie runs to the limit
+    clear = early_stopped_readout(make_draw([0.7, 0.1, 0.1, 0.1]), k=2)
+    tie = early_stopped_readout(make_draw([0.3, 0.3, 0.1, 0.3]), k=2, max_shots=4096)
+    assert clear["separated"] and clear["shots"] == READOUT_BATCH
+    assert not tie["separated"] and tie["shots"] == 4096
+    # "0111" has 3 ones, so it never counts as the winner for k=2
+    assert math.isclose(separation_z({"0111": 100, "0011": 10}, lambda bits: bits.count("1") == 2), math.sqrt(10))
+    print("Early-stopped readout checks passed.")
@@ -0,0 +1,269 @@
+"""
+Backtest (backtest.py)
+Its job is to run the strategy walk-forward over time: at every rebalance date, estimate
+mu and Σ from the last 'window' daily returns, pick k assets, hold them (equal weight)
+until the next rebalance date, and report the portfolio path and its P&L.
+
+- mu / Σ are updated incrementally with StreamingMuSigma (data_pipeline.py): moving to
+  the next date only adds the new days and drops the expired ones.
+- Each date is warm-started: QAOA starts from the previous date's optimal angles, and
+  the previous holdings (improved by a swap local search) compete with the new pick.
+- If mu and Σ barely changed since the last solve, the date is not re-solved.
+- The rebalance dates are cut into independent segments that run in parallel.
+"""
+
+# Step 1: Import necessary tools
+import io
+import math
+import time
+import contextlib
+import numpy as np
+import pandas as pd
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, List, Optional
+
+from data_pipeline import StreamingMuSigma
+from decomposition import swap_local_search
+
+# Per-worker state, filled in by _init_worker (one copy per process)
+_WORKER: Dict = {}
+
+
+def _init_worker(prices: np.ndarray, tickers: List[str], options: Dict) -> None:
+    # Runs once in every worker process: the price matrix is sent once, not with every segment
+    _WORKER["prices"] = prices
+    _WORKER["tickers"] = tickers
+    _WORKER["options"] = options
+
+
+# --- Work done inside the workers ---
+
+def input_change(mu: pd.Series, sigma: pd.DataFrame, previous_mu: pd.Series, previous_sigma: pd.DataFrame) -> float:
+    """
+    Relative change of the inputs: the larger of |Δmu| / |mu| and |ΔΣ|_F / |Σ|_F.
+    """
+    mu_change = np.linalg.norm(mu.values - previous_mu.values) / max(np.linalg.norm(previous_mu.values), 1e-12)
+    sigma_change = (np.linalg.norm(sigma.values - previous_sigma.values)
+                    / max(np.linalg.norm(previous_sigma.values), 1e-12))
+    return float(max(mu_change, sigma_change))
+
+
+def _solve_date(mu: pd.Series, sigma: pd.DataFrame, k: int, q: float, solver: str, solver_options: Dict,
+                previous: Optional[Dict], seed: Optional[int]) -> Dict:
+    # One rebalance: build -> convert -> solver -> interpret, warm-started from 'previous'
+    from problem_builder import create_quadratic_program
+    from hamiltonian_converter import convert_to_ising_direct
+    from qaoa_solver import interpret_result
+    from parameter_store import hamiltonian_scale
+    from solvers import get_solver
+
+    tickers = list(mu.index)
+    qp = create_quadratic_program(mu, sigma, k=k, q=q)
+    hamiltonian, offset = convert_to_ising_direct(mu, sigma, k, q=q)
+
+    options = dict(solver_options, seed=seed)
+    scale = None
+    if solver == "qaoa":
+        scale = hamiltonian_scale(hamiltonian)
+        options.setdefault("k", k)
+        if previous is not None and previous.get("optimal_point") is not None:
+            # gamma * scale is what carries over between Hamiltonians of different size
+            initial_point = np.array(previous["optimal_point"], dtype=float)
+            initial_point[len(initial_point) // 2:] *= previous["scale"] / scale
+            options["initial_point"] = initial_point
+
+    result = get_solver(solver)(hamiltonian, **options)
+    selected_stocks, score = interpret_result(result, tickers, qp, rank_by="objective")
+
+    # The previous holdings, improved for the new inputs, may still be the better portfolio
+    if previous is not None:
+        Q = q * sigma.values
+        x = np.array([1.0 if ticker in previous["selected_stocks"] else 0.0 for ticker in tickers])
+        x, _ = swap_local_search(x, mu.values, Q)
+        carried_score = float(x @ Q @ x - mu.values @ x)
+        if len(selected_stocks) != k or carried_score < score:
+            selected_stocks, score = [tickers[i] for i in np.nonzero(x)[0]], carried_score
+
+    optimal_point = getattr(result, "optimal_point", None)
+    return {
+        "selected_stocks": selected_stocks,
+        "score": float(score),
+        "optimal_point": None if optimal_point is None else np.asarray(optimal_point, dtype=float).tolist(),
+        "scale": scale,
+    }
+
+
+def _run_segment(rows: List[int]) -> List[Dict]:
+    """
+    Walk over the rebalance dates (price row numbers) of one segment in order.
+    The estimator is warmed up on the 'window' days before the first date, then only
+    fed the new days between dates.
+    """
+    prices, tickers = _WORKER["prices"], _WORKER["tickers"]
+    options = dict(_WORKER["options"])
+    k, q, window = options.pop("k"), options.pop("q"), options.pop("window")
+    solver, seed = options.pop("solver"), options.pop("seed")
+    change_threshold, verbose = options.pop("change_threshold"), options.pop("verbose")
+
+    estimator = StreamingMuSigma(tickers, window=window)
+    fed = rows[0] - window  # next price row to feed
+    records = []
+    previous, solved_mu, solved_sigma = None, None, None
+
+    for row in rows:
+        while fed <= row:
+            estimator.update(prices[fed])
+            fed += 1
+        mu, sigma = estimator.mu_and_sigma()
+
+        start_time = time.time()
+        change = None if solved_mu is None else input_change(mu, sigma, solved_mu, solved_sigma)
+        if change is not None and change < change_threshold:
+            status = "skipped"
+        else:
+            with contextlib.nullcontext() if verbose else contextlib.redirect_stdout(io.StringIO()):
+                solution = _solve_date(mu, sigma, k, q, solver, options, previous,
+                                       None if seed is None else seed + row)
+            status = "warm" if previous is not None else "cold"
+            previous, solved_mu, solved_sigma = solution, mu, sigma
+
+        records.append({
+            "row": row,
+            "selected_stocks": previous["selected_stocks"],
+            "score": previous["score"],
+            "status": status,
+            "input_change": change,
+            "solve_seconds": time.time() - start_time,
+        })
+
+    return records
+
+
+# --- Rebalance schedule ---
+
+def _make_segments(rows: List[int], num_segments: int) -> List[List[int]]:
+    # Cut the rebalance rows into 'num_segments' runs of neighbouring dates
+    size = max(1, math.ceil(len(rows) / num_segments))
+    return [rows[start:start + size] for start in range(0, len(rows), size)]
+
+
+# --- The backtest API ---
+
+def run_backtest(prices: pd.DataFrame, k: int, q: float = 1.0, window: int = 252, rebalance_every: int = 5,
+                 solver: str = "qaoa", change_threshold: float = 0.05, max_workers: Optional[int] = None,
+                 segments: Optional[int] = None, seed: Optional[int] = None, verbose: bool = False,
+                 **solver_options) -> Dict:
+    """
+    Walk-forward backtest on a (dates x tickers) price DataFrame without missing values
+    (as returned by fetch_stock_data).
+
+    window:           daily returns used for mu / Σ at each date.
+    rebalance_every:  trading days between rebalance dates (5 = weekly).
+    solver / **solver_options: the solver for every date (solvers.py). For "qaoa" the
+                      backend defaults to "diagonal".
+    change_threshold: re-solve only if mu or Σ moved by at least this much (relative,
+                      see input_change) since the last solve; otherwise keep the holdings.
+    max_workers / segments: processes, and independent runs of dates (default: about two
+                      per worker). Warm starts only carry over inside a segment.
+    seed:             date at price row i uses seed + i, so a run is reproducible.
+
+    Returns {"holdings": dates x tickers weights (each day's weights earn that day's return),
+             "pnl": daily portfolio return, "equity": growth of 1.0,
+             "rebalances": one row per rebalance date (holdings, score, status
+                           "cold" / "warm" / "skipped", input_change, solve_seconds, turnover)}.
+    """
+    tickers = list(prices.columns)
+    if not 0 < k <= len(tickers):
+        raise ValueError(f"k must be between 1 and {len(tickers)}.")
+    if len(prices) < window + 2:
+        raise ValueError(f"Need at least window + 2 = {window + 2} price rows, got {len(prices)}.")
+    if solver == "qaoa":
+        solver_options.setdefault("backend", "diagonal")
+
+    # Rebalance at the close of these rows; the new holdings earn from the next day on
+    rows = list(range(window, len(prices) - 1, rebalance_every))
+    if max_workers is None:
+        max_workers = mp.cpu_count()
+    if segments is None:
+        segments = 2 * max_workers if max_workers > 1 else 1
+    row_segments = _make_segments(rows, min(segments, len(rows)))
+
+    print(f"[Backtest]: {len(rows)} rebalance dates ({prices.index[rows[0]]} .. {prices.index[rows[-1]]}) "
+          f"in {len(row_segments)} segment(s) on {max_workers} worker(s)...")
+    start_time = time.time()
+
+    price_values = prices.to_numpy(dtype=float)
+    options = dict(solver_options, k=k, q=q, window=window, solver=solver, seed=seed,
+                   change_threshold=change_threshold, verbose=verbose)
+    records = []
+    if max_workers <= 1:
+        _init_worker(price_values, tickers, options)
+        for segment in row_segments:
+            records.extend(_run_segment(segment))
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers, mp_context=mp.get_context("spawn"),
+                                 initializer=_init_worker, initargs=(price_values, tickers, options)) as pool:
+            futures = [pool.submit(_run_segment, segment) for segment in row_segments]
+            for done, future in enumerate(as_completed(futures), start=1):
+                records.extend(future.result())
+                print(f"[Backtest]: {done}/{len(row_segments)} segments done.")
+    records.sort(key=lambda record: record["row"])
+
+    # Portfolio path: the weights chosen at row r are held over the returns of rows r+1 .. next rebalance
+    position = {ticker: i for i, ticker in enumerate(tickers)}
+    weights = np.zeros_like(price_values)
+    boundaries = [record["row"] for record in records] + [len(prices) - 1]
+    held = np.zeros(len(tickers))
+    for record, start, stop in zip(records, boundaries[:-1], boundaries[1:]):
+        target = np.zeros(len(tickers))
+        target[[position[ticker] for ticker in record["selected_stocks"]]] = 1.0 / len(record["selected_stocks"])
+        # Fraction of the portfolio traded (the first date buys everything)
+        record["turnover"] = float(0.5 * np.abs(target - held).sum()) if held.any() else 1.0
+        weights[start + 1:stop + 1] = target
+        held = target
+
+    daily_returns = price_values[1:] / price_values[:-1] - 1.0
+    pnl = np.concatenate([[0.0], (weights[1:] * daily_returns).sum(axis=1)])
+    first = rows[0] + 1
+    holdings = pd.DataFrame(weights[first:], index=prices.index[first:], columns=tickers)
+    pnl = pd.Series(pnl[first:], index=prices.index[first:], name="pnl")
+
+    rebalances = pd.DataFrame(records)
+    rebalances.insert(0, "date", prices.index[rebalances["row"]])
+    rebalances = rebalances.drop(columns="row").set_index("date")
+
+    counts = rebalances["status"].value_counts().to_dict()
+    print(f"[Backtest]: Done in {time.time() - start_time:.1f}s "
+          f"({counts.get('cold', 0)} cold, {counts.get('warm', 0)} warm-started, {counts.get('skipped', 0)} skipped).")
+    return {
+        "holdings": holdings,
+        "pnl": pnl,
+        "equity": (1.0 + pnl).cumprod().rename("equity"),
+        "rebalances": rebalances,
+    }
+
+
+# --- "Testing Block" ---
+# This code runs only when this file is executed directly.
+if __name__ == "__main__":
+
+    print("\n---------------------------------------------------------")
+    print(">>> 'backtest.py' was RUN DIRECTLY (Testing Mode) <<<")
+    print("---------------------------------------------------------")
+
+    # Three years of a random 10-asset market, rebalanced weekly
+    rng = np.random.default_rng(0)
+    n_test, days = 10, 3 * 252 + 260
+    tickers_test = [f"T{i}" for i in range(n_test)]
+    factor = rng.normal(0.0003, 0.01, days)
+    log_returns = (factor[:, None] * rng.uniform(0.5, 1.5, n_test)
+                   + rng.normal(rng.normal(0.0002, 0.0004, n_test), 0.015, (days, n_test)))
+    prices_test = pd.DataFrame(100.0 * np.exp(np.cumsum(log_returns, axis=0)), columns=tickers_test,
+                               index=pd.bdate_range("2021-01-01", periods=days))
+
+    backtest = run_backtest(prices_test, k=3, window=252, rebalance_every=5, solver="qaoa", reps=1,
+                            optimizer="l_bfgs_b", change_threshold=0.2, seed=1, max_workers=1)
+    assert np.allclose(backtest["holdings"].sum(axis=1), 1.0)
+    print(backtest["rebalances"][["selected_stocks", "status", "input_change"]].head(8))
+    print(f"Final equity: {backtest['equity'].iloc[-1]:.4f}")
@@ -0,0 +1,346 @@
+"""
+Batch Solver (batch_solver.py)
+Its job is to solve MANY small portfolios (per sector, per client, per mandate) in one
+call, without paying the QAOA setup cost again for every one of them.
+
+- Every job is (tickers, k, q): pick k of these tickers with risk weight q.
+- Jobs are grouped by size n. Every n-qubit QAOA circuit has the same shape; only the
+  Ising coefficients differ. So a QAOATemplate is built and transpiled ONCE per size
+  (per worker), with the coefficients h_i and J_ij as circuit Parameters, and every
+  job just sends different parameter values to the sampler.
+- The groups are cut into chunks that run in parallel on a process pool. Inside a
+  chunk, each job starts from the previous job's optimal angles (like frontier.py).
+"""
+
+# Step 1: Import necessary tools
+import io
+import math
+import time
+import contextlib
+import numpy as np
+import pandas as pd
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, List, Optional, Sequence, Tuple
+
+# Backends a template can run on (Qiskit's reference sampler or Aer's sampler)
+BACKENDS = ("aer", "sampler")
+# Optimizers for the angles (SPSA's batched evaluations become one sampler job)
+OPTIMIZERS = ("cobyla", "spsa")
+
+# Per-worker state, filled in by _init_worker (one copy per process)
+_WORKER: Dict = {}
+
+
+# --- The circuit template ---
+
+class QAOATemplate:
+    """
+    One parameterized, transpiled QAOA circuit for every n-qubit Ising Hamiltonian
+    H = sum_i h_i Z_i + sum_{i<j} J_ij Z_i Z_j:
+
+        H^n, then per layer: RZ(2 γ h_i), RZZ(2 γ J_ij), RX(2 β), then measure.
+
+    h, J, β and γ are all Parameters, so the circuit is transpiled once and then
+    reused for every Hamiltonian of that size. Angles are [β..., γ...] like Qiskit's QAOA.
+    """
+
+    def __init__(self, num_qubits: int, reps: int = 1, backend: str = "aer", shots: int = 1024,
+                 seed: Optional[int] = None, threads: Optional[int] = 1):
+        from qiskit import QuantumCircuit
+        from qiskit.circuit import ParameterVector
+
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown backend '{backend}'. Choose one of {BACKENDS}.")
+        n = num_qubits
+        self.num_qubits, self.reps, self.shots = n, reps, shots
+        self.rows, self.cols = np.triu_indices(n, 1)
+
+        h = ParameterVector("h", n)
+        J = ParameterVector("J", len(self.rows))
+        beta = ParameterVector("β", reps)
+        gamma = ParameterVector("γ", reps)
+
+        circuit = QuantumCircuit(n)
+        circuit.h(range(n))
+        for layer in range(reps):
+            for i in range(n):
+                circuit.rz(2 * gamma[layer] * h[i], i)
+            for pair, (i, j) in enumerate(zip(self.rows, self.cols)):
+                circuit.rzz(2 * gamma[layer] * J[pair], int(i), int(j))
+            circuit.rx(2 * beta[layer], range(n))
+        circuit.measure_all()
+
+        if backend == "aer":
+            from qiskit_aer import AerSimulator
+            from qiskit_aer.primitives import SamplerV2 as AerSampler
+            from qiskit.transpiler import generate_preset_pass_manager
+
+            backend_options = {"method": "statevector", "max_parallel_threads": threads or 0}
+            self.sampler = AerSampler(default_shots=shots, seed=seed, options={"backend_options": backend_options})
+            pass_manager = generate_preset_pass_manager(optimization_level=1, backend=AerSimulator(**backend_options))
+            self.circuit = pass_manager.run(circuit)
+        else:
+            from qiskit.primitives import StatevectorSampler
+            self.sampler = StatevectorSampler(default_shots=shots, seed=seed)
+            self.circuit = circuit
+
+        # Where each of our parameters sits in the circuit's own (sorted) parameter order
+        position = {parameter: i for i, parameter in enumerate(self.circuit.parameters)}
+        self._h = np.array([position[p] for p in h])
+        self._J = np.array([position[p] for p in J], dtype=int)
+        self._angles = np.array([position[p] for p in list(beta) + list(gamma)])
+        self.num_parameters = 2 * reps
+
+    def parameter_values(self, h: np.ndarray, J: np.ndarray, points: np.ndarray) -> np.ndarray:
+        """(number of points x circuit parameters) values for one Hamiltonian and a batch of angles."""
+        points = np.atleast_2d(points)
+        values = np.empty((len(points), self.circuit.num_parameters))
+        values[:, self._h] = h
+        values[:, self._J] = J[self.rows, self.cols]
+        values[:, self._angles] = points
+        return values
+
+    def sample(self, h: np.ndarray, J: np.ndarray, points: np.ndarray, shots: Optional[int] = None) -> np.ndarray:
+        """
+        Measured basis states, (number of points x shots) integers (bit i = qubit i),
+        for each angle point, all in ONE sampler job.
+        """
+        values = self.parameter_values(h, J, points)
+        result = self.sampler.run([(self.circuit, values)], shots=shots or self.shots).result()[0]
+        # Packed big-endian bytes per shot -> integers (much faster than get_counts)
+        packed = getattr(result.data, self.circuit.cregs[0].name).array.astype(np.int64)
+        weights = 1 << (8 * np.arange(packed.shape[-1] - 1, -1, -1, dtype=np.int64))
+        return packed @ weights
+
+    def energies(self, h: np.ndarray, J: np.ndarray, points: np.ndarray) -> np.ndarray:
+        """Sampled <H> (without the constant) at each angle point."""
+        from qaoa_simulator import subspace_energies
+
+        values = []
+        for states in self.sample(h, J, points):
+            unique, counts = np.unique(states, return_counts=True)
+            values.append(float(np.dot(counts, subspace_energies(h, J, unique)) / len(states)))
+        return np.array(values)
+
+
+# --- Work done inside the workers ---
+
+def _init_worker(mu: pd.Series, sigma: pd.DataFrame, options: Dict) -> None:
+    """Runs once in every worker process: keep the inputs and an (empty) template cache."""
+    _WORKER["mu"] = mu
+    _WORKER["sigma"] = sigma
+    _WORKER["options"] = options
+    _WORKER["templates"] = {}
+
+
+def _template(num_qubits: int) -> QAOATemplate:
+    # Built and transpiled the first time this worker sees this size, then reused
+    options = _WORKER["options"]
+    if num_qubits not in _WORKER["templates"]:
+        _WORKER["templates"][num_qubits] = QAOATemplate(num_qubits, reps=options["reps"],
+                                                        backend=options["backend"], shots=options["shots"],
+                                                        seed=options["seed"])
+    return _WORKER["templates"][num_qubits]
+
+
+def _minimize(objective, x0: np.ndarray, optimizer: str, warm_start: bool):
+    from qiskit_algorithms.optimizers import COBYLA, SPSA
+    from qaoa_solver import WARM_START_RHOBEG
+
+    if optimizer == "spsa":
+        return SPSA(maxiter=300).minimize(objective, x0)
+    return (COBYLA(rhobeg=WARM_START_RHOBEG) if warm_start else COBYLA()).minimize(objective, x0)
+
+
+def _solve_chunk(chunk: List[Tuple[int, List[str], int, float]]) -> List[Dict]:
+    # The worker's own print messages are only shown with verbose=True
+    with contextlib.nullcontext() if _WORKER["options"]["verbose"] else contextlib.redirect_stdout(io.StringIO()):
+        return _solve_jobs(chunk)
+
+
+def _solve_jobs(chunk: List[Tuple[int, List[str], int, float]]) -> List[Dict]:
+    """
+    Solve the jobs of one chunk (all the same size) in order on this worker's template.
+    Each job is warm-started from the previous job's optimal angles.
+    """
+    from hamiltonian_converter import build_qubo, qubo_to_ising
+    from samples import PackedSamples
+
+    mu, sigma, options = _WORKER["mu"], _WORKER["sigma"], _WORKER["options"]
+    build_time = time.time()
+    template = _template(len(chunk[0][1]))
+    build_seconds = time.time() - build_time
+
+    rows = []
+    previous_point, previous_scale = None, None
+    for job, tickers, k, q in chunk:
+        start_time = time.time()
+        job_mu, job_sigma = mu[tickers].values, sigma.loc[tickers, tickers].values
+        linear, quadratic, constant = build_qubo(job_mu, job_sigma, k, q=q)
+        h, J, offset = qubo_to_ising(linear, quadratic, constant)
+        scale = max(np.abs(h).max(initial=0.0), np.abs(J).max(initial=0.0)) or 1.0
+
+        if previous_point is None:
+            # Same default as Qiskit's QAOA: uniform in [-2*pi, 2*pi]
+            seed = None if options["seed"] is None else options["seed"] + job
+            point = np.random.default_rng(seed).uniform(-2 * np.pi, 2 * np.pi, template.num_parameters)
+        else:
+            # gamma * scale is what carries over between Hamiltonians
+            point = np.array(previous_point, dtype=float)
+            point[template.reps:] *= previous_scale / scale
+
+        evaluations = [0]
+
+        def objective(x: np.ndarray):
+            x = np.asarray(x, dtype=float)
+            evaluations[0] += len(np.atleast_2d(x))
+            energies = template.energies(h, J, x)
+            return energies if x.ndim == 2 else float(energies[0])
+
+        result = _minimize(objective, point, options["optimizer"], warm_start=previous_point is not None)
+
+        # Final readout: best FEASIBLE sampled portfolio by the real objective q x'Σx - μ'x
+        states, counts = np.unique(template.sample(h, J, result.x)[0], return_counts=True)
+        samples = PackedSamples.from_states(states, counts / counts.sum(), len(tickers))
+        X = samples.to_matrix().astype(float)
+        scores = q * ((X @ job_sigma) * X).sum(axis=1) - X @ job_mu
+        feasible = X.sum(axis=1) == k
+        best = int(np.argmin(np.where(feasible, scores, np.inf))) if feasible.any() else \
+            int(np.argmax(samples.probabilities))
+
+        rows.append({
+            "job": job,
+            "n": len(tickers),
+            "tickers": tickers,
+            "k": k,
+            "q": q,
+            "selected_stocks": [tickers[i] for i in np.nonzero(X[best])[0]],
+            "objective": float(scores[best]),
+            "feasible": bool(feasible[best]),
+            "probability": float(samples.probabilities[best]),
+            "energy": float(result.fun) + offset,
+            "cost_function_evals": evaluations[0],
+            "warm_started": previous_point is not None,
+            "template_seconds": build_seconds,
+            "solve_seconds": time.time() - start_time,
+            "optimal_point": np.asarray(result.x, dtype=float).tolist(),
+        })
+        previous_point, previous_scale = result.x, scale
+        build_seconds = 0.0
+
+    return rows
+
+
+# --- Batch splitting ---
+
+def _make_chunks(jobs: List[Tuple[List[str], int, float]], max_workers: int,
+                 chunk_size: Optional[int]) -> List[List[Tuple[int, List[str], int, float]]]:
+    # Group the jobs by size, then cut every group so all workers get a share of it
+    groups: Dict[int, List] = {}
+    for index, (tickers, k, q) in enumerate(jobs):
+        groups.setdefault(len(tickers), []).append((index, list(tickers), int(k), float(q)))
+
+    chunks = []
+    for n in sorted(groups, reverse=True):
+        group = groups[n]
+        size = chunk_size or max(1, math.ceil(len(group) / max_workers))
+        chunks.extend(group[start:start + size] for start in range(0, len(group), size))
+    return chunks
+
+
+def solve_batch(jobs: Sequence[Tuple[Sequence[str], int, float]], mu: pd.Series, sigma: pd.DataFrame,
+                backend: str = "aer", reps: int = 1, shots: int = 1024, optimizer: str = "cobyla",
+                max_workers: Optional[int] = None, chunk_size: Optional[int] = None,
+                seed: Optional[int] = None, verbose: bool = False) -> pd.DataFrame:
+    """
+    Solve every job (tickers, k, q) with QAOA and return one row per job, in job order
+    (see _solve_jobs for the columns). 'mu' and 'sigma' cover every ticker used by a job.
+
+    backend:     "aer" (transpiled for Aer, one thread per worker) or "sampler".
+    max_workers: processes to use (default: all cores).
+    chunk_size:  jobs per task. By default each size group is cut into one chunk per
+                 worker, so even a single big group keeps every core busy.
+    seed:        sampler seed, and job i starts from random angles with seed + i.
+    verbose:     show the pipeline's own print messages from the workers.
+    """
+    if optimizer not in OPTIMIZERS:
+        raise ValueError(f"Unknown optimizer '{optimizer}'. Choose one of {OPTIMIZERS}.")
+    jobs = list(jobs)
+    if not jobs:
+        return pd.DataFrame()
+    for tickers, k, q in jobs:
+        if not 0 < k <= len(tickers):
+            raise ValueError(f"Job {list(tickers)} needs 0 < k <= {len(tickers)} (got k={k}).")
+    if max_workers is None:
+        max_workers = mp.cpu_count()
+
+    chunks = _make_chunks(jobs, max_workers, chunk_size)
+    sizes = sorted({len(tickers) for tickers, _, _ in jobs})
+    print(f"[Batch Solver]: {len(jobs)} jobs, sizes {sizes}, in {len(chunks)} chunks "
+          f"on {max_workers} worker(s)...")
+
+    options = {"backend": backend, "reps": reps, "shots": shots, "optimizer": optimizer, "seed": seed,
+               "verbose": verbose}
+    rows = []
+    with ProcessPoolExecutor(max_workers=max_workers, mp_context=mp.get_context("spawn"),
+                             initializer=_init_worker, initargs=(mu, sigma, options)) as pool:
+        futures = [pool.submit(_solve_chunk, chunk) for chunk in chunks]
+        for done, future in enumerate(as_completed(futures), start=1):
+            rows.extend(future.result())
+            print(f"[Batch Solver]: {done}/{len(chunks)} chunks done.")
+
+    return pd.DataFrame(rows).sort_values("job").reset_index(drop=True)
+
+
+# --- "Testing Block" ---
+# This code runs only when this file is executed directly.
+if __name__ == "__main__":
+
+    print("\n---------------------------------------------------------")
+    print(">>> 'batch_solver.py' was RUN DIRECTLY (Testing Mode) <<<")
+    print("---------------------------------------------------------")
+
+    from synthetic_market import synthetic_mu_sigma
+    from classical_solvers import solve_exact
+
+    mu, sigma = synthetic_mu_sigma(24, seed=5)
+    tickers = list(mu.index)
+    rng = np.random.default_rng(0)
+    # 40 six-asset portfolios and 8 four-asset ones from the same universe
+    jobs = ([(list(rng.choice(tickers, 6, replace=False)), 3, float(rng.uniform(0.5, 2.0))) for _ in range(40)]
+            + [(list(rng.choice(tickers, 4, replace=False)), 2, 1.0) for _ in range(8)])
+
+    start = time.time()
+    batch = solve_batch(jobs, mu, sigma, backend="aer", reps=1, seed=3)
+    batch_seconds = time.time() - start
+    print(batch[["job", "n", "k", "q", "selected_stocks", "objective", "cost_function_evals",
+                 "template_seconds", "solve_seconds"]].head(10).to_string())
+    print(f"Batch: {len(jobs)} jobs in {batch_seconds:.2f}s, templates built "
+          f"{(batch['template_seconds'] > 0).sum()} time(s)")
+
+    # How often the exact optimum of the job was found. With 1024 shots over at most 64
+    # bitstrings that says little about QAOA itself, so also check what the angles did:
+    # - <H> after optimizing vs the uniform superposition (β = 0), whose <H> is the Ising offset
+    # - how often the optimum is sampled vs uniform guessing (1 / 2^n)
+    from hamiltonian_converter import build_qubo, qubo_to_ising
+
+    optimal, below_uniform, boost = 0, 0, {}
+    with contextlib.redirect_stdout(io.StringIO()):
+        for row in batch.itertuples():
+            job_mu, job_sigma = mu[row.tickers], sigma.loc[row.tickers, row.tickers]
+            selected, score = solve_exact(job_mu, job_sigma, row.k, q=row.q, max_workers=1)
+            found = sorted(selected) == sorted(row.selected_stocks)
+            optimal += found
+            _, _, offset = qubo_to_ising(*build_qubo(job_mu.values, job_sigma.values, row.k, q=row.q))
+            below_uniform += row.energy < offset
+            if found:
+                boost.setdefault(row.n, []).append(row.probability * 2 ** row.n)
+    print(f"Exact optimum found for {optimal}/{len(batch)} jobs")
+    print(f"<H> below the uniform superposition for {below_uniform}/{len(batch)} jobs")
+    for n, ratios in sorted(boost.items()):
+        print(f"n={n}: optimum sampled {np.mean(ratios):.1f}x as often as by uniform guessing")
+    assert optimal == len(batch)
+    assert below_uniform >= 0.9 * len(batch)
+    # (p=1 on the small n=4 jobs lowers <H> but hardly favours the optimum; n=6 does)
+    assert np.mean(sum(boost.values(), [])) > 2
@@ -0,0 +1,283 @@
+"""
+Benchmark (benchmark.py)
+Its job is to time the whole pipeline on synthetic markets (synthetic_market.py), for
+many problem sizes and every solver backend, fully offline on a CPU-only machine.
+
+For each grid point (n, k, q, reps, backend) it records the time of every stage
+(fetch -> mu/Σ -> build -> convert -> solve -> interpret), peak memory, optimizer
+evaluations and the solution quality (approximation ratio against the exact optimum
+where enumeration is affordable). Everything is written to one JSON file together with
+the versions / machine it ran on; compare_benchmarks() flags regressions between two files.
+
+    python benchmark.py --sizes 4 8 12 --backends diagonal annealing --output bench.json
+    python benchmark.py --compare old_bench.json --output new_bench.json
+"""
+
+# Step 1: Import necessary tools
+import io
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+import contextlib
+import subprocess
+import pandas as pd
+from math import comb
+from datetime import datetime, timezone
+from typing import Dict, Optional, Sequence
+
+from data_pipeline import fetch_stock_data, calculate_mu_and_sigma
+from instrumentation import peak_rss_mb
+from synthetic_market import SyntheticSource
+
+# Backends: the classical solvers and the solve_with_qaoa backends
+CLASSICAL_BACKENDS = ("exact", "annealing", "tabu")
+QAOA_BACKENDS = ("diagonal", "subspace", "sampler", "aer")
+BACKENDS = CLASSICAL_BACKENDS + QAOA_BACKENDS
+
+DEFAULT_SIZES = (4, 6, 8, 10, 12, 16, 20, 24, 30)
+
+# Largest problem each backend is run on (beyond that the point is recorded as skipped):
+# qubits for the state-vector backends, feasible portfolios C(n, k) for "exact" / "subspace"
+MAX_QUBITS = {"sampler": 6, "aer": 14, "diagonal": 18}
+MAX_PORTFOLIOS = {"exact": 20_000_000, "subspace": 50_000}
+
+# Synthetic data: three years of daily prices starting here
+START_DATE, END_DATE = "2021-01-01", "2024-01-01"
+
+
+# --- Machine / version info ---
+
+def environment_info() -> Dict:
+    """Versions, machine and git commit, stored with every benchmark file."""
+    from importlib.metadata import PackageNotFoundError, version
+
+    packages = {}
+    for package in ("numpy", "scipy", "pandas", "qiskit", "qiskit-aer", "qiskit-algorithms", "qiskit-optimization"):
+        try:
+            packages[package] = version(package)
+        except PackageNotFoundError:
+            packages[package] = None
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__)), timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "git_commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "packages": packages,
+    }
+
+
+# --- One grid point ---
+
+def _skip_reason(backend: str, n: int, k: int) -> Optional[str]:
+    if backend in MAX_QUBITS and n > MAX_QUBITS[backend]:
+        return f"n > {MAX_QUBITS[backend]} qubits"
+    if backend in MAX_PORTFOLIOS and comb(n, k) > MAX_PORTFOLIOS[backend]:
+        return f"C(n, k) > {MAX_PORTFOLIOS[backend]}"
+    return None
+
+
+def _solve(backend: str, mu: pd.Series, sigma: pd.DataFrame, k: int, q: float, reps: int,
+           optimizer: str, seed: Optional[int], timings: Dict) -> Dict:
+    # Build -> convert -> solve -> interpret for one backend, filling in the stage timings
+    from problem_builder import create_quadratic_program
+    from hamiltonian_converter import convert_to_ising_direct
+    from qaoa_solver import interpret_result
+    from solvers import get_solver
+
+    if backend == "exact":
+        from classical_solvers import solve_exact
+        start = time.perf_counter()
+        selected_stocks, score = solve_exact(mu, sigma, k, q=q, max_workers=1)
+        timings["solve_seconds"] = time.perf_counter() - start
+        return {"selected_stocks": selected_stocks, "score": score, "optimizer_evals": None}
+
+    start = time.perf_counter()
+    qp = create_quadratic_program(mu, sigma, k=k, q=q)
+    timings["build_seconds"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    hamiltonian, offset = convert_to_ising_direct(mu, sigma, k, q=q)
+    timings["convert_seconds"] = time.perf_counter() - start
+
+    if backend in QAOA_BACKENDS:
+        solve = get_solver("qaoa")
+        options = {"backend": backend, "reps": reps, "k": k, "optimizer": optimizer, "seed": seed}
+    else:
+        solve = get_solver(backend)
+        options = {"seed": seed, "max_workers": 1}
+    start = time.perf_counter()
+    result = solve(hamiltonian, **options)
+    timings["solve_seconds"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    selected_stocks, score = interpret_result(result, list(mu.index), qp, rank_by="objective")
+    timings["interpret_seconds"] = time.perf_counter() - start
+
+    evals = getattr(result, "cost_function_evals", None)
+    return {"selected_stocks": selected_stocks, "score": float(score),
+            "optimizer_evals": None if evals is None else int(evals)}
+
+
+# --- The benchmark API ---
+
+def run_benchmark(sizes: Sequence[int] = DEFAULT_SIZES, backends: Sequence[str] = BACKENDS,
+                  k_fractions: Sequence[float] = (0.5,), q_values: Sequence[float] = (1.0,),
+                  reps_values: Sequence[int] = (1, 2), optimizer: str = "cobyla", seed: int = 0,
+                  output: Optional[str] = "benchmark_results.json", verbose: bool = False, **market_options) -> Dict:
+    """
+    Run the grid sizes x k_fractions x q_values x backends (x reps_values for the QAOA
+    backends, which use 'optimizer'; k = round(k_fraction * n), at least 1) and return / write
+    {"environment": environment_info(), "settings": ..., "results": [one dict per point]}.
+
+    Each result has n, k, q, reps, backend, optimizer, status ("ok", "skipped", "error"), the stage
+    times (fetch_seconds, mu_sigma_seconds, build_seconds, convert_seconds, solve_seconds,
+    interpret_seconds, total_seconds), peak_rss_mb, optimizer_evals, score, exact_score and
+    approximation_ratio. **market_options go to the synthetic market (num_sectors,
+    market_correlation, sector_correlation, ...). The same seed gives the same markets.
+    """
+    unknown = [backend for backend in backends if backend not in BACKENDS]
+    if unknown:
+        raise ValueError(f"Unknown backend(s) {unknown}. Choose from {BACKENDS}.")
+    from classical_solvers import exact_bounds, approximation_ratio
+
+    results = []
+    start_time = time.time()
+    for n in sizes:
+        # Stage 1 + 2 on a synthetic market (the same for every backend of this size)
+        tickers = [f"SYN{i:03d}" for i in range(n)]
+        with contextlib.nullcontext() if verbose else contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            prices = fetch_stock_data(tickers, START_DATE, END_DATE,
+                                      source=SyntheticSource(seed=seed + n, **market_options))
+            fetch_seconds = time.perf_counter() - start
+            start = time.perf_counter()
+            mu, sigma = calculate_mu_and_sigma(prices)
+            mu_sigma_seconds = time.perf_counter() - start
+
+        for k in sorted({max(1, int(round(fraction * n))) for fraction in k_fractions}):
+            for q in q_values:
+                # Reference optimum and worst portfolio, for the approximation ratio
+                bounds = None
+                if _skip_reason("exact", n, k) is None:
+                    with contextlib.redirect_stdout(io.StringIO()):
+                        bounds = exact_bounds(mu, sigma, k, q=q, max_workers=1)
+
+                for backend in backends:
+                    for reps in (reps_values if backend in QAOA_BACKENDS else (None,)):
+                        row = {"n": n, "k": k, "q": q, "reps": reps, "backend": backend,
+                               "optimizer": optimizer if backend in QAOA_BACKENDS else None, "status": "ok",
+                               "fetch_seconds": fetch_seconds, "mu_sigma_seconds": mu_sigma_seconds,
+                               "build_seconds": None, "convert_seconds": None, "solve_seconds": None,
+                               "interpret_seconds": None}
+                        reason = _skip_reason(backend, n, k)
+                        if reason is not None:
+                            row.update(status="skipped", reason=reason)
+                            results.append(row)
+                            continue
+
+                        try:
+                            with contextlib.nullcontext() if verbose else contextlib.redirect_stdout(io.StringIO()):
+                                row.update(_solve(backend, mu, sigma, k, q, reps, optimizer, seed, row))
+                        except Exception as e:
+                            row.update(status="error", reason=f"{type(e).__name__}: {e}")
+                        row["total_seconds"] = sum(row[key] or 0.0 for key in row if key.endswith("_seconds"))
+                        row["peak_rss_mb"] = peak_rss_mb()
+                        if bounds is not None and row["status"] == "ok":
+                            row["exact_score"] = bounds["score"]
+                            row["approximation_ratio"] = approximation_ratio(row["score"], bounds["score"],
+                                                                             bounds["worst_score"])
+                        results.append(row)
+                        print(f"[Benchmark]: n={n:<3} k={k:<3} q={q:<5g} {backend:<9} reps={reps}: "
+                              + (f"{row['total_seconds']:.3f}s" if row["status"] == "ok" else row["status"]))
+
+    report = {
+        "environment": environment_info(),
+        "settings": {"sizes": list(sizes), "backends": list(backends), "k_fractions": list(k_fractions),
+                     "q_values": list(q_values), "reps_values": list(reps_values), "optimizer": optimizer,
+                     "seed": seed,
+                     "market_options": market_options},
+        "results": results,
+    }
+    print(f"[Benchmark]: {len(results)} grid points in {time.time() - start_time:.1f}s.")
+    if output is not None:
+        with open(output, "w") as f:
+            json.dump(report, f, indent=2, default=str)
+        print(f"[Benchmark]: Results written to '{output}'.")
+    return report
+
+
+def load_results(report) -> pd.DataFrame:
+    """The 'results' of a benchmark report (or of a report file path) as a DataFrame."""
+    if isinstance(report, str):
+        with open(report, "r") as f:
+            report = json.load(f)
+    return pd.DataFrame(report["results"])
+
+
+def compare_benchmarks(baseline, current, slowdown: float = 1.25, min_seconds: float = 0.01,
+                       quality_drop: float = 0.05) -> pd.DataFrame:
+    """
+    Match the grid points of two reports (or report files) and return those that got
+    slower by more than 'slowdown' x (ignoring points faster than 'min_seconds'), or whose
+    approximation ratio dropped by more than 'quality_drop'.
+    """
+    keys = ["n", "k", "q", "reps", "backend", "optimizer"]
+    old, new = load_results(baseline), load_results(current)
+    old, new = old[old["status"] == "ok"], new[new["status"] == "ok"]
+    columns = ["total_seconds", "solve_seconds", "approximation_ratio"]
+    old, new = old.reindex(columns=keys + columns), new.reindex(columns=keys + columns)
+    for frame in (old, new):
+        # Older files may lack a column; compare the name columns as text
+        frame[["backend", "optimizer"]] = frame[["backend", "optimizer"]].astype(object).fillna("").astype(str)
+    merged = old.merge(new, on=keys, suffixes=("_baseline", "_current"))
+    merged["speed_ratio"] = merged["total_seconds_current"] / merged["total_seconds_baseline"]
+    slower = (merged["speed_ratio"] > slowdown) & (merged["total_seconds_current"] > min_seconds)
+    worse = (merged["approximation_ratio_baseline"] - merged["approximation_ratio_current"]) > quality_drop
+    return merged[slower | worse].reset_index(drop=True)
+
+
+# --- "Testing Block" ---
+# This code runs only when this file is executed directly.
+if __name__ == "__main__":
+
+    print("\n---------------------------------------------------------")
+    print(">>> 'benchmark.py' was RUN DIRECTLY (Benchmark Mode) <<<")
+    print("---------------------------------------------------------")
+
+    parser = argparse.ArgumentParser(description="Offline scaling benchmark on synthetic markets.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES))
+    parser.add_argument("--backends", nargs="+", default=list(BACKENDS), choices=BACKENDS)
+    parser.add_argument("--k-fractions", type=float, nargs="+", default=[0.5])
+    parser.add_argument("--q-values", type=float, nargs="+", default=[1.0])
+    parser.add_argument("--reps", type=int, nargs="+", default=[1, 2])
+    parser.add_argument("--optimizer", default="cobyla", help="QAOA optimizer (see qaoa_solver.OPTIMIZERS)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--compare", help="baseline benchmark file to check for regressions")
+    parser.add_argument("--verbose", action="store_true")
+    arguments = parser.parse_args()
+
+    report = run_benchmark(arguments.sizes, arguments.backends, arguments.k_fractions, arguments.q_values,
+                           arguments.reps, optimizer=arguments.optimizer, seed=arguments.seed, output=arguments.output, verbose=arguments.verbose)
+
+    table = load_results(report)
+    done = table[table["status"] == "ok"]
+    if not done.empty:
+        print("\nSolve time (s) by n and backend:")
+        print(done.pivot_table(index="n", columns="backend", values="solve_seconds", aggfunc="min").round(3))
+
+    if arguments.compare:
+        regressions = compare_benchmarks(arguments.compare, report)
+        print(f"\n{len(regressions)} regression(s) against '{arguments.compare}'.")
+        if not regressions.empty:
+            print(regressions.to_string())
+            sys.exit(1)
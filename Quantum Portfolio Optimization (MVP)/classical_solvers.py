@@ -0,0 +1,466 @@
+"""
+Classical Solvers (classical_solvers.py)
+Its job is to give us classical answers to compare QAOA against.
+
+Exact solver: checks EVERY feasible portfolio (all C(n, k) ways to pick k assets)
+and returns the true optimum. To make that fast:
+- portfolios are visited in "revolving-door" order, where the next portfolio only
+  swaps one asset out and one asset in,
+- so the objective is updated with O(n) work per step instead of recomputing x^T Σ x,
+- the steps are done in NumPy blocks, and blocks are split across processes.
+
+Heuristic solvers (simulated annealing, tabu search): work on the same Ising
+coefficients (h, J) as QAOA, so they run on any problem size. Each keeps the local
+field of every spin, so the energy change of a flip is O(1); many replicas run at
+once as rows of NumPy arrays, and restarts are spread over processes. They return
+the same kind of result as QAOA, so interpret_result / top_portfolios work unchanged.
+"""
+
+# Step 1: Import necessary tools
+import time
+import numpy as np
+import pandas as pd
+import multiprocessing as mp
+from math import comb
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple, Union
+
+from qiskit.quantum_info import SparsePauliOp
+from qiskit_algorithms.minimum_eigensolvers import SamplingMinimumEigensolverResult
+
+from risk_model import FactorCovariance
+from hamiltonian_converter import ising_from_pauli_op
+from samples import LazyEigenstate, PackedSamples
+
+# Number of portfolios handled in one NumPy block
+EXACT_BLOCK_SIZE = 1 << 16
+
+# Below this many portfolios, starting worker processes costs more than it saves
+_PARALLEL_THRESHOLD = 1 << 18
+
+# Per-worker inputs, filled in by _init_exact_worker / _init_heuristic_worker
+_EXACT: Dict = {}
+_HEURISTIC: Dict = {}
+
+
+# --- Revolving-door order ---
+
+def _binomial_table(n: int) -> np.ndarray:
+    # table[m, j] = C(m, j) for 0 <= m <= n, 0 <= j <= n + 1 (zero when j > m)
+    table = np.zeros((n + 1, n + 2), dtype=np.int64)
+    for m in range(n + 1):
+        for j in range(m + 1):
+            table[m, j] = comb(m, j)
+    return table
+
+
+def revolving_door_unrank(ranks: np.ndarray, n: int, k: int) -> np.ndarray:
+    """
+    The portfolios at the given positions of the revolving-door order, as a
+    (len(ranks) x n) 0/1 matrix (column i = asset i).
+
+    The order is defined recursively:
+        R(n, k) = R(n-1, k), then R(n-1, k-1) in REVERSE with asset n-1 added,
+    so neighbouring positions always differ by swapping one asset for another.
+    Every rank is decoded independently (one vectorized pass per asset), which lets
+    any block of the order be generated without the ones before it.
+    """
+    table = _binomial_table(n)
+    ranks = np.asarray(ranks, dtype=np.int64).copy()
+    remaining = np.full(len(ranks), k, dtype=np.int64)
+    bits = np.zeros((len(ranks), n), dtype=np.uint8)
+
+    for m in range(n - 1, -1, -1):
+        first_half = table[m, remaining]  # size of R(m, remaining)
+        take = ranks >= first_half        # in the second half -> asset m is picked
+        bits[take, m] = 1
+        # Position inside the reversed R(m, remaining - 1)
+        second_half = table[m, np.maximum(remaining - 1, 0)]
+        ranks = np.where(take, second_half - 1 - (ranks - first_half), ranks)
+        remaining -= take
+
+    return bits
+
+
+# --- Block scan (runs in the workers) ---
+
+def _init_exact_worker(mu: np.ndarray, Q: np.ndarray, n: int, k: int) -> None:
+    _EXACT.update(mu=mu, Q=Q, n=n, k=k)
+
+
+def _scan_block(start: int, stop: int) -> Tuple[int, float, int, float]:
+    """
+    Score the portfolios with ranks [start, stop) and return
+    (best rank, best score, worst rank, worst score).
+
+    f(x) = x^T Q x - mu^T x with Q = q * Σ. Swapping asset i out and j in changes it by
+        mu_i - mu_j + 2 * (g_j - g_i) + Q_jj + Q_ii - 2 * Q_ij,   with g = Q x,
+    and g itself changes by Q[:, j] - Q[:, i]. The running g for every step of the
+    block is one cumulative sum over an (n x block) array, i.e. O(n) per portfolio.
+    """
+    mu, Q, n, k = _EXACT["mu"], _EXACT["Q"], _EXACT["n"], _EXACT["k"]
+
+    X = revolving_door_unrank(np.arange(start, stop), n, k)
+    x0 = X[0].astype(float)
+    g0 = Q @ x0
+    f0 = float(x0 @ g0 - mu @ x0)
+
+    if len(X) > 1:
+        # Which asset leaves (1 -> 0) and which one enters (0 -> 1) at every step
+        change = X[1:].astype(np.int8) - X[:-1].astype(np.int8)
+        out_index = np.argmax(change == -1, axis=1)
+        in_index = np.argmax(change == 1, axis=1)
+
+        # g before each step: g0 + sum of the column changes of all earlier steps
+        column_change = Q[:, in_index] - Q[:, out_index]
+        g = np.empty_like(column_change)
+        g[:, 0] = g0
+        np.cumsum(column_change[:, :-1], axis=1, out=g[:, 1:])
+        g[:, 1:] += g0[:, None]
+
+        steps = np.arange(len(X) - 1)
+        delta = (mu[out_index] - mu[in_index]
+                 + 2.0 * (g[in_index, steps] - g[out_index, steps])
+                 + Q[in_index, in_index] + Q[out_index, out_index] - 2.0 * Q[in_index, out_index])
+        scores = f0 + np.concatenate([[0.0], np.cumsum(delta)])
+    else:
+        scores = np.array([f0])
+
+    best, worst = int(np.argmin(scores)), int(np.argmax(scores))
+    return start + best, float(scores[best]), start + worst, float(scores[worst])
+
+
+# --- Exact solver API ---
+
+def exact_bounds(mu: pd.Series, sigma: Union[pd.DataFrame, FactorCovariance], k: int, q: float = 1.0,
+                 block_size: int = EXACT_BLOCK_SIZE, max_workers: Optional[int] = None) -> Dict:
+    """
+    Enumerate all C(n, k) feasible portfolios and return the best AND the worst one:
+    {"selected_stocks", "score", "worst_stocks", "worst_score", "num_portfolios", "solve_seconds"}.
+    The worst score is what approximation_ratio() needs.
+
+    max_workers: processes for the block scan (default: all cores; 1 = no processes).
+    """
+    tickers = list(mu.index)
+    n = len(tickers)
+    if not 0 <= k <= n:
+        raise ValueError(f"k must be between 0 and {n}.")
+
+    # n is small here (the enumeration is the expensive part), so a dense Σ is fine
+    dense_sigma = sigma.to_dense().values if isinstance(sigma, FactorCovariance) else np.asarray(sigma, dtype=float)
+    Q = q * dense_sigma
+    Q = 0.5 * (Q + Q.T)
+    mu_values = np.asarray(mu, dtype=float)
+
+    total = comb(n, k)
+    blocks = [(start, min(start + block_size, total)) for start in range(0, total, block_size)]
+    if max_workers is None:
+        max_workers = mp.cpu_count()
+
+    print(f"[Exact Solver]: Checking all {total} portfolios (n={n}, k={k}) in {len(blocks)} block(s)...")
+    start_time = time.time()
+
+    if max_workers == 1 or total < _PARALLEL_THRESHOLD:
+        _init_exact_worker(mu_values, Q, n, k)
+        results = [_scan_block(start, stop) for start, stop in blocks]
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers, mp_context=mp.get_context("spawn"),
+                                 initializer=_init_exact_worker, initargs=(mu_values, Q, n, k)) as pool:
+            results = list(pool.map(_scan_block, *zip(*blocks), chunksize=max(1, len(blocks) // (4 * max_workers))))
+
+    best_rank, best_score = min(((r[0], r[1]) for r in results), key=lambda item: item[1])
+    worst_rank, worst_score = max(((r[2], r[3]) for r in results), key=lambda item: item[1])
+    chosen = revolving_door_unrank(np.array([best_rank, worst_rank]), n, k)
+    solve_seconds = time.time() - start_time
+
+    print(f"[Exact Solver]: Done in {solve_seconds:.2f}s.")
+    return {
+        "selected_stocks": [tickers[i] for i in np.nonzero(chosen[0])[0]],
+        "score": best_score,
+        "worst_stocks": [tickers[i] for i in np.nonzero(chosen[1])[0]],
+        "worst_score": worst_score,
+        "num_portfolios": total,
+        "solve_seconds": solve_seconds,
+    }
+
+
+def solve_exact(mu: pd.Series, sigma: Union[pd.DataFrame, FactorCovariance], k: int, q: float = 1.0,
+                block_size: int = EXACT_BLOCK_SIZE, max_workers: Optional[int] = None) -> Tuple[List[str], float]:
+    """
+    The optimal portfolio, in the same (selected_stocks, score) format as interpret_result.
+    The score equals qp.objective.evaluate(x) for the QuadraticProgram of the same mu, Σ, k, q.
+    """
+    bounds = exact_bounds(mu, sigma, k, q=q, block_size=block_size, max_workers=max_workers)
+    return bounds["selected_stocks"], bounds["score"]
+
+
+def approximation_ratio(score: float, best_score: float, worst_score: float) -> float:
+    """
+    Where 'score' lies between the worst (0.0) and the best (1.0) feasible portfolio.
+    """
+    if worst_score == best_score:
+        return 1.0
+    return (worst_score - score) / (worst_score - best_score)
+
+
+# --- Heuristic solvers on the Ising model ---
+# Spins s_i = +1 for bit 0 and -1 for bit 1 (Z_i = +1 for bit 0), and
+#     E(s) = sum_i h_i s_i + sum_{i<j} J_ij s_i s_j + constant.
+# With the local field f_i = h_i + sum_j J_ij s_j (J made symmetric), flipping
+# spin i changes the energy by -2 * s_i * f_i, and the fields change by
+# -2 * s_i * J[i, :] (only needed when the flip is accepted).
+
+def _ising_arrays(hamiltonian: SparsePauliOp) -> Tuple[np.ndarray, np.ndarray, float]:
+    # (h, symmetric J with zero diagonal, constant)
+    h, J, constant = ising_from_pauli_op(hamiltonian)
+    J = np.triu(J, 1)
+    return h, J + J.T, constant
+
+
+def ising_energies(spins: np.ndarray, h: np.ndarray, J: np.ndarray, constant: float = 0.0) -> np.ndarray:
+    """Energy of every row of 'spins' (replicas x n, entries +1 / -1); J symmetric."""
+    return spins @ h + 0.5 * ((spins @ J) * spins).sum(axis=1) + constant
+
+
+def _annealing_betas(h: np.ndarray, J: np.ndarray, num_sweeps: int) -> np.ndarray:
+    """
+    Geometric schedule of inverse temperatures. Hot: the largest possible flip cost
+    is accepted with probability 1/2. Cold: the smallest one with probability 1/100.
+    """
+    max_delta = 2.0 * (np.abs(h) + np.abs(J).sum(axis=1)).max()
+    coefficients = np.abs(np.concatenate([h, J[np.triu_indices(len(h), 1)]]))
+    coefficients = coefficients[coefficients > 0]
+    min_delta = 2.0 * coefficients.min() if len(coefficients) else 1.0
+    if max_delta == 0:
+        return np.ones(num_sweeps)
+    return np.geomspace(np.log(2) / max_delta, np.log(100) / min_delta, num_sweeps)
+
+
+def _anneal_replicas(h: np.ndarray, J: np.ndarray, num_replicas: int, num_sweeps: int,
+                     rng: np.random.Generator) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Metropolis simulated annealing, all replicas at once. Returns the best spins each
+    replica saw (replicas x n) and their energies (without the constant).
+    """
+    n = len(h)
+    spins = rng.choice(np.array([-1.0, 1.0]), size=(num_replicas, n))
+    fields = h + spins @ J
+    energies = ising_energies(spins, h, J)
+    best_spins, best_energies = spins.copy(), energies.copy()
+
+    rows = np.arange(num_replicas)
+    for beta in _annealing_betas(h, J, num_sweeps):
+        # Accept a flip if delta <= -log(u) / beta  (same as u <= exp(-beta * delta))
+        thresholds = -np.log(rng.random((n, num_replicas))) / beta
+        for i in range(n):
+            delta = -2.0 * spins[:, i] * fields[:, i]
+            accepted = rows[delta <= thresholds[i]]
+            if len(accepted) == 0:
+                continue
+            change = -2.0 * spins[accepted, i]
+            spins[accepted, i] = -spins[accepted, i]
+            fields[accepted] += change[:, None] * J[i]
+            energies[accepted] += delta[accepted]
+
+        improved = energies < best_energies
+        best_spins[improved] = spins[improved]
+        best_energies[improved] = energies[improved]
+
+    return best_spins, best_energies
+
+
+def _tabu_replicas(h: np.ndarray, J: np.ndarray, num_replicas: int, num_iterations: int, tenure: int,
+                   rng: np.random.Generator) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Tabu search, all replicas at once: every iteration each replica makes the best
+    single flip that is not tabu (a recently flipped spin), unless the flip beats the
+    replica's best energy so far ("aspiration"). Uphill moves are allowed, which lets
+    it walk out of local minima.
+    """
+    n = len(h)
+    spins = rng.choice(np.array([-1.0, 1.0]), size=(num_replicas, n))
+    fields = h + spins @ J
+    energies = ising_energies(spins, h, J)
+    best_spins, best_energies = spins.copy(), energies.copy()
+
+    rows = np.arange(num_replicas)
+    tabu_until = np.zeros((num_replicas, n), dtype=np.int64)
+    for iteration in range(num_iterations):
+        deltas = -2.0 * spins * fields
+        allowed = (tabu_until <= iteration) | (energies[:, None] + deltas < best_energies[:, None])
+        # A tiny random tie-break keeps the replicas from all walking the same path
+        scores = np.where(allowed, deltas, np.inf) + 1e-12 * rng.random((num_replicas, n))
+        flip = np.argmin(scores, axis=1)
+
+        delta = deltas[rows, flip]
+        change = -2.0 * spins[rows, flip]
+        spins[rows, flip] = -spins[rows, flip]
+        fields += change[:, None] * J[flip]
+        energies += delta
+        tabu_until[rows, flip] = iteration + 1 + tenure
+
+        improved = energies < best_energies
+        best_spins[improved] = spins[improved]
+        best_energies[improved] = energies[improved]
+
+    return best_spins, best_energies
+
+
+def _init_heuristic_worker(h: np.ndarray, J: np.ndarray) -> None:
+    _HEURISTIC.update(h=h, J=J)
+
+
+def _run_heuristic(method: str, num_replicas: int, options: Dict, seed) -> Tuple[np.ndarray, np.ndarray]:
+    # One restart (a batch of replicas), run inside a worker or in this process
+    h, J = _HEURISTIC["h"], _HEURISTIC["J"]
+    rng = np.random.default_rng(seed)
+    if method == "annealing":
+        return _anneal_replicas(h, J, num_replicas, options["num_sweeps"], rng)
+    return _tabu_replicas(h, J, num_replicas, options["num_iterations"], options["tenure"], rng)
+
+
+def _solve_heuristic(hamiltonian: SparsePauliOp, method: str, num_replicas: int, restarts: int,
+                     options: Dict, max_workers: Optional[int], seed: Optional[int]) -> SamplingMinimumEigensolverResult:
+    h, J, constant = _ising_arrays(hamiltonian)
+    seeds = np.random.SeedSequence(seed).spawn(restarts)
+    if max_workers is None:
+        max_workers = min(restarts, mp.cpu_count())
+
+    start_time = time.time()
+    if max_workers == 1 or restarts == 1:
+        _init_heuristic_worker(h, J)
+        batches = [_run_heuristic(method, num_replicas, options, s) for s in seeds]
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers, mp_context=mp.get_context("spawn"),
+                                 initializer=_init_heuristic_worker, initargs=(h, J)) as pool:
+            futures = [pool.submit(_run_heuristic, method, num_replicas, options, s) for s in seeds]
+            batches = [future.result() for future in futures]
+    solve_seconds = time.time() - start_time
+
+    spins = np.concatenate([batch[0] for batch in batches])
+    energies = np.concatenate([batch[1] for batch in batches]) + constant
+    return _build_heuristic_result(spins, energies, solve_seconds)
+
+
+def _build_heuristic_result(spins: np.ndarray, energies: np.ndarray,
+                            solve_seconds: float) -> SamplingMinimumEigensolverResult:
+    """
+    Pack the replicas' final (best) states like a QAOA result: 'probability' of a
+    bitstring = share of replicas that ended there. eigenvalue = lowest energy found.
+    """
+    bits = ((1 - spins) / 2).astype(np.uint8)
+    unique_bits, counts = np.unique(bits, axis=0, return_counts=True)
+    samples = PackedSamples.from_matrix(unique_bits, counts / len(bits))
+
+    best = int(np.argmin(energies))
+    position = int(np.nonzero((unique_bits == bits[best]).all(axis=1))[0][0])
+
+    result = SamplingMinimumEigensolverResult()
+    result.eigenvalue = float(energies[best])
+    result.eigenstate = LazyEigenstate(samples)
+    result.best_measurement = {
+        "state": int(samples.to_states()[position]),
+        "bitstring": samples.bitstring(position),
+        "value": complex(energies[best]),
+        "probability": float(samples.probabilities[position]),
+    }
+    result.samples = samples
+    result.solve_seconds = solve_seconds
+    return result
+
+
+def solve_with_annealing(hamiltonian: SparsePauliOp, num_replicas: int = 32, num_sweeps: int = 200,
+                         restarts: int = 1, max_workers: Optional[int] = None,
+                         seed: Optional[int] = None) -> SamplingMinimumEigensolverResult:
+    """
+    Simulated annealing on the Ising Hamiltonian (same input as solve_with_qaoa).
+    restarts x num_replicas independent runs; restarts go to separate processes.
+    """
+    print(f"[Annealing]: {restarts} x {num_replicas} replicas, {num_sweeps} sweeps, "
+          f"{hamiltonian.num_qubits} spins...")
+    result = _solve_heuristic(hamiltonian, "annealing", num_replicas, restarts,
+                              {"num_sweeps": num_sweeps}, max_workers, seed)
+    print(f"[Annealing]: Lowest energy {result.eigenvalue:.6f} ({result.solve_seconds:.2f}s).")
+    return result
+
+
+def solve_with_tabu(hamiltonian: SparsePauliOp, num_replicas: int = 16, num_iterations: Optional[int] = None,
+                    tenure: Optional[int] = None, restarts: int = 1, max_workers: Optional[int] = None,
+                    seed: Optional[int] = None) -> SamplingMinimumEigensolverResult:
+    """
+    Tabu search on the Ising Hamiltonian (same input as solve_with_qaoa).
+    Defaults: num_iterations = 20 * n, tenure = min(20, n // 4) (at least 1).
+    """
+    n = hamiltonian.num_qubits
+    if num_iterations is None:
+        num_iterations = 20 * n
+    if tenure is None:
+        tenure = max(1, min(20, n // 4))
+
+    print(f"[Tabu Search]: {restarts} x {num_replicas} replicas, {num_iterations} iterations, "
+          f"tenure {tenure}, {n} spins...")
+    result = _solve_heuristic(hamiltonian, "tabu", num_replicas, restarts,
+                              {"num_iterations": num_iterations, "tenure": tenure}, max_workers, seed)
+    print(f"[Tabu Search]: Lowest energy {result.eigenvalue:.6f} ({result.solve_seconds:.2f}s).")
+    return result
+
+
+# --- "Testing Block" ---
+# This code runs only when this file is executed directly.
+if __name__ == "__main__":
+
+    print("\n---------------------------------------------------------")
+    print(">>> 'classical_solvers.py' was RUN DIRECTLY (Testing Mode) <<<")
+    print("---------------------------------------------------------")
+
+    from itertools import combinations
+
+    # Step 1: the revolving-door order visits every portfolio once, one swap at a time
+    n_test, k_test = 9, 4
+    order = revolving_door_unrank(np.arange(comb(n_test, k_test)), n_test, k_test)
+    assert (order.sum(axis=1) == k_test).all()
+    assert len({row.tobytes() for row in order}) == comb(n_test, k_test)
+    assert (np.abs(np.diff(order.astype(int), axis=0)).sum(axis=1) == 2).all()
+    print(f"Revolving-door order OK ({len(order)} portfolios, one swap per step).")
+
+    # Step 2: compare with scoring every combination by hand (small random problem)
+    rng = np.random.default_rng(0)
+    n_test = 12
+    tickers_test = [f"T{i}" for i in range(n_test)]
+    mu_test = pd.Series(rng.normal(0.1, 0.05, n_test), index=tickers_test)
+    A = rng.normal(size=(n_test, n_test))
+    sigma_test = pd.DataFrame(A @ A.T / n_test * 0.05, index=tickers_test, columns=tickers_test)
+
+    for k_test in (1, 3, 6):
+        scores = {}
+        for chosen in combinations(range(n_test), k_test):
+            x = np.zeros(n_test)
+            x[list(chosen)] = 1.0
+            scores[chosen] = x @ sigma_test.values @ x - mu_test.values @ x
+        best = min(scores, key=scores.get)
+
+        # Small blocks on purpose, so the block boundaries are exercised too
+        stocks, score = solve_exact(mu_test, sigma_test, k_test, block_size=100, max_workers=1)
+        assert stocks == [tickers_test[i] for i in best] and abs(score - scores[best]) < 1e-9
+    print("Exact solver matches brute force.")
+
+    # Step 3: the heuristics on the same problem (via its Ising Hamiltonian)
+    from hamiltonian_converter import convert_to_ising_direct
+    hamiltonian, offset = convert_to_ising_direct(mu_test, sigma_test, k_test)
+    bounds = exact_bounds(mu_test, sigma_test, k_test, max_workers=1)
+    for solver in (solve_with_annealing, solve_with_tabu):
+        result = solver(hamiltonian, seed=1)
+        x = np.array([int(bit) for bit in result.best_measurement["bitstring"][::-1]])
+        score = x @ sigma_test.values @ x - mu_test.values @ x
+        print(f"{solver.__name__}: approximation ratio "
+              f"{approximation_ratio(score, bounds['score'], bounds['worst_score']):.4f}")
+
+    # Step 4: a bigger problem in parallel
+    n_test = 40
+    tickers_test = [f"T{i}" for i in range(n_test)]
+    mu_test = pd.Series(rng.normal(0.1, 0.05, n_test), index=tickers_test)
+    A = rng.normal(size=(n_test, n_test))
+    sigma_test = pd.DataFrame(A @ A.T / n_test * 0.05, index=tickers_test, columns=tickers_test)
+    bounds = exact_bounds(mu_test, sigma_test, k=5)
+    print(f"n=40, k=5: best {bounds['selected_stocks']} score={bounds['score']:.4f}, "
+          f"worst score={bounds['worst_score']:.4f} ({bounds['num_portfolios']} portfolios)")
@@ -5,33 +5,48 @@ This is our "Recipe Book". These are the main functions.
 """
 
 # Step 1: Import necessary tools (libraries)
-import yfinance as yf
 import pandas as pd
 import numpy as np
-from typing import List, Tuple
+from collections import deque
+from typing import List, Optional, Tuple, Union
+
+# Price sources and the on-disk cache live in their own module
+from price_cache import PriceCache, PriceSource, YahooFinanceSource
+# Stage timing / memory traces (instrumentation.py)
+from instrumentation import add_metrics, traced
+
+# Number of trading days used to annualize daily numbers
+TRADING_DAYS = 252
 
 # --- Recipe 1: Doing Data Fetch ---
-def fetch_stock_data(tickers: List[str], start_date: str, end_date: str) -> pd.DataFrame:
+@traced("fetch_stock_data")
+def fetch_stock_data(tickers: List[str], start_date: str, end_date: str,
+                     cache_dir: Optional[str] = None,
+                     source: Optional[PriceSource] = None) -> pd.DataFrame:
     """
-    Fetch stock data from Yahoo Finance.
+    Fetch stock data from Yahoo Finance (or from another PriceSource).
+    If 'cache_dir' is given, prices are read from the local cache first and
+    only the missing tickers / date ranges are fetched from the source.
     """
     print(f"[Data Pipeline]: Fetching data for {tickers}...")
     try:
-        # auto_adjust=True makes it easier to use Close prices.
-        data = yf.download(tickers, start=start_date, end=end_date, progress=False, auto_adjust=True)
+        if cache_dir is not None:
+            cache = PriceCache(cache_dir, source=source)
+            data = cache.get_prices(tickers, start_date, end_date)
+            add_metrics(cache_hits=cache.hits, cache_misses=cache.misses)
+        else:
+            if source is None:
+                source = YahooFinanceSource()
+            data = source.fetch(tickers, start_date, end_date)
         
         # If data is empty then return an empty DataFrame
         if data.empty:
             print("[Data Pipeline]: Error: No data fetched. Check tickers or date range.")
             return pd.DataFrame()
 
-        if len(tickers) == 1:
-           # For a single stock, use the 'Close' column
-            prices_df = data[['Close']].copy()
-            prices_df.columns = tickers
-        else:
-            # When auto_adjust=True, yf.download provides adjusted prices in the 'Close' column
-            prices_df = data['Close'].copy()
+        # Keep the columns in the same order as 'tickers'
+        # (the rest of the pipeline maps results back by position)
+        prices_df = data[[t for t in tickers if t in data.columns]].copy()
             
         prices_df = prices_df.dropna()
         print("[Data Pipeline]: Data fetching complete.")
@@ -42,6 +57,7 @@ def fetch_stock_data(tickers: List[str], start_date: str, end_date: str) -> pd.D
         return pd.DataFrame() 
 
 # --- Recipe 2: Calculate Mu and Sigma (Subtask 2.2) ---
+@traced("calculate_mu_and_sigma")
 def calculate_mu_and_sigma(prices_df: pd.DataFrame) -> Tuple[pd.Series, pd.DataFrame]:
     """
     Calculate annualized expected returns (mu) and covariance matrix (Sigma).
@@ -56,14 +72,213 @@ def calculate_mu_and_sigma(prices_df: pd.DataFrame) -> Tuple[pd.Series, pd.DataF
     log_returns = log_returns.dropna()
     
     # Mu (Annualized Mean Return)
-    mu = log_returns.mean() * 252
+    mu = log_returns.mean() * TRADING_DAYS
     
     # Sigma (Annualized Covariance Matrix)
-    sigma = log_returns.cov() * 252
+    sigma = log_returns.cov() * TRADING_DAYS
     
     print("[Data Pipeline]: Calculation complete.")
     return mu, sigma
 
+# --- Recipe 3: Streaming (incremental) Mu and Sigma ---
+class StreamingMuSigma:
+    """
+    Incremental version of calculate_mu_and_sigma.
+
+    Instead of rebuilding all log returns and calling .cov() every time, we keep a
+    running mean and co-moment matrix of the log returns (Welford's method).
+    Adding one new price row (or dropping the oldest return of a rolling window)
+    costs O(n^2), independent of how much history we already have.
+
+    With window=None all history is used (same result as calculate_mu_and_sigma).
+    With window=W only the last W daily log returns are used.
+    """
+
+    def __init__(self, tickers: List[str], window: Optional[int] = None):
+        if window is not None and window < 2:
+            raise ValueError("window must be at least 2 returns (or None for all history).")
+
+        self.tickers = list(tickers)
+        self.window = window
+        n = len(self.tickers)
+
+        self.count = 0                      # number of log returns in the estimate
+        self.mean = np.zeros(n)             # running mean of the daily log returns
+        self.comoment = np.zeros((n, n))    # sum of (r - mean)(r - mean)^T
+
+        self._last_prices: Optional[np.ndarray] = None
+        self._last_date = None
+        # Returns inside the rolling window (only needed when window is set)
+        self._returns = deque()
+        self._removals_since_refresh = 0
+
+    @classmethod
+    def from_prices(cls, prices_df: pd.DataFrame, window: Optional[int] = None) -> "StreamingMuSigma":
+        """
+        Create an estimator and feed it a whole price DataFrame.
+        """
+        estimator = cls(list(prices_df.columns), window=window)
+        estimator.update_many(prices_df)
+        return estimator
+
+    # --- Welford add / remove steps ---
+
+    def _add_return(self, r: np.ndarray) -> None:
+        self.count += 1
+        delta = r - self.mean
+        self.mean += delta / self.count
+        self.comoment += np.outer(delta, r - self.mean)
+
+    def _remove_return(self, r: np.ndarray) -> None:
+        if self.count == 1:
+            self.count = 0
+            self.mean[:] = 0.0
+            self.comoment[:] = 0.0
+            return
+        old_mean = self.mean.copy()
+        self.count -= 1
+        self.mean = (old_mean * (self.count + 1) - r) / self.count
+        self.comoment -= np.outer(r - self.mean, r - old_mean)
+
+    def _refresh(self) -> None:
+        # Many add/remove steps slowly collect rounding error, so once per
+        # window length we rebuild the sums from the returns we still hold.
+        returns = np.array(self._returns)
+        self.count = len(returns)
+        self.mean = returns.mean(axis=0)
+        centered = returns - self.mean
+        self.comoment = centered.T @ centered
+        self._removals_since_refresh = 0
+
+    # --- Public API ---
+
+    def update(self, prices_row, date=None) -> None:
+        """
+        Add one new row of prices (Series in ticker order, or array).
+        Rows with a missing price are skipped, like the dropna() in fetch_stock_data.
+        """
+        if isinstance(prices_row, pd.Series):
+            date = prices_row.name if date is None else date
+            prices = prices_row.reindex(self.tickers).to_numpy(dtype=float)
+        else:
+            prices = np.asarray(prices_row, dtype=float)
+
+        if np.isnan(prices).any():
+            return
+
+        if self._last_prices is not None:
+            r = np.log(prices / self._last_prices)
+            self._add_return(r)
+
+            if self.window is not None:
+                self._returns.append(r)
+                # Drop the expired return(s) of the rolling window
+                while len(self._returns) > self.window:
+                    self._remove_return(self._returns.popleft())
+                    self._removals_since_refresh += 1
+                if self._removals_since_refresh >= self.window:
+                    self._refresh()
+
+        self._last_prices = prices
+        self._last_date = date
+
+    def update_many(self, prices_df: pd.DataFrame) -> None:
+        """
+        Add many price rows at once (a DataFrame with one column per ticker).
+        """
+        prices = prices_df[self.tickers].to_numpy(dtype=float)
+        for i in range(len(prices)):
+            self.update(prices[i], date=prices_df.index[i])
+
+    def mu_and_sigma(self) -> Tuple[pd.Series, pd.DataFrame]:
+        """
+        Return annualized mu and Sigma (same scaling as calculate_mu_and_sigma).
+        """
+        if self.count < 2:
+            raise ValueError("Need at least 2 log returns to estimate Sigma.")
+
+        mu = pd.Series(self.mean * TRADING_DAYS, index=self.tickers)
+        # .cov() in pandas uses the sample covariance (divide by count - 1)
+        sigma = pd.DataFrame(self.comoment / (self.count - 1) * TRADING_DAYS,
+                             index=self.tickers, columns=self.tickers)
+        return mu, sigma
+
+# --- Recipe 4: Chunked (memory-bounded) Mu and Sigma for large universes ---
+def calculate_mu_and_sigma_chunked(prices: Union[str, np.ndarray, pd.DataFrame],
+                                   tickers: Optional[List[str]] = None,
+                                   chunk_rows: int = 1024,
+                                   block_size: int = 256,
+                                   dtype=np.float64) -> Tuple[pd.Series, pd.DataFrame]:
+    """
+    Same result as calculate_mu_and_sigma, but the prices are read in time chunks
+    and ticker blocks, and Sigma is built block by block.
+
+    'prices' is a (dates x tickers) price matrix without missing values, usually a
+    memory-mapped .npy file (a path, or np.load(path, mmap_mode='r')), for example
+    written by PriceCache.to_memmap(). A DataFrame also works.
+
+    Peak memory is about 2 * chunk_rows * block_size values (plus the n x n result),
+    not the size of the whole dataset. 'dtype' (float32 or float64) is used for the
+    per-block log returns; the running sums are always kept in float64.
+    """
+    print(f"[Data Pipeline]: Calculating mu and sigma (chunked, {np.dtype(dtype).name})...")
+
+    if isinstance(prices, str):
+        prices = np.load(prices, mmap_mode="r")
+
+    if isinstance(prices, pd.DataFrame):
+        if tickers is None:
+            tickers = list(prices.columns)
+        read_block = lambda r0, r1, c0, c1: prices.iloc[r0:r1, c0:c1].to_numpy(dtype=np.float64)
+        n_rows, n = prices.shape
+    else:
+        read_block = lambda r0, r1, c0, c1: np.asarray(prices[r0:r1, c0:c1], dtype=np.float64)
+        n_rows, n = prices.shape
+
+    if tickers is None:
+        tickers = [f"asset_{i}" for i in range(n)]
+
+    n_returns = n_rows - 1
+    if n_returns < 2:
+        raise ValueError("Need at least 3 price rows to estimate Sigma.")
+
+    # Shift every return by the first return row before summing.
+    # This keeps the "sum of squares minus squared sum" formula numerically stable.
+    shift = np.log(read_block(1, 2, 0, n)[0] / read_block(0, 1, 0, n)[0])
+
+    def block_returns(r0: int, r1: int, c0: int, c1: int) -> np.ndarray:
+        # Log returns for price rows r0..r1 (returns r0..r1-1), tickers c0..c1
+        block = read_block(r0, r1 + 1, c0, c1)
+        returns = np.log(block[1:] / block[:-1]) - shift[c0:c1]
+        return returns.astype(dtype, copy=False)
+
+    sums = np.zeros(n)
+    cross = np.zeros((n, n))
+    blocks = [(c0, min(c0 + block_size, n)) for c0 in range(0, n, block_size)]
+
+    for r0 in range(0, n_returns, chunk_rows):
+        r1 = min(r0 + chunk_rows, n_returns)
+        for bi, (i0, i1) in enumerate(blocks):
+            returns_i = block_returns(r0, r1, i0, i1)
+            sums[i0:i1] += returns_i.sum(axis=0, dtype=np.float64)
+            # Only the upper block triangle, Sigma is symmetric
+            for j0, j1 in blocks[bi:]:
+                returns_j = returns_i if j0 == i0 else block_returns(r0, r1, j0, j1)
+                cross[i0:i1, j0:j1] += (returns_i.T @ returns_j).astype(np.float64)
+
+    # Mirror the upper block triangle into the lower one
+    upper = np.triu(cross)
+    cross = upper + np.triu(upper, 1).T
+
+    shifted_mean = sums / n_returns
+    cov = (cross - n_returns * np.outer(shifted_mean, shifted_mean)) / (n_returns - 1)
+
+    mu = pd.Series((shifted_mean + shift) * TRADING_DAYS, index=tickers)
+    sigma = pd.DataFrame(cov * TRADING_DAYS, index=tickers, columns=tickers)
+
+    print("[Data Pipeline]: Calculation complete.")
+    return mu, sigma
+
 # --- "Testing Block" ---
 # This code only runs when you execute this file directly.
 # If another file (for example main_project.py) imports this module,
@@ -82,8 +297,10 @@ if __name__ == "__main__":
     start_date = '2021-01-01'
     end_date = '2023-12-31'
 
-    # Test 1: Call fetch function
-    prices = fetch_stock_data(tickers=tickers_mvp, start_date=start_date, end_date=end_date)
+    # Test 1: Call fetch function (through the local cache in '.price_cache/')
+    # The second call should be served from the cache without any download.
+    prices = fetch_stock_data(tickers=tickers_mvp, start_date=start_date, end_date=end_date, cache_dir=".price_cache")
+    prices = fetch_stock_data(tickers=tickers_mvp, start_date=start_date, end_date=end_date, cache_dir=".price_cache")
     
     if not prices.empty:
         # Test 2: Call calculation function
@@ -92,6 +309,16 @@ if __name__ == "__main__":
         print("\n--- [Test Run] Results ---")
         print("\nAnnualized Mu (μ):\n", mu)
         print("\nAnnualized Sigma (Σ):\n", sigma)
+
+        # Test 3: The streaming estimator should give the same numbers
+        # (feed the first half at once, then the rest row by row)
+        half = len(prices) // 2
+        estimator = StreamingMuSigma.from_prices(prices.iloc[:half])
+        for date, row in prices.iloc[half:].iterrows():
+            estimator.update(row)
+        mu_stream, sigma_stream = estimator.mu_and_sigma()
+        print("\nStreaming estimator matches batch result:",
+              np.allclose(mu_stream, mu) and np.allclose(sigma_stream, sigma))
     else:
         print("Test Run Failed: Data nahi mila.")
 # ...existing code...
\ No newline at end of file
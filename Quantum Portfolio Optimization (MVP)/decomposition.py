@@ -0,0 +1,269 @@
+"""
+Decomposition (decomposition.py)
+Its job is to split a universe that is too large for QAOA into small sub-problems.
+
+It sits between calculate_mu_and_sigma and create_quadratic_program:
+1. cluster the assets by correlation into blocks of at most 'max_block_size' assets,
+2. give every block a share of the budget k,
+3. solve the block sub-problems (build -> Ising -> solver -> interpret) in parallel,
+4. merge the picks and improve them with a swap local search on the FULL objective.
+"""
+
+# Step 1: Import necessary tools
+import io
+import time
+import contextlib
+import numpy as np
+import pandas as pd
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple, Union
+
+from scipy.cluster.hierarchy import linkage, to_tree
+from scipy.spatial.distance import squareform
+
+from risk_model import FactorCovariance
+
+
+# --- Step 1: Clustering ---
+
+def cluster_assets(sigma: Union[pd.DataFrame, FactorCovariance], max_block_size: int) -> List[List[int]]:
+    """
+    Group asset positions into blocks of at most 'max_block_size', keeping strongly
+    correlated assets together (they interact most in the risk term).
+
+    Average-linkage clustering on the distance sqrt((1 - rho) / 2); the tree is cut
+    top-down until every block fits, then neighbouring small blocks are merged again
+    while they still fit.
+    """
+    values = sigma.to_dense().values if isinstance(sigma, FactorCovariance) else np.asarray(sigma, dtype=float)
+    n = len(values)
+    if n <= max_block_size:
+        return [list(range(n))]
+
+    std = np.sqrt(np.clip(np.diag(values), 1e-300, None))
+    correlation = np.clip(values / np.outer(std, std), -1.0, 1.0)
+    distance = np.sqrt(0.5 * (1.0 - correlation))
+    np.fill_diagonal(distance, 0.0)
+    tree = to_tree(linkage(squareform(distance, checks=False), method="average"))
+
+    # Cut: walk down the tree until a subtree is small enough
+    leaves = []
+    stack = [tree]
+    while stack:
+        node = stack.pop()
+        if node.get_count() <= max_block_size:
+            leaves.append(node.pre_order())
+        else:
+            stack.extend([node.get_right(), node.get_left()])
+
+    # Merge neighbouring (in tree order) blocks while they fit
+    blocks = []
+    for leaf in leaves:
+        if blocks and len(blocks[-1]) + len(leaf) <= max_block_size:
+            blocks[-1] = blocks[-1] + leaf
+        else:
+            blocks.append(list(leaf))
+    return [sorted(block) for block in blocks]
+
+
+# --- Step 2: Budget allocation ---
+
+def allocate_budget(mu: pd.Series, sigma: Union[pd.DataFrame, FactorCovariance], blocks: List[List[int]],
+                    k: int, q: float = 1.0) -> List[int]:
+    """
+    Give each block a share of k: rank all assets by their stand-alone merit
+    mu_i - q * Σ_ii and count how many of the overall top k fall into each block.
+    """
+    variance = sigma.diagonal() if isinstance(sigma, FactorCovariance) else np.diag(np.asarray(sigma, dtype=float))
+    merit = np.asarray(mu, dtype=float) - q * variance
+    top = np.argsort(-merit, kind="stable")[:k]
+
+    block_of = np.empty(len(merit), dtype=np.int64)
+    for b, block in enumerate(blocks):
+        block_of[block] = b
+    return np.bincount(block_of[top], minlength=len(blocks)).tolist()
+
+
+# --- Step 3: Block sub-problems (run in the workers) ---
+
+def _solve_block(tickers: List[str], mu_values: np.ndarray, sigma_values: np.ndarray, k: int, q: float,
+                 solver: str, solver_options: Dict, verbose: bool) -> Dict:
+    # Imported here: the workers are fresh processes
+    from problem_builder import create_quadratic_program
+    from hamiltonian_converter import convert_to_ising_direct
+    from qaoa_solver import interpret_result
+    from solvers import get_solver
+
+    start_time = time.time()
+    mu = pd.Series(mu_values, index=tickers)
+    sigma = pd.DataFrame(sigma_values, index=tickers, columns=tickers)
+
+    if k == len(tickers):
+        # Nothing to choose
+        return {"selected_stocks": list(tickers), "score": None, "solve_seconds": 0.0}
+
+    options = dict(solver_options)
+    if solver == "qaoa":
+        # The block's own budget (needed by backend="subspace", early-stopped readout
+        # and the parameter store), like frontier.py does
+        options.update(k=k, q=q)
+
+    with contextlib.nullcontext() if verbose else contextlib.redirect_stdout(io.StringIO()):
+        qp = create_quadratic_program(mu, sigma, k=k, q=q)
+        hamiltonian, offset = convert_to_ising_direct(mu, sigma, k, q=q)
+        result = get_solver(solver)(hamiltonian, **options)
+        selected_stocks, score = interpret_result(result, tickers, qp, rank_by="objective")
+
+    return {"selected_stocks": selected_stocks, "score": float(score), "solve_seconds": time.time() - start_time}
+
+
+# --- Step 4: Local search on the full problem ---
+
+def swap_local_search(x: np.ndarray, mu: np.ndarray, Q: np.ndarray,
+                      max_iterations: int = 1000) -> Tuple[np.ndarray, int]:
+    """
+    Improve a 0/1 portfolio x for f(x) = x^T Q x - mu^T x by swapping one held asset
+    for one not held, always taking the best improving swap, until none is left.
+    All k * (n - k) swaps are scored at once:
+        delta(out i, in j) = mu_i - mu_j + 2 (g_j - g_i) + Q_ii + Q_jj - 2 Q_ij,  g = Q x.
+    Returns (improved x, number of swaps made). The number of ones never changes.
+    """
+    x = np.asarray(x, dtype=float).copy()
+    diagonal = np.diag(Q)
+    g = Q @ x
+    swaps = 0
+
+    for _ in range(max_iterations):
+        held, free = np.nonzero(x > 0.5)[0], np.nonzero(x < 0.5)[0]
+        if len(held) == 0 or len(free) == 0:
+            break
+        delta = ((mu[held] - 2.0 * g[held] + diagonal[held])[:, None]
+                 + (-mu[free] + 2.0 * g[free] + diagonal[free])[None, :]
+                 - 2.0 * Q[np.ix_(held, free)])
+        best = np.unravel_index(np.argmin(delta), delta.shape)
+        if delta[best] >= -1e-12:
+            break
+        i, j = held[best[0]], free[best[1]]
+        x[i], x[j] = 0.0, 1.0
+        g += Q[:, j] - Q[:, i]
+        swaps += 1
+
+    return x, swaps
+
+
+# --- The decomposition API ---
+
+def solve_decomposed(mu: pd.Series, sigma: Union[pd.DataFrame, FactorCovariance], k: int, q: float = 1.0,
+                     max_block_size: int = 20, solver: str = "qaoa", max_workers: Optional[int] = None,
+                     verbose: bool = False, **solver_options) -> Dict:
+    """
+    Solve a large problem through block sub-problems (see the module docstring).
+
+    solver / **solver_options: which solver the blocks use (solvers.py), e.g.
+    solver="qaoa", backend="diagonal", reps=2. max_block_size is the qubit limit per block.
+
+    Returns {"selected_stocks", "score" (full objective, same as qp.objective.evaluate),
+             "merged_score" (before the local search), "local_search_swaps",
+             "blocks" (ticker lists), "allocation" (k per block), "block_results"}.
+    """
+    tickers = list(mu.index)
+    mu_values = np.asarray(mu, dtype=float)
+    sigma_values = sigma.to_dense().values if isinstance(sigma, FactorCovariance) else np.asarray(sigma, dtype=float)
+    Q = q * sigma_values
+
+    blocks = cluster_assets(sigma, max_block_size)
+    allocation = allocate_budget(mu, sigma, blocks, k, q=q)
+    print(f"[Decomposition]: {len(tickers)} assets -> {len(blocks)} blocks "
+          f"(largest {max(len(block) for block in blocks)}), budget split {allocation}.")
+
+    # Blocks that get no budget need no solve
+    tasks = [(b, block) for b, block in enumerate(blocks) if allocation[b] > 0]
+    if max_workers is None:
+        max_workers = min(len(tasks), mp.cpu_count())
+
+    def task_args(b: int, block: List[int]) -> Tuple:
+        return ([tickers[i] for i in block], mu_values[block], sigma_values[np.ix_(block, block)],
+                allocation[b], q, solver, solver_options, verbose)
+
+    start_time = time.time()
+    block_results: Dict[int, Dict] = {}
+    if max_workers <= 1:
+        for b, block in tasks:
+            block_results[b] = _solve_block(*task_args(b, block))
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers, mp_context=mp.get_context("spawn")) as pool:
+            futures = {b: pool.submit(_solve_block, *task_args(b, block)) for b, block in tasks}
+            for b, future in futures.items():
+                block_results[b] = future.result()
+    print(f"[Decomposition]: {len(tasks)} block sub-problems solved in {time.time() - start_time:.2f}s.")
+
+    # Merge the block picks into one portfolio
+    position = {ticker: i for i, ticker in enumerate(tickers)}
+    x = np.zeros(len(tickers))
+    for result in block_results.values():
+        x[[position[ticker] for ticker in result["selected_stocks"]]] = 1.0
+    merged_score = float(x @ Q @ x - mu_values @ x)
+
+    if int(x.sum()) != k:
+        # A block solver returned an infeasible pick: fix the count greedily by merit first
+        merit = mu_values - np.diag(Q)
+        order = np.argsort(-merit, kind="stable")
+        while x.sum() > k:
+            x[[i for i in order[::-1] if x[i] > 0.5][0]] = 0.0
+        while x.sum() < k:
+            x[[i for i in order if x[i] < 0.5][0]] = 1.0
+        print("[Decomposition]: Warning: merged portfolio had the wrong size, repaired it.")
+
+    x, swaps = swap_local_search(x, mu_values, Q)
+    score = float(x @ Q @ x - mu_values @ x)
+    print(f"[Decomposition]: Merged score {merged_score:.6f} -> {score:.6f} after {swaps} local-search swap(s).")
+
+    return {
+        "selected_stocks": [tickers[i] for i in np.nonzero(x)[0]],
+        "score": score,
+        "merged_score": merged_score,
+        "local_search_swaps": swaps,
+        "blocks": [[tickers[i] for i in block] for block in blocks],
+        "allocation": allocation,
+        "block_results": block_results,
+    }
+
+
+# --- "Testing Block" ---
+# This code runs only when this file is executed directly.
+if __name__ == "__main__":
+
+    print("\n---------------------------------------------------------")
+    print(">>> 'decomposition.py' was RUN DIRECTLY (Testing Mode) <<<")
+    print("---------------------------------------------------------")
+
+    from classical_solvers import exact_bounds, approximation_ratio
+
+    # A random market with 4 correlated sectors
+    rng = np.random.default_rng(0)
+    n_test, k_test = 24, 5
+    tickers_test = [f"T{i}" for i in range(n_test)]
+    sector = rng.integers(0, 4, n_test)
+    loadings = np.eye(4)[sector] * 0.2 + rng.normal(0.0, 0.03, (n_test, 4))
+    sigma_test = pd.DataFrame(loadings @ loadings.T + np.diag(rng.uniform(0.01, 0.05, n_test)),
+                              index=tickers_test, columns=tickers_test)
+    mu_test = pd.Series(rng.normal(0.1, 0.05, n_test), index=tickers_test)
+
+    blocks = cluster_assets(sigma_test, max_block_size=8)
+    assert sorted(i for block in blocks for i in block) == list(range(n_test))
+    assert all(len(block) <= 8 for block in blocks)
+    print(f"Blocks: {blocks}")
+
+    decomposed = solve_decomposed(mu_test, sigma_test, k_test, max_block_size=8,
+                                  solver="qaoa", backend="diagonal", reps=2, seed=1, max_workers=1)
+    bounds = exact_bounds(mu_test, sigma_test, k_test, max_workers=1)
+    print(f"Decomposed: {decomposed['selected_stocks']} score={decomposed['score']:.4f}")
+    print(f"Exact:      {bounds['selected_stocks']} score={bounds['score']:.4f}")
+    print(f"Approximation ratio: {approximation_ratio(decomposed['score'], bounds['score'], bounds['worst_score']):.4f}")
+
+    # The constraint-preserving backend needs each block's budget k
+    subspace = solve_decomposed(mu_test, sigma_test, k_test, max_block_size=8,
+                                solver="qaoa", backend="subspace", reps=2, seed=1, max_workers=1)
+    assert len(subspace["selected_stocks"]) == k_test
+    print(f"Subspace:   {subspace['selected_stocks']} score={subspace['score']:.4f}")
@@ -0,0 +1,268 @@
+"""
+Efficient Frontier (frontier.py)
+Its job is to run the whole pipeline (build -> convert -> QAOA -> interpret) for a grid
+of risk-aversion values q and budgets k, and return all the results as ONE table.
+
+- The grid is split into "chains": runs of neighbouring q values with the same k.
+  Inside a chain, each point starts QAOA from the previous point's optimal angles.
+- Chains run in parallel on a process pool (every core gets work).
+- mu and Σ are put into shared memory once; the workers read them from there instead
+  of receiving a pickled copy with every task.
+"""
+
+# Step 1: Import necessary tools
+import io
+import math
+import time
+import contextlib
+import numpy as np
+import pandas as pd
+import multiprocessing as mp
+from multiprocessing import shared_memory
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+from risk_model import FactorCovariance
+
+# Per-worker state, filled in by _init_worker (one copy per process)
+_WORKER: Dict = {}
+
+
+# --- Shared memory helpers ---
+
+def _to_shared(array: np.ndarray) -> Tuple[shared_memory.SharedMemory, Tuple]:
+    # Copy an array into a new shared memory block, return the block and its description
+    array = np.ascontiguousarray(array, dtype=np.float64)
+    block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+    np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)[...] = array
+    return block, (block.name, array.shape, array.dtype.str)
+
+
+def _from_shared(description: Tuple) -> Tuple[shared_memory.SharedMemory, np.ndarray]:
+    # Attach to a block made by _to_shared (no copy). Keep the block alive while the array is used.
+    name, shape, dtype = description
+    block = shared_memory.SharedMemory(name=name)
+    array = np.ndarray(shape, dtype=np.dtype(dtype), buffer=block.buf)
+    array.flags.writeable = False
+    return block, array
+
+
+def _init_worker(descriptions: Dict[str, Tuple], tickers: List[str], options: Dict) -> None:
+    """
+    Runs once in every worker process: attach to the shared mu / Σ and rebuild
+    the pandas objects on top of the shared buffers.
+    """
+    blocks, arrays = [], {}
+    for key, description in descriptions.items():
+        block, arrays[key] = _from_shared(description)
+        blocks.append(block)
+
+    _WORKER["blocks"] = blocks
+    _WORKER["mu"] = pd.Series(arrays["mu"], index=tickers, copy=False)
+    if "sigma" in arrays:
+        _WORKER["sigma"] = pd.DataFrame(arrays["sigma"], index=tickers, columns=tickers, copy=False)
+    else:
+        _WORKER["sigma"] = FactorCovariance(arrays["loadings"], arrays["specific_var"], tickers=tickers)
+    _WORKER["tickers"] = tickers
+    _WORKER["options"] = options
+
+
+# --- Work done inside the workers ---
+
+def _portfolio_risk(x: np.ndarray, sigma: Union[pd.DataFrame, FactorCovariance]) -> float:
+    if isinstance(sigma, FactorCovariance):
+        return float(sigma.quad_form(x)[0])
+    return float(x @ sigma.values @ x)
+
+
+def _solve_chain(chain: List[Tuple[int, float, Optional[int]]]) -> List[Dict]:
+    """
+    Solve the grid points of one chain (same k, increasing q) in order.
+    Each point is warm-started from the optimal angles of the point before it.
+    """
+    # Imported here so the parent process does not need qiskit just to split the grid
+    from problem_builder import create_quadratic_program
+    from hamiltonian_converter import convert_to_ising_direct
+    from qaoa_solver import solve_with_qaoa, interpret_result
+    from parameter_store import hamiltonian_scale
+
+    mu, sigma, tickers = _WORKER["mu"], _WORKER["sigma"], _WORKER["tickers"]
+    options = dict(_WORKER["options"])
+    verbose = options.pop("verbose")
+
+    rows = []
+    previous_point, previous_scale = None, None
+    for k, q, seed in chain:
+        start_time = time.time()
+        with contextlib.nullcontext() if verbose else contextlib.redirect_stdout(io.StringIO()):
+            qp = create_quadratic_program(mu, sigma, k=k, q=q)
+            # Same Hamiltonian as convert_to_ising(qp), without going through the QUBO converter
+            hamiltonian, offset = convert_to_ising_direct(mu, sigma, k, q=q)
+            scale = hamiltonian_scale(hamiltonian)
+
+            initial_point = None
+            if previous_point is not None:
+                # gamma * scale is what carries over between Hamiltonians of different size
+                initial_point = np.array(previous_point, dtype=float)
+                reps = len(initial_point) // 2
+                initial_point[reps:] *= previous_scale / scale
+
+            result = solve_with_qaoa(hamiltonian, initial_point=initial_point, seed=seed, k=k, q=q, **options)
+            selected_stocks, score = interpret_result(result, tickers, qp, rank_by="objective")
+
+        x = np.array([1.0 if ticker in selected_stocks else 0.0 for ticker in tickers])
+        variance = _portfolio_risk(x, sigma)
+        rows.append({
+            "k": k,
+            "q": q,
+            "selected_stocks": selected_stocks,
+            "expected_return": float(mu.values @ x),
+            "variance": variance,
+            "volatility": math.sqrt(max(variance, 0.0)),
+            "objective": float(score),
+            "feasible": len(selected_stocks) == k,
+            "energy": float(np.real(result.eigenvalue)) + offset,
+            "cost_function_evals": int(result.cost_function_evals),
+            "warm_started": initial_point is not None,
+            "solve_seconds": time.time() - start_time,
+            "optimal_point": np.asarray(result.optimal_point, dtype=float).tolist(),
+        })
+        previous_point, previous_scale = result.optimal_point, scale
+
+    return rows
+
+
+# --- Grid splitting ---
+
+def _make_chains(q_values: Sequence[float], k_values: Sequence[int], chain_length: int,
+                 seed: Optional[int]) -> List[List[Tuple[int, float, Optional[int]]]]:
+    # For every k: the sorted q values cut into runs of 'chain_length' neighbours
+    chains = []
+    index = 0
+    for k in k_values:
+        points = []
+        for q in sorted(q_values):
+            points.append((int(k), float(q), None if seed is None else seed + index))
+            index += 1
+        for start in range(0, len(points), chain_length):
+            chains.append(points[start:start + chain_length])
+    return chains
+
+
+def mark_frontier(frontier: pd.DataFrame) -> pd.DataFrame:
+    """
+    Add an 'on_frontier' column: True for feasible points that no other feasible point
+    beats on both return (higher) and variance (lower).
+    """
+    frontier = frontier.copy()
+    frontier["on_frontier"] = False
+    feasible = frontier[frontier["feasible"]].sort_values(["variance", "expected_return"],
+                                                          ascending=[True, False])
+    # Walking up in variance, a point is efficient if it has a new best return
+    # (rows with the same portfolio as the last efficient one are efficient too)
+    best_return, best_variance = -np.inf, None
+    efficient = []
+    for index, row in feasible.iterrows():
+        if row["expected_return"] > best_return or (row["expected_return"] == best_return
+                                                     and row["variance"] == best_variance):
+            efficient.append(index)
+            best_return, best_variance = row["expected_return"], row["variance"]
+    frontier.loc[efficient, "on_frontier"] = True
+    return frontier
+
+
+# --- The frontier API ---
+
+def compute_frontier(mu: pd.Series, sigma: Union[pd.DataFrame, FactorCovariance],
+                     q_values: Sequence[float], k_values: Sequence[int],
+                     backend: str = "diagonal", reps: int = 1, max_workers: Optional[int] = None,
+                     chain_length: Optional[int] = None, seed: Optional[int] = None,
+                     verbose: bool = False, **solve_options) -> pd.DataFrame:
+    """
+    Run the pipeline for every (q, k) in the grid and return one row per point
+    (see _solve_chain for the columns, plus 'on_frontier' from mark_frontier).
+
+    backend / reps / **solve_options are passed to solve_with_qaoa for every point.
+    max_workers:  processes to use (default: all cores).
+    chain_length: grid points per warm-start chain. By default the grid is cut into
+                  about two chains per worker, so every core stays busy.
+    seed:         base seed; point i uses seed + i, so a sweep is reproducible.
+    verbose:      show the pipeline's own print messages from the workers.
+    """
+    tickers = list(mu.index)
+    q_values, k_values = list(q_values), list(k_values)
+    if max_workers is None:
+        max_workers = mp.cpu_count()
+
+    total_points = len(q_values) * len(k_values)
+    if chain_length is None:
+        chain_length = max(1, math.ceil(total_points / (2 * max_workers)))
+    chains = _make_chains(q_values, k_values, chain_length, seed)
+
+    print(f"[Frontier]: {total_points} grid points in {len(chains)} chains on {max_workers} worker(s)...")
+
+    # Step A: mu and Σ go into shared memory once
+    arrays = {"mu": mu.values}
+    if isinstance(sigma, FactorCovariance):
+        arrays["loadings"] = sigma.loadings
+        arrays["specific_var"] = sigma.specific_var
+    else:
+        arrays["sigma"] = np.asarray(sigma, dtype=float)
+
+    blocks, descriptions = [], {}
+    try:
+        for key, array in arrays.items():
+            block, descriptions[key] = _to_shared(array)
+            blocks.append(block)
+
+        options = dict(solve_options, backend=backend, reps=reps, verbose=verbose)
+
+        # Step B: run the chains ("spawn" gives clean workers that only see the shared inputs)
+        rows = []
+        with ProcessPoolExecutor(max_workers=max_workers, mp_context=mp.get_context("spawn"),
+                                 initializer=_init_worker, initargs=(descriptions, tickers, options)) as pool:
+            futures = [pool.submit(_solve_chain, chain) for chain in chains]
+            for done, future in enumerate(as_completed(futures), start=1):
+                rows.extend(future.result())
+                print(f"[Frontier]: {done}/{len(chains)} chains done.")
+    finally:
+        for block in blocks:
+            block.close()
+            block.unlink()
+
+    # Step C: one table, sorted like the grid
+    frontier = pd.DataFrame(rows).sort_values(["k", "q"]).reset_index(drop=True)
+    return mark_frontier(frontier)
+
+
+# --- "Testing Block" ---
+# This code runs only when this file is executed directly.
+if __name__ == "__main__":
+
+    print("\n---------------------------------------------------------")
+    print(">>> 'frontier.py' was RUN DIRECTLY (Testing Mode) <<<")
+    print("---------------------------------------------------------")
+
+    try:
+        from data_pipeline import fetch_stock_data, calculate_mu_and_sigma
+        print("Note: Imported 'data_pipeline.py'.")
+    except ImportError:
+        print("FATAL ERROR: 'data_pipeline.py' file not found. Cannot run test.")
+        exit()
+
+    tickers_test = ['AAPL', 'GOOG', 'MSFT', 'AMZN', 'NVDA', 'META']
+    prices = fetch_stock_data(tickers=tickers_test, start_date='2021-01-01', end_date='2023-12-31',
+                              cache_dir=".price_cache")
+
+    if prices is not None and not prices.empty:
+        mu, sigma = calculate_mu_and_sigma(prices)
+
+        frontier = compute_frontier(mu, sigma, q_values=np.linspace(0.0, 5.0, 6), k_values=[2, 3],
+                                    backend="diagonal", reps=2, seed=7)
+
+        print("\n--- FRONTIER ---")
+        columns = ["k", "q", "selected_stocks", "expected_return", "volatility", "feasible",
+                   "warm_started", "on_frontier"]
+        print(frontier[columns].to_string())
+    else:
+        print("Test failed: No data retrieved.")
@@ -5,10 +5,17 @@ and convert it into an Ising Hamiltonian (input for QAOA).
 """
 
 # Step 1: Import required tools
+import numpy as np
+import pandas as pd
 from qiskit_optimization import QuadraticProgram
 # Pauli operators (Z) representation
-from qiskit.quantum_info import SparsePauliOp
-from typing import Tuple
+from qiskit.quantum_info import PauliList, SparsePauliOp
+from typing import Optional, Tuple, Union
+
+# Low-rank factor model for Sigma
+from risk_model import FactorCovariance
+# Stage timing / memory traces (instrumentation.py)
+from instrumentation import traced
 
 # ***** FIX: Import converter to turn constrained problem into an unconstrained QUBO *****
 from qiskit_optimization.converters import QuadraticProgramToQubo
@@ -16,6 +23,7 @@ from qiskit_optimization.converters import QuadraticProgramToQubo
 
 # --- Function to Convert to Ising ---
 
+@traced("convert_to_ising")
 def convert_to_ising(qp: QuadraticProgram) -> Tuple[SparsePauliOp, float]:
     """
     Take a QuadraticProgram object and convert it to
@@ -44,6 +52,138 @@ def convert_to_ising(qp: QuadraticProgram) -> Tuple[SparsePauliOp, float]:
     # Return the Hamiltonian and offset
     return hamiltonian, offset
 
+# --- Direct NumPy path: (mu, Sigma, k, q) -> QUBO -> Ising ---
+# Same numbers as create_quadratic_program + convert_to_ising, but built with a few
+# array operations instead of walking Qiskit's dictionaries term by term.
+
+def _sigma_array(sigma: Union[pd.DataFrame, np.ndarray, FactorCovariance]) -> np.ndarray:
+    # The Ising couplings J_ij need every pair (i, j), so a factor model is made dense here
+    if isinstance(sigma, FactorCovariance):
+        return sigma.to_dense().values
+    return np.asarray(sigma, dtype=float)
+
+
+def auto_penalty(mu: Union[pd.Series, np.ndarray], sigma: Union[pd.DataFrame, np.ndarray, FactorCovariance],
+                 q: float = 1.0) -> float:
+    """
+    The penalty QuadraticProgramToQubo picks for our problem:
+    1 + (range of the linear part) + (range of the quadratic part) of the objective.
+    """
+    sigma = _sigma_array(sigma)
+    mu = np.asarray(mu, dtype=float)
+    # Qiskit stores x^T (q Σ) x as upper-triangular terms: q*Σ_ii and q*(Σ_ij + Σ_ji)
+    quadratic_upper = np.triu(q * (sigma + sigma.T), 1)
+    return 1.0 + np.abs(mu).sum() + np.abs(q * np.diag(sigma)).sum() + np.abs(quadratic_upper).sum()
+
+
+def build_qubo(mu: Union[pd.Series, np.ndarray], sigma: Union[pd.DataFrame, np.ndarray, FactorCovariance],
+               k: int, q: float = 1.0, penalty: Optional[float] = None) -> Tuple[np.ndarray, np.ndarray, float]:
+    """
+    Build the QUBO for: minimize q*x^T Σ x - mu^T x + penalty*(sum(x) - k)^2.
+    Returns (linear, quadratic, constant) with 'quadratic' upper-triangular,
+    i.e. objective = constant + linear.x + sum_{i<=j} quadratic_ij x_i x_j.
+    """
+    sigma = _sigma_array(sigma)
+    mu = np.asarray(mu, dtype=float)
+    n = len(mu)
+    if penalty is None:
+        penalty = auto_penalty(mu, sigma, q)
+
+    # penalty*(sum(x) - k)^2 = penalty*k^2 - 2*penalty*k*sum(x) + penalty*sum_ij x_i x_j
+    linear = -mu - 2.0 * penalty * k
+    quadratic = np.triu(q * (sigma + sigma.T) + 2.0 * penalty, 1)
+    quadratic[np.diag_indices(n)] = q * np.diag(sigma) + penalty
+    constant = penalty * k ** 2
+    return linear, quadratic, float(constant)
+
+
+def qubo_to_ising(linear: np.ndarray, quadratic: np.ndarray, constant: float = 0.0) -> Tuple[np.ndarray, np.ndarray, float]:
+    """
+    Substitute x_i = (1 - Z_i) / 2 into a QUBO.
+    Returns (h, J, offset) with energy = offset + sum_i h_i Z_i + sum_{i<j} J_ij Z_i Z_j
+    (J is upper-triangular), same convention as QuadraticProgram.to_ising().
+    """
+    diag = np.diag(quadratic)
+    off_diag = np.triu(quadratic, 1)
+    # Every pair (i, j) adds -Q_ij/4 to both h_i and h_j
+    pair_sums = off_diag.sum(axis=1) + off_diag.sum(axis=0)
+
+    h = -linear / 2.0 - diag / 2.0 - pair_sums / 4.0
+    J = off_diag / 4.0
+    offset = constant + linear.sum() / 2.0 + diag.sum() / 2.0 + off_diag.sum() / 4.0
+    return h, J, float(offset)
+
+
+def ising_to_pauli_op(h: np.ndarray, J: np.ndarray) -> SparsePauliOp:
+    """
+    Turn Ising coefficients into a SparsePauliOp with a single bulk constructor call.
+    Term order: Z_0..Z_{n-1}, then Z_i Z_j for i<j (row by row). Zero terms are dropped.
+    """
+    n = len(h)
+    rows, cols = np.triu_indices(n, 1)
+    couplings = J[rows, cols]
+
+    # Symplectic z-part of every Pauli term (x-part is all False: only Z operators)
+    z_single = np.eye(n, dtype=bool)
+    z_pairs = np.zeros((len(rows), n), dtype=bool)
+    z_pairs[np.arange(len(rows)), rows] = True
+    z_pairs[np.arange(len(rows)), cols] = True
+
+    z = np.vstack([z_single, z_pairs])
+    coeffs = np.concatenate([h, couplings])
+    keep = coeffs != 0.0
+    if not keep.any():
+        return SparsePauliOp("I" * max(1, n), 0)
+
+    z = z[keep]
+    paulis = PauliList.from_symplectic(z, np.zeros_like(z))
+    return SparsePauliOp(paulis, coeffs[keep].astype(complex))
+
+
+def ising_from_pauli_op(hamiltonian: SparsePauliOp) -> Tuple[np.ndarray, np.ndarray, float]:
+    """
+    Read (h, J, constant) back out of a Hamiltonian made of I, Z and ZZ terms
+    (the reverse of ising_to_pauli_op). J is upper-triangular.
+    """
+    n = hamiltonian.num_qubits
+    z = hamiltonian.paulis.z
+    if hamiltonian.paulis.x.any():
+        raise ValueError("Hamiltonian must only contain I and Z operators.")
+
+    coeffs = np.real(hamiltonian.coeffs)
+    weights = z.sum(axis=1)
+    if (weights > 2).any():
+        raise ValueError("Hamiltonian must only contain Z and ZZ terms (no 3-body terms).")
+
+    h = np.zeros(n)
+    J = np.zeros((n, n))
+    constant = float(coeffs[weights == 0].sum())
+
+    single = weights == 1
+    np.add.at(h, np.argmax(z[single], axis=1), coeffs[single])
+
+    pairs = weights == 2
+    # For a ZZ term, argmax finds the lower qubit; flipping the row finds the upper one
+    low = np.argmax(z[pairs], axis=1)
+    high = n - 1 - np.argmax(z[pairs][:, ::-1], axis=1)
+    np.add.at(J, (low, high), coeffs[pairs])
+    return h, J, constant
+
+
+@traced("convert_to_ising")
+def convert_to_ising_direct(mu: Union[pd.Series, np.ndarray], sigma: Union[pd.DataFrame, np.ndarray, FactorCovariance],
+                            k: int, q: float = 1.0, penalty: Optional[float] = None) -> Tuple[SparsePauliOp, float]:
+    """
+    NumPy version of create_quadratic_program + convert_to_ising.
+    Returns the same Ising Hamiltonian (SparsePauliOp) and offset.
+    """
+    print(f"[Converter]: Building QUBO and Ising Hamiltonian directly (n={len(mu)}, k={k}, q={q})...")
+    linear, quadratic, constant = build_qubo(mu, sigma, k, q=q, penalty=penalty)
+    h, J, offset = qubo_to_ising(linear, quadratic, constant)
+    hamiltonian = ising_to_pauli_op(h, J)
+    print("[Converter]: Conversion complete.")
+    return hamiltonian, offset
+
 # --- "Testing Block" ---
 # This code only runs when you execute this file directly.
 if __name__ == "__main__":
@@ -69,6 +209,20 @@ if __name__ == "__main__":
         print("FATAL ERROR: 'problem_builder.py' file not found. Cannot run test.")
         exit()
 
+    # --- Step 0: Offline check (synthetic mu / Σ, no download needed) ---
+    print("\n--- [Test Run] Step 0: convert_to_ising_direct vs convert_to_ising (synthetic data) ---")
+    from synthetic_market import synthetic_mu_sigma
+
+    for n_test, k_test, q_test in [(4, 2, 1.0), (6, 3, 0.5), (8, 1, 2.0)]:
+        mu_test, sigma_test = synthetic_mu_sigma(n_test, seed=n_test)
+        qp_test = create_quadratic_program(mu_test, sigma_test, k=k_test, q=q_test)
+        reference, reference_offset = convert_to_ising(qp_test)
+        direct, direct_offset = convert_to_ising_direct(mu_test, sigma_test, k=k_test, q=q_test)
+        assert list(reference.paulis.to_labels()) == list(direct.paulis.to_labels())
+        assert np.allclose(reference.coeffs, direct.coeffs, rtol=1e-12, atol=1e-12)
+        assert np.isclose(reference_offset, direct_offset, rtol=1e-12, atol=1e-12)
+        print(f"n={n_test}, k={k_test}, q={q_test}: same Pauli terms, coefficients and offset.")
+
     # --- Step 1: Data Laana  ---
     print("\n--- [Test Run] Step 1: Data Laana ---")
     tickers_mvp = ['AAPL', 'GOOG', 'MSFT', 'AMZN'] # n=4
@@ -99,6 +253,17 @@ if __name__ == "__main__":
             print("This Hamiltonian (H) is the main input for QAOA.")
             print(hamiltonian)
             print(f"\nOffset (energy constant): {offset}")
+
+            # --- Step 5: Check the direct NumPy path gives the same Hamiltonian ---
+            print("\n--- [Test Run] Step 5: Compare with convert_to_ising_direct ---")
+            hamiltonian_direct, offset_direct = convert_to_ising_direct(mu, sigma, k=k_budget, q=q_risk)
+            same_terms = list(hamiltonian.paulis.to_labels()) == list(hamiltonian_direct.paulis.to_labels())
+            same_coeffs = np.allclose(hamiltonian.coeffs, hamiltonian_direct.coeffs, rtol=1e-12, atol=1e-12)
+            same_offset = np.isclose(offset, offset_direct, rtol=1e-12, atol=1e-12)
+            if same_terms and same_coeffs and same_offset:
+                print("Direct path matches: same Pauli terms, coefficients and offset.")
+            else:
+                print("Test Run Failed: direct path does NOT match the QuadraticProgramToQubo path.")
         else:
             print("Test Run Failed: Hamiltonian conversion did not succeed.")
         
@@ -0,0 +1,289 @@
+"""
+Instrumentation (instrumentation.py)
+Its job is to measure every stage of the pipeline, so a slow run can be diagnosed.
+
+The six stages (fetch_stock_data, calculate_mu_and_sigma, create_quadratic_program,
+convert_to_ising, solve_with_qaoa, interpret_result) are wrapped with @traced(stage).
+When tracing is on, every call writes ONE JSON line to the trace file:
+
+    {"stage", "function", "n", "wall_seconds", "peak_rss_mb", "peak_rss_growth_mb",
+     "parent", "pid", "start", ... stage metrics (evaluations, circuit depth/width, cache hits)}
+
+Tracing is off by default; then a wrapped call only costs one extra function call.
+Turn it on with enable_tracing(path) or the environment variable QPO_TRACE=<path>
+(QPO_PROFILE_DIR=<dir> adds a cProfile .prof file per call). Both are inherited by
+worker processes, so frontier / backtest / decomposition runs are traced too.
+"""
+
+# Step 1: Import necessary tools
+import os
+import sys
+import json
+import time
+import cProfile
+import functools
+import threading
+import pandas as pd
+from typing import Callable, Dict, Optional
+
+try:
+    import resource  # Unix only
+except ImportError:
+    resource = None
+
+# Environment variables that switch tracing on (read at import, so workers pick them up)
+TRACE_ENV = "QPO_TRACE"
+PROFILE_ENV = "QPO_PROFILE_DIR"
+
+_STATE: Dict = {"path": os.environ.get(TRACE_ENV) or None, "profile_dir": os.environ.get(PROFILE_ENV) or None,
+                "calls": 0}
+# Stack of the records of the stages currently running (per thread)
+_ACTIVE = threading.local()
+_WRITE_LOCK = threading.Lock()
+
+
+# --- Switching tracing on and off ---
+
+def enable_tracing(path: str = "trace.jsonl", profile_dir: Optional[str] = None) -> None:
+    """
+    Append one JSON line per traced call to 'path' ("-" = standard error).
+    With 'profile_dir', every call is also run under cProfile and its stats saved there.
+    """
+    _STATE["path"] = path
+    _STATE["profile_dir"] = profile_dir
+    os.environ[TRACE_ENV] = path
+    if profile_dir is not None:
+        os.makedirs(profile_dir, exist_ok=True)
+        os.environ[PROFILE_ENV] = profile_dir
+    else:
+        os.environ.pop(PROFILE_ENV, None)
+    print(f"[Instrumentation]: Tracing to '{path}'" + (f", cProfile stats in '{profile_dir}'." if profile_dir else "."))
+
+
+def disable_tracing() -> None:
+    _STATE["path"] = None
+    _STATE["profile_dir"] = None
+    os.environ.pop(TRACE_ENV, None)
+    os.environ.pop(PROFILE_ENV, None)
+
+
+def tracing_enabled() -> bool:
+    return _STATE["path"] is not None
+
+
+# --- Measurements ---
+
+def peak_rss_mb() -> Optional[float]:
+    """Peak resident memory of this process so far, in MB (None where unavailable)."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def add_metrics(**metrics) -> None:
+    """
+    Attach extra metrics (e.g. cache_hits=3) to the innermost stage that is running.
+    Does nothing when tracing is off or no stage is running.
+    """
+    stack = getattr(_ACTIVE, "stack", None)
+    if stack:
+        stack[-1].update(metrics)
+
+
+def _write(record: Dict) -> None:
+    line = json.dumps(record, default=str) + "\n"
+    with _WRITE_LOCK:
+        if _STATE["path"] == "-":
+            sys.stderr.write(line)
+        else:
+            with open(_STATE["path"], "a") as f:
+                f.write(line)
+
+
+# --- Stage metrics: what each stage's result (and arguments) tell us ---
+
+def _fetch_metrics(args, kwargs, result) -> Dict:
+    return {"n": int(result.shape[1]), "rows": int(result.shape[0])}
+
+
+def _mu_sigma_metrics(args, kwargs, result) -> Dict:
+    prices = args[0] if args else kwargs.get("prices_df")
+    return {"n": len(result[0]), "rows": None if prices is None else len(prices)}
+
+
+def _program_metrics(args, kwargs, result) -> Dict:
+    return {"n": result.get_num_vars(), "num_constraints": result.get_num_linear_constraints()}
+
+
+def _ising_metrics(args, kwargs, result) -> Dict:
+    hamiltonian = result[0]
+    if hamiltonian is None:
+        return {}
+    return {"n": hamiltonian.num_qubits, "num_qubits": hamiltonian.num_qubits,
+            "num_terms": len(hamiltonian)}
+
+
+def _qaoa_metrics(args, kwargs, result) -> Dict:
+    hamiltonian = args[0] if args else kwargs.get("hamiltonian")
+    metrics = {"n": hamiltonian.num_qubits, "backend": kwargs.get("backend", "sampler"),
+               "reps": kwargs.get("reps", 1),
+               "optimizer_evals": int(getattr(result, "cost_function_evals", 0) or 0),
+               "optimizer_seconds": getattr(result, "optimizer_time", None),
+               "circuit_width": hamiltonian.num_qubits, "circuit_depth": None}
+    circuit = getattr(result, "optimal_circuit", None)
+    if circuit is not None:
+        metrics["circuit_width"] = circuit.num_qubits
+        metrics["circuit_depth"] = circuit.depth()
+    shots_used = getattr(result, "shots_used", None)
+    if shots_used is not None:
+        metrics["shots"] = shots_used["total"]
+    return metrics
+
+
+def _interpret_metrics(args, kwargs, result) -> Dict:
+    tickers = args[1] if len(args) > 1 else kwargs.get("tickers")
+    return {"n": None if tickers is None else len(tickers), "num_selected": len(result[0])}
+
+
+STAGE_METRICS: Dict[str, Callable] = {
+    "fetch_stock_data": _fetch_metrics,
+    "calculate_mu_and_sigma": _mu_sigma_metrics,
+    "create_quadratic_program": _program_metrics,
+    "convert_to_ising": _ising_metrics,
+    "solve_with_qaoa": _qaoa_metrics,
+    "interpret_result": _interpret_metrics,
+}
+
+
+# --- The decorator ---
+
+def traced(stage: str) -> Callable:
+    """
+    Wrap a pipeline function as 'stage'. Its metrics come from STAGE_METRICS[stage]
+    plus anything the function adds itself with add_metrics().
+    """
+    metrics_of = STAGE_METRICS.get(stage)
+
+    def decorator(function: Callable) -> Callable:
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if _STATE["path"] is None:
+                return function(*args, **kwargs)
+            return _run_traced(stage, function, metrics_of, args, kwargs)
+        return wrapper
+
+    return decorator
+
+
+def _run_traced(stage: str, function: Callable, metrics_of: Optional[Callable], args, kwargs):
+    stack = getattr(_ACTIVE, "stack", None)
+    if stack is None:
+        stack = _ACTIVE.stack = []
+    record = {"stage": stage, "function": function.__name__, "n": None,
+              "parent": stack[-1]["stage"] if stack else None, "pid": os.getpid(), "start": time.time()}
+    stack.append(record)
+
+    profiler = cProfile.Profile() if _STATE["profile_dir"] else None
+    rss_before = peak_rss_mb()
+    start_time = time.perf_counter()
+    result, error = None, None
+    try:
+        if profiler is not None:
+            result = profiler.runcall(function, *args, **kwargs)
+        else:
+            result = function(*args, **kwargs)
+        return result
+    except BaseException as exc:
+        error = exc
+        raise
+    finally:
+        record["wall_seconds"] = time.perf_counter() - start_time
+        stack.pop()
+        rss_after = peak_rss_mb()
+        record["peak_rss_mb"] = rss_after
+        record["peak_rss_growth_mb"] = None if rss_after is None else rss_after - rss_before
+        if error is not None:
+            record["error"] = f"{type(error).__name__}: {error}"
+        elif metrics_of is not None:
+            try:
+                record.update(metrics_of(args, kwargs, result))
+            except Exception as exc:  # a metric must never break the pipeline
+                record["metrics_error"] = f"{type(exc).__name__}: {exc}"
+        if profiler is not None:
+            _STATE["calls"] += 1
+            profile_path = os.path.join(_STATE["profile_dir"], f"{stage}-{os.getpid()}-{_STATE['calls']}.prof")
+            profiler.dump_stats(profile_path)
+            record["profile"] = profile_path
+        _write(record)
+
+
+# --- Reading traces ---
+
+def load_trace(path: str = "trace.jsonl") -> pd.DataFrame:
+    """All records of a trace file as a DataFrame (one row per traced call)."""
+    with open(path, "r") as f:
+        return pd.DataFrame([json.loads(line) for line in f if line.strip()])
+
+
+def summarize_trace(path: str = "trace.jsonl") -> pd.DataFrame:
+    """
+    Total and mean wall time per (problem size n, stage), plus each stage's share of
+    the time at that size: shows which stage dominates as n grows.
+    Nested calls (parent set) are left out, so no time is counted twice.
+    """
+    trace = load_trace(path)
+    top_level = trace[trace["parent"].isna()]
+    summary = (top_level.groupby(["n", "stage"])["wall_seconds"]
+               .agg(calls="count", total_seconds="sum", mean_seconds="mean").reset_index())
+    summary["share"] = summary["total_seconds"] / summary.groupby("n")["total_seconds"].transform("sum")
+    return summary.sort_values(["n", "total_seconds"], ascending=[True, False]).reset_index(drop=True)
+
+
+# --- "Testing Block" ---
+# This code runs only when this file is executed directly.
+if __name__ == "__main__":
+
+    print("\n---------------------------------------------------------")
+    print(">>> 'instrumentation.py' was RUN DIRECTLY (Testing Mode) <<<")
+    print("---------------------------------------------------------")
+
+    import tempfile
+    import numpy as np
+    # The pipeline modules see the imported 'instrumentation' module, not this __main__ copy
+    from instrumentation import STAGE_METRICS, disable_tracing, enable_tracing, load_trace, summarize_trace, traced
+    from data_pipeline import calculate_mu_and_sigma
+    from problem_builder import create_quadratic_program
+    from hamiltonian_converter import convert_to_ising
+    from qaoa_solver import solve_with_qaoa, interpret_result
+
+    # Overhead when tracing is off: one extra call per stage
+    @traced("calculate_mu_and_sigma")
+    def noop(x):
+        return x
+    disable_tracing()
+    loops = 200000
+    start = time.perf_counter()
+    for _ in range(loops):
+        noop(1)
+    print(f"Disabled overhead: {(time.perf_counter() - start) / loops * 1e9:.0f} ns per call")
+
+    with tempfile.TemporaryDirectory() as directory:
+        enable_tracing(os.path.join(directory, "trace.jsonl"))
+        rng = np.random.default_rng(0)
+        for n in (4, 8):
+            tickers = [f"T{i}" for i in range(n)]
+            prices = pd.DataFrame(100 * np.exp(np.cumsum(rng.normal(0.0005, 0.01, (300, n)), axis=0)),
+                                  columns=tickers)
+            mu, sigma = calculate_mu_and_sigma(prices)
+            qp = create_quadratic_program(mu, sigma, k=n // 2)
+            hamiltonian, offset = convert_to_ising(qp)
+            result = solve_with_qaoa(hamiltonian, backend="diagonal", seed=1)
+            interpret_result(result, tickers, qp)
+        disable_tracing()
+
+        trace = load_trace(os.path.join(directory, "trace.jsonl"))
+        assert len(trace) == 10 and set(trace["stage"]) == set(STAGE_METRICS) - {"fetch_stock_data"}
+        print(trace[["stage", "n", "wall_seconds", "peak_rss_mb", "optimizer_evals"]])
+        print(summarize_trace(os.path.join(directory, "trace.jsonl")))
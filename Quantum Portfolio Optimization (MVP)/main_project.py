@@ -1,57 +1,199 @@
 """
 Main Project File (main_project.py)
-This is our main program which will use 'data_pipeline'.
+This is our main program: a command line front end for the whole pipeline.
 
-This file imports 'data_pipeline.py' and calls its functions
-(such as fetch_stock_data).
+    python main_project.py                      # fetch prices and print mu / Σ (default tickers)
+    python main_project.py fetch  --tickers AAPL GOOG
+    python main_project.py stats  --tickers AAPL GOOG MSFT AMZN
+    python main_project.py solve  --k 2 --solver qaoa --backend diagonal
+    python main_project.py serve                # long-lived solver service (solver_service.py)
+    python main_project.py solve  --k 2 --server   # send the solve to that service
+
+Every module is imported inside the command that needs it: 'fetch' and 'stats'
+only load the data pipeline (pandas), never qiskit, so they start quickly.
 """
 
-print(">>> 'main_project.py' is starting...")
-print("    Now importing 'data_pipeline'...")
-
-# --- Importing the module ---
-# We import the 'data_pipeline.py' file.
-# Python will read that file, but its if __name__ == "__main__" block WILL NOT run.
-
-
-# If 'data_pipeline.py' is inside a 'src' folder:
-try:
-    from src import data_pipeline
-    print("    Imported from 'src/data_pipeline.py'.")
-# If 'data_pipeline.py' is in the same folder:
-except ImportError:
-    try:
-        import data_pipeline
-        print("    Imported from 'data_pipeline.py' (same folder).")
-    except ImportError:
-        print("\nFATAL ERROR: 'data_pipeline.py' not found.")
-        print("Please ensure 'data_pipeline.py' is in the same folder or in a 'src' folder.")
-        exit()  # Exit the program
-
-print("\n>>> 'main_project.py': Import complete.")
-print("    Now using functions from 'data_pipeline'.")
-
-# --- Main work ---
-# Fetch data for two different stocks and date range
-my_tickers = ['AAPL', 'GOOG', 'MSFT', 'AMZN']  # Selected stocks
-my_start = '2021-01-01'
-my_end = '2023-12-31'
-
-# 1. Use Recipe 1 (fetch_stock_data)
-prices = data_pipeline.fetch_stock_data(tickers=my_tickers, start_date=my_start, end_date=my_end)
-
-if not prices.empty:
-    # 2. Use Recipe 2 (calculate_mu_and_sigma )
+# Step 1: Import necessary tools
+import sys
+import argparse
+from typing import List, Optional
+
+# Defaults (the original project settings)
+DEFAULT_TICKERS = ['AAPL', 'GOOG', 'MSFT', 'AMZN']  # Selected stocks
+DEFAULT_START = '2021-01-01'
+DEFAULT_END = '2023-12-31'
+
+
+def _load_prices(args):
+    # Prices through the data pipeline (no qiskit); --synthetic works offline
+    import data_pipeline
+
+    source, cache_dir = None, args.cache_dir
+    if args.synthetic is not None:
+        # Synthetic prices are never mixed into the price cache
+        from synthetic_market import SyntheticSource
+        source, cache_dir = SyntheticSource(seed=args.synthetic), None
+    return data_pipeline.fetch_stock_data(tickers=args.tickers, start_date=args.start, end_date=args.end,
+                                          cache_dir=cache_dir, source=source)
+
+
+def command_fetch(args) -> int:
+    prices = _load_prices(args)
+    if prices.empty:
+        print("Project Failed: No data retrieved.")
+        return 1
+    print(f"\n{len(prices)} rows from {prices.index[0]} to {prices.index[-1]}:\n", prices.tail())
+    if args.output:
+        prices.to_csv(args.output)
+        print(f"\n[Main Project]: Prices saved to '{args.output}'.")
+    return 0
+
+
+def command_stats(args) -> int:
+    import data_pipeline
+
+    prices = _load_prices(args)
+    if prices.empty:
+        print("Project Failed: No data retrieved.")
+        return 1
     mu, sigma = data_pipeline.calculate_mu_and_sigma(prices)
-    
+
     print("\n---------------------------------------------------")
     print(">>> 'main_project.py' FINAL OUTPUT <<<")
     print("---------------------------------------------------")
-    print("Project Mu (μ) [NVDA, TSLA]:\n", mu)
-    print("\nProject Sigma (Σ) [NVDA, TSLA]:\n", sigma)
-else:
-    print("Project Failed: No data retrieved.")
+    print(f"Project Mu (μ) {list(mu.index)}:\n", mu)
+    print(f"\nProject Sigma (Σ) {list(mu.index)}:\n", sigma)
+    return 0
+
+
+def _solver_options(args) -> dict:
+    options = {}
+    if args.solver == "qaoa":
+        options["backend"] = args.backend
+        if args.optimizer is not None:
+            options["optimizer"] = args.optimizer
+    return options
+
+
+def _print_record(record: dict) -> None:
+    print("\n---------------------------------------------------")
+    print(">>> 'main_project.py' FINAL OUTPUT <<<")
+    print("---------------------------------------------------")
+    source = "results store" if record.get("cached") else f"solved in {record['solve_seconds']:.2f}s"
+    print(f"Selected stocks (k={record['k']}): {record['selected_stocks']}")
+    print(f"Objective score: {record['score']}  ({record['solver']}, {source})")
+
+
+def command_solve(args) -> int:
+    reps = args.reps if args.solver == "qaoa" else None
+    if args.server:
+        # The service does the fetching and solving; this process stays light
+        from solver_service import send_request
+
+        request = {"op": "solve", "tickers": args.tickers, "start_date": args.start, "end_date": args.end,
+                   "k": args.k, "q": args.q, "solver": args.solver, "reps": reps, "seed": args.seed,
+                   "synthetic": args.synthetic, "options": _solver_options(args)}
+        _print_record(send_request(request, **_address(args)))
+        return 0
+
+    import data_pipeline
+    from results_store import ResultsStore, solve_memoized
+
+    prices = _load_prices(args)
+    if prices.empty:
+        print("Project Failed: No data retrieved.")
+        return 1
+    mu, sigma = data_pipeline.calculate_mu_and_sigma(prices)
+    record = solve_memoized(mu, sigma, args.k, q=args.q, solver=args.solver, reps=reps, seed=args.seed,
+                            store=ResultsStore(args.results), as_of=args.end, verbose=args.verbose,
+                            **_solver_options(args))
+    _print_record(record)
+    return 0
+
+
+def _address(args) -> dict:
+    # Unix socket unless --port is given
+    if args.port is not None:
+        return {"socket_path": None, "host": args.host, "port": args.port}
+    return {"socket_path": args.socket}
+
+
+def command_serve(args) -> int:
+    from solver_service import serve
+
+    serve(max_workers=args.workers, cache_dir=args.cache_dir, results_path=args.results,
+          parameter_path=args.parameters, **_address(args))
+    return 0
+
+
+def command_request(args) -> int:
+    # Small control requests to a running service: ping / status / shutdown
+    from solver_service import send_request
+
+    print(send_request({"op": args.op}, **_address(args)))
+    return 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Quantum Portfolio Optimization (MVP)")
+    commands = parser.add_subparsers(dest="command")
+
+    data = argparse.ArgumentParser(add_help=False)
+    data.add_argument("--tickers", nargs="+", default=DEFAULT_TICKERS)
+    data.add_argument("--start", default=DEFAULT_START)
+    data.add_argument("--end", default=DEFAULT_END)
+    data.add_argument("--cache-dir", default=".price_cache", help="price cache folder ('' = no cache)")
+    data.add_argument("--synthetic", type=int, default=None, metavar="SEED",
+                      help="use synthetic prices with this seed instead of Yahoo Finance")
+
+    service = argparse.ArgumentParser(add_help=False)
+    service.add_argument("--socket", default="/tmp/qpo_solver.sock", help="Unix socket of the service")
+    service.add_argument("--host", default="127.0.0.1")
+    service.add_argument("--port", type=int, default=None, help="use localhost TCP on this port instead")
+
+    fetch = commands.add_parser("fetch", parents=[data], help="fetch (and cache) prices")
+    fetch.add_argument("--output", default=None, help="save the prices to this CSV file")
+    fetch.set_defaults(handler=command_fetch)
+
+    stats = commands.add_parser("stats", parents=[data], help="print mu and Σ")
+    stats.set_defaults(handler=command_stats)
+
+    solve = commands.add_parser("solve", parents=[data, service], help="pick the best k stocks")
+    solve.add_argument("--k", type=int, default=2, help="number of stocks to pick")
+    solve.add_argument("--q", type=float, default=1.0, help="risk weight")
+    solve.add_argument("--solver", default="qaoa", choices=("qaoa", "annealing", "tabu"))
+    solve.add_argument("--backend", default="sampler", help="QAOA backend (sampler, diagonal, subspace, aer)")
+    solve.add_argument("--optimizer", default=None, help="QAOA optimizer (cobyla, spsa, l_bfgs_b)")
+    solve.add_argument("--reps", type=int, default=1, help="QAOA layers")
+    solve.add_argument("--seed", type=int, default=None)
+    solve.add_argument("--results", default="results.jsonl", help="results store file")
+    solve.add_argument("--server", action="store_true", help="send the solve to a running solver service")
+    solve.add_argument("--verbose", action="store_true", help="show the solver's own output")
+    solve.set_defaults(handler=command_solve)
+
+    serve = commands.add_parser("serve", parents=[service], help="run the long-lived solver service")
+    serve.add_argument("--workers", type=int, default=None, help="worker processes (default: CPU count)")
+    serve.add_argument("--cache-dir", default=".price_cache")
+    serve.add_argument("--results", default="results.jsonl")
+    serve.add_argument("--parameters", default="qaoa_parameters.json",
+                       help="shared QAOA parameter store file (each worker writes its own copy)")
+    serve.set_defaults(handler=command_serve)
+
+    request = commands.add_parser("request", parents=[service], help="ping / status / shutdown a service")
+    request.add_argument("op", choices=("ping", "status", "shutdown"))
+    request.set_defaults(handler=command_request)
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = build_parser()
+    # No command: the original behaviour (fetch prices, print mu and Σ)
+    argv = sys.argv[1:] if argv is None else argv
+    args = parser.parse_args(argv or ["stats"])
+    if getattr(args, "cache_dir", None) == "":
+        args.cache_dir = None
+    return args.handler(args)
 
-print("\n>>> 'main_project.py' finished.")
 
-# ...existing code...
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,185 @@
+"""
+QAOA Parameter Store (parameter_store.py)
+Its job is to remember good QAOA angles between runs and use them as starting points.
+
+- Problems are keyed by (n, k, q, reps, mixer) plus a "fingerprint" of the Hamiltonian's
+  normalized coefficient spectrum, so similar problems find each other. Angles of the
+  X mixer and of the XY mixers (backend="subspace") mean different things, so they are
+  never mixed up.
+- gamma angles are stored multiplied by the Hamiltonian's coefficient scale, so they
+  transfer between problems whose coefficients are just scaled differently.
+- interpolate_parameters() grows a depth-p solution into a depth-(p+1) starting point
+  (the "INTERP" strategy), which makes reps > 1 practical.
+"""
+
+# Step 1: Import necessary tools
+import os
+import json
+import numpy as np
+from typing import Dict, List, Optional
+
+from qiskit.quantum_info import SparsePauliOp
+
+from hamiltonian_converter import ising_from_pauli_op
+
+# Quantiles used for the spectrum fingerprint
+_FINGERPRINT_QUANTILES = np.linspace(0.1, 0.9, 5)
+
+
+# --- Problem features ---
+
+def hamiltonian_scale(hamiltonian: SparsePauliOp) -> float:
+    """Largest |coefficient| of the Z / ZZ terms (1.0 for an empty Hamiltonian)."""
+    h, J, _ = ising_from_pauli_op(hamiltonian)
+    scale = max(np.abs(h).max(initial=0.0), np.abs(J).max(initial=0.0))
+    return float(scale) if scale > 0 else 1.0
+
+
+def spectrum_fingerprint(hamiltonian: SparsePauliOp) -> np.ndarray:
+    """
+    Small vector describing the shape of the coefficient spectrum:
+    quantiles of |h_i| and of |J_ij| (i<j), both divided by the largest coefficient.
+    """
+    h, J, _ = ising_from_pauli_op(hamiltonian)
+    scale = hamiltonian_scale(hamiltonian)
+    couplings = np.abs(J[np.triu_indices(len(h), 1)]) / scale
+    fields = np.abs(h) / scale
+    parts = []
+    for values in (fields, couplings):
+        parts.append(np.quantile(values, _FINGERPRINT_QUANTILES) if len(values) else np.zeros(len(_FINGERPRINT_QUANTILES)))
+    return np.concatenate(parts)
+
+
+def problem_key(num_qubits: int, k: Optional[int], q: Optional[float], reps: int, mixer: str = "x") -> str:
+    k_part = "-" if k is None else str(k)
+    q_part = "-" if q is None else f"{q:.6g}"
+    return f"n={num_qubits}|k={k_part}|q={q_part}|p={reps}|m={mixer}"
+
+
+# --- Layer growth ---
+
+def interpolate_parameters(parameters: np.ndarray) -> np.ndarray:
+    """
+    Turn optimal depth-p parameters [beta_1..beta_p, gamma_1..gamma_p] into a
+    depth-(p+1) starting point by linear interpolation (Zhou et al., "INTERP"):
+
+        new_i = (i-1)/p * old_{i-1} + (p-i+1)/p * old_i,   i = 1..p+1,  old_0 = old_{p+1} = 0
+    """
+    parameters = np.asarray(parameters, dtype=float)
+    p = len(parameters) // 2
+    betas, gammas = parameters[:p], parameters[p:]
+
+    def grow(angles: np.ndarray) -> np.ndarray:
+        padded = np.concatenate([[0.0], angles, [0.0]])
+        i = np.arange(1, p + 2)
+        return (i - 1) / p * padded[i - 1] + (p - i + 1) / p * padded[i]
+
+    return np.concatenate([grow(betas), grow(gammas)])
+
+
+# --- The store ---
+
+class ParameterStore:
+    """
+    Persistent (JSON file) store of optimal QAOA parameters.
+
+    Entries live under problem_key(n, k, q, reps, mixer); each entry keeps the fingerprint,
+    the scale-normalized parameters and the energy that was reached. 'mixer' is the mixer
+    family the angles belong to: "x" (the standard QAOA mixer) or "xy-ring" / "xy-complete".
+    """
+
+    def __init__(self, path: str = "qaoa_parameters.json", max_entries_per_key: int = 20,
+                 max_distance: float = 0.1):
+        self.path = path
+        self.max_entries_per_key = max_entries_per_key
+        self.max_distance = max_distance
+        self._entries: Dict[str, List[Dict]] = {}
+        if os.path.exists(path):
+            with open(path, "r") as f:
+                self._entries = json.load(f)
+
+        self.hits = 0
+        self.misses = 0
+
+    def _save(self) -> None:
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self._entries, f, indent=2)
+        os.replace(tmp_path, self.path)
+
+    @staticmethod
+    def _to_stored(parameters: np.ndarray, scale: float) -> List[float]:
+        p = len(parameters) // 2
+        stored = np.array(parameters, dtype=float)
+        stored[p:] *= scale  # gamma * scale is invariant to rescaling H
+        return stored.tolist()
+
+    @staticmethod
+    def _from_stored(stored: List[float], scale: float) -> np.ndarray:
+        parameters = np.array(stored, dtype=float)
+        p = len(parameters) // 2
+        parameters[p:] /= scale
+        return parameters
+
+    def _nearest(self, key: str, fingerprint: np.ndarray) -> Optional[Dict]:
+        best, best_distance = None, self.max_distance
+        for entry in self._entries.get(key, []):
+            distance = float(np.linalg.norm(np.asarray(entry["fingerprint"]) - fingerprint))
+            if distance <= best_distance:
+                best, best_distance = entry, distance
+        return best
+
+    def lookup(self, hamiltonian: SparsePauliOp, reps: int, k: Optional[int] = None,
+               q: Optional[float] = None, mixer: str = "x") -> Optional[np.ndarray]:
+        """
+        Starting parameters for this problem at depth 'reps', or None.
+        If only a shallower depth is stored, it is grown with interpolate_parameters().
+        """
+        fingerprint = spectrum_fingerprint(hamiltonian)
+        scale = hamiltonian_scale(hamiltonian)
+        n = hamiltonian.num_qubits
+
+        for depth in range(reps, 0, -1):
+            entry = self._nearest(problem_key(n, k, q, depth, mixer), fingerprint)
+            if entry is None:
+                continue
+            parameters = self._from_stored(entry["parameters"], scale)
+            while len(parameters) // 2 < reps:
+                parameters = interpolate_parameters(parameters)
+            self.hits += 1
+            print(f"[Parameter Store]: Warm start found (stored depth p={depth}, requested p={reps}).")
+            return parameters
+
+        self.misses += 1
+        return None
+
+    def save(self, hamiltonian: SparsePauliOp, parameters: np.ndarray, energy: float,
+             k: Optional[int] = None, q: Optional[float] = None, mixer: str = "x") -> None:
+        """
+        Remember optimal parameters. A near-identical fingerprint is only replaced
+        if the new energy is lower.
+        """
+        reps = len(parameters) // 2
+        key = problem_key(hamiltonian.num_qubits, k, q, reps, mixer)
+        fingerprint = spectrum_fingerprint(hamiltonian)
+        scale = hamiltonian_scale(hamiltonian)
+        new_entry = {
+            "fingerprint": fingerprint.tolist(),
+            "parameters": self._to_stored(parameters, scale),
+            # energies are compared after normalizing by the scale as well
+            "energy": float(energy) / scale,
+        }
+
+        entries = self._entries.setdefault(key, [])
+        existing = self._nearest(key, fingerprint)
+        if existing is not None and np.linalg.norm(np.asarray(existing["fingerprint"]) - fingerprint) < 1e-9:
+            if new_entry["energy"] < existing["energy"]:
+                existing.update(new_entry)
+        else:
+            entries.append(new_entry)
+            del entries[:-self.max_entries_per_key]
+
+        self._save()
+
@@ -0,0 +1,375 @@
+"""
+Price Cache (price_cache.py)
+Its job is to keep a local copy of downloaded prices (one Parquet file per ticker)
+so that 'fetch_stock_data' only goes to the network for data it has not seen yet.
+
+It also defines the "price sources" the cache can be filled from:
+- YahooFinanceSource: downloads from Yahoo Finance (the original behaviour)
+- LocalFileSource: reads <TICKER>.parquet / <TICKER>.csv files from a folder (offline use)
+"""
+
+# Step 1: Import necessary tools
+import os
+import json
+import numpy as np
+import pandas as pd
+from typing import Dict, List, Optional, Tuple
+
+
+# --- Price Sources ---
+
+class PriceSource:
+    """
+    Base class for anything that can provide Close prices.
+    fetch() must return a DataFrame indexed by date with one column per ticker.
+    The date range is [start_date, end_date) like yf.download.
+
+    A ticker the source could not get is left out of the columns (or fetch() raises);
+    a ticker column with no prices means there are no prices in that range.
+    """
+
+    def fetch(self, tickers: List[str], start_date: str, end_date: str) -> pd.DataFrame:
+        raise NotImplementedError
+
+
+class YahooFinanceSource(PriceSource):
+    """
+    Download adjusted Close prices from Yahoo Finance.
+    """
+
+    def fetch(self, tickers: List[str], start_date: str, end_date: str) -> pd.DataFrame:
+        import yfinance as yf
+
+        # auto_adjust=True makes it easier to use Close prices.
+        data = yf.download(tickers, start=start_date, end=end_date, progress=False, auto_adjust=True)
+
+        if data is None or data.empty:
+            return pd.DataFrame()
+
+        if len(tickers) == 1:
+            # For a single stock, use the 'Close' column
+            prices_df = data[['Close']].copy()
+            prices_df.columns = tickers
+        else:
+            # When auto_adjust=True, yf.download provides adjusted prices in the 'Close' column
+            prices_df = data['Close'].copy()
+
+        # yf.download does not raise for a failed ticker (it gives an all-NaN column and
+        # logs the error), so leave those tickers out: the cache asks for them again later
+        failed = set(getattr(yf.shared, "_ERRORS", {}))
+        return prices_df[[t for t in prices_df.columns if t not in failed]]
+
+
+class LocalFileSource(PriceSource):
+    """
+    Read prices from local files: <directory>/<TICKER>.parquet or <directory>/<TICKER>.csv.
+    Each file needs a date index (or a 'Date' column) and a 'Close' column
+    (a file with a single price column also works).
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+
+    def _read_file(self, ticker: str) -> Optional[pd.Series]:
+        for extension in (".parquet", ".csv"):
+            path = os.path.join(self.directory, _safe_file_name(ticker) + extension)
+            if not os.path.exists(path):
+                continue
+
+            if extension == ".parquet":
+                df = pd.read_parquet(path)
+            else:
+                df = pd.read_csv(path)
+
+            # Use the 'Date' column as index if the file has one
+            for date_column in ("Date", "date", "Datetime"):
+                if date_column in df.columns:
+                    df = df.set_index(date_column)
+                    break
+            df.index = pd.to_datetime(df.index)
+
+            if "Close" in df.columns:
+                series = df["Close"]
+            elif "Adj Close" in df.columns:
+                series = df["Adj Close"]
+            elif len(df.columns) == 1:
+                series = df.iloc[:, 0]
+            else:
+                print(f"[Price Cache]: Warning: no 'Close' column in {path}, skipping.")
+                return None
+            return series.astype(float).sort_index()
+
+        return None
+
+    def fetch(self, tickers: List[str], start_date: str, end_date: str) -> pd.DataFrame:
+        start, end = pd.Timestamp(start_date), pd.Timestamp(end_date)
+        columns = {}
+        for ticker in tickers:
+            series = self._read_file(ticker)
+            if series is None:
+                print(f"[Price Cache]: Warning: no local file found for {ticker}.")
+                continue
+            columns[ticker] = series[(series.index >= start) & (series.index < end)]
+
+        if not columns:
+            return pd.DataFrame()
+        return pd.DataFrame(columns)
+
+
+def _safe_file_name(ticker: str) -> str:
+    # Tickers like 'BRK/B' cannot be used directly as file names
+    return ticker.replace("/", "_").replace("\\", "_")
+
+
+# --- The Cache ---
+
+class PriceCache:
+    """
+    On-disk price cache with one Parquet file per ticker.
+
+    For every ticker we remember which date range [start, end) has already been
+    requested ('coverage.json'). On a request we only fetch the parts of the
+    range (and the tickers) that are not covered yet, then merge them in.
+    """
+
+    COVERAGE_FILE = "coverage.json"
+
+    def __init__(self, cache_dir: str, source: Optional[PriceSource] = None):
+        self.cache_dir = cache_dir
+        self.source = source if source is not None else YahooFinanceSource()
+        os.makedirs(cache_dir, exist_ok=True)
+        self._coverage = self._load_coverage()
+
+        # Simple counters (useful to see how much work the cache saved)
+        self.hits = 0
+        self.misses = 0
+
+    # --- coverage bookkeeping ---
+
+    def _coverage_path(self) -> str:
+        return os.path.join(self.cache_dir, self.COVERAGE_FILE)
+
+    def _load_coverage(self) -> Dict[str, List[str]]:
+        path = self._coverage_path()
+        if not os.path.exists(path):
+            return {}
+        with open(path, "r") as f:
+            return json.load(f)
+
+    def _save_coverage(self) -> None:
+        # Write to a temp file first so a crash never leaves a broken index behind
+        tmp_path = self._coverage_path() + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self._coverage, f, indent=4, sort_keys=True)
+        os.replace(tmp_path, self._coverage_path())
+
+    def _ticker_path(self, ticker: str) -> str:
+        return os.path.join(self.cache_dir, _safe_file_name(ticker) + ".parquet")
+
+    def missing_ranges(self, ticker: str, start: pd.Timestamp, end: pd.Timestamp) -> List[Tuple[pd.Timestamp, pd.Timestamp]]:
+        """
+        Return the date ranges of [start, end) that are not in the cache yet for this ticker.
+        The covered range is always kept as one contiguous block, so a request that lies
+        completely outside of it also fetches the gap in between.
+        """
+        if ticker not in self._coverage:
+            return [(start, end)]
+
+        covered_start, covered_end = (pd.Timestamp(d) for d in self._coverage[ticker])
+        ranges = []
+        if start < covered_start:
+            ranges.append((start, covered_start))
+        if end > covered_end:
+            ranges.append((covered_end, end))
+        return ranges
+
+    # --- reading / writing ---
+
+    def load(self, ticker: str) -> pd.Series:
+        """
+        Return all cached prices for one ticker (empty Series if nothing is cached).
+        """
+        path = self._ticker_path(ticker)
+        if not os.path.exists(path):
+            return pd.Series(dtype=float, index=pd.DatetimeIndex([], name="Date"), name=ticker)
+        series = pd.read_parquet(path)["Close"]
+        # Keep a DatetimeIndex even for an empty file, so the date filters below work
+        series.index = pd.to_datetime(series.index)
+        series.name = ticker
+        return series
+
+    def _store(self, ticker: str, new_prices: pd.Series, start: pd.Timestamp, end: pd.Timestamp,
+               covered: bool = True) -> None:
+        # Only called for a successful fetch. No prices in the range (e.g. holidays, or
+        # before the listing date) still counts as covered, but writes no file.
+        new_prices = new_prices.dropna()
+        if not new_prices.empty:
+            existing = self.load(ticker)
+            if existing.empty:
+                merged = new_prices
+            else:
+                # New data wins if a date appears in both (e.g. a re-downloaded last day)
+                merged = pd.concat([existing[~existing.index.isin(new_prices.index)], new_prices])
+            merged = merged.sort_index()
+            merged.index.name = "Date"
+
+            merged.to_frame(name="Close").to_parquet(self._ticker_path(ticker))
+
+        if not covered:
+            return
+
+        # Extend the covered range
+        if ticker in self._coverage:
+            covered_start, covered_end = (pd.Timestamp(d) for d in self._coverage[ticker])
+            start, end = min(start, covered_start), max(end, covered_end)
+        self._coverage[ticker] = [start.strftime("%Y-%m-%d"), end.strftime("%Y-%m-%d")]
+
+    def get_prices(self, tickers: List[str], start_date: str, end_date: str) -> pd.DataFrame:
+        """
+        Return Close prices for [start_date, end_date), one column per ticker
+        (in the same order as 'tickers'). Only missing data is fetched from the source.
+        """
+        start, end = pd.Timestamp(start_date), pd.Timestamp(end_date)
+
+        # Never mark future dates as covered, otherwise new prices would never be fetched.
+        # (Today's bar may still change, so it is re-fetched next time as well.)
+        today = pd.Timestamp.today().normalize()
+        coverage_end = min(end, today)
+
+        # Step A: Group the tickers by the date range they are missing,
+        # so we can fetch each range for many tickers in a single call.
+        # The flag says whether the range counts as "covered" once fetched.
+        to_fetch: Dict[Tuple[pd.Timestamp, pd.Timestamp, bool], List[str]] = {}
+        for ticker in tickers:
+            ranges = [r for r in self.missing_ranges(ticker, start, coverage_end) if r[0] < r[1]]
+            if not ranges:
+                self.hits += 1
+            else:
+                self.misses += 1
+            for range_start, range_end in ranges:
+                to_fetch.setdefault((range_start, range_end, True), []).append(ticker)
+
+            if coverage_end < end:
+                # The part after today is never cached, always ask the source for it
+                to_fetch.setdefault((max(start, coverage_end), end, False), []).append(ticker)
+
+        # Step B: Fetch missing ranges and merge them into the cache
+        for (range_start, range_end, covered), range_tickers in to_fetch.items():
+            print(f"[Price Cache]: Fetching {range_tickers} from {range_start.date()} to {range_end.date()}...")
+            try:
+                fetched = self.source.fetch(range_tickers, range_start.strftime("%Y-%m-%d"),
+                                            range_end.strftime("%Y-%m-%d"))
+            except Exception as e:
+                # Nothing is cached or marked as covered, so the next request asks again
+                print(f"[Price Cache]: Warning: fetching {range_tickers} failed: {e}")
+                continue
+
+            for ticker in range_tickers:
+                if ticker not in fetched.columns:
+                    print(f"[Price Cache]: Warning: no prices returned for {ticker}, not cached.")
+                    continue
+                self._store(ticker, fetched[ticker], range_start, range_end, covered=covered)
+
+        if to_fetch:
+            self._save_coverage()
+
+        print(f"[Price Cache]: {self.hits} cache hit(s), {self.misses} partial/complete miss(es) so far.")
+
+        # Step C: Read everything back from the cache for the requested range
+        columns = {}
+        for ticker in tickers:
+            series = self.load(ticker)
+            columns[ticker] = series[(series.index >= start) & (series.index < end)]
+        return pd.DataFrame(columns, columns=tickers)
+
+    def to_memmap(self, tickers: List[str], start_date: str, end_date: str, path: str,
+                  dtype=np.float64) -> Tuple[np.memmap, pd.DatetimeIndex]:
+        """
+        Write cached prices for [start_date, end_date) into a memory-mapped .npy file
+        (dates x tickers), keeping only dates where every ticker has a price
+        (same rows as the dropna() in fetch_stock_data).
+
+        Tickers are loaded one at a time, so memory use stays small even for a
+        large universe. Call get_prices() first if the cache may be incomplete.
+        """
+        start, end = pd.Timestamp(start_date), pd.Timestamp(end_date)
+
+        # Pass 1: find the dates shared by all tickers (only the indexes are kept)
+        common_dates = None
+        for ticker in tickers:
+            dates = self.load(ticker).index
+            dates = dates[(dates >= start) & (dates < end)]
+            common_dates = dates if common_dates is None else common_dates.intersection(dates)
+        common_dates = pd.DatetimeIndex(common_dates).sort_values()
+
+        # Pass 2: fill the matrix one column (ticker) at a time
+        matrix = np.lib.format.open_memmap(path, mode="w+", dtype=dtype, shape=(len(common_dates), len(tickers)))
+        for j, ticker in enumerate(tickers):
+            matrix[:, j] = self.load(ticker).reindex(common_dates).to_numpy(dtype=dtype)
+        matrix.flush()
+
+        print(f"[Price Cache]: Wrote {matrix.shape[0]} x {matrix.shape[1]} price matrix to {path}.")
+        return matrix, common_dates
+
+
+# --- "Testing Block" ---
+# This code runs only when this file is executed directly.
+if __name__ == "__main__":
+
+    print("\n---------------------------------------------------------")
+    print(">>> 'price_cache.py' was RUN DIRECTLY (Testing Mode) <<<")
+    print("---------------------------------------------------------")
+
+    import tempfile
+
+    class EmptySource(PriceSource):
+        # A successful fetch without prices (e.g. before the listing date)
+        def __init__(self):
+            self.calls = 0
+
+        def fetch(self, tickers: List[str], start_date: str, end_date: str) -> pd.DataFrame:
+            self.calls += 1
+            return pd.DataFrame(columns=tickers, dtype=float)
+
+    class FailingSource(PriceSource):
+        # Like a network hiccup: the fetch raises
+        def __init__(self):
+            self.calls = 0
+
+        def fetch(self, tickers: List[str], start_date: str, end_date: str) -> pd.DataFrame:
+            self.calls += 1
+            raise ConnectionError("network down")
+
+    class FakeSource(PriceSource):
+        # One price per business day, so the test runs offline
+        def fetch(self, tickers: List[str], start_date: str, end_date: str) -> pd.DataFrame:
+            dates = pd.bdate_range(start_date, end_date, inclusive="left")
+            return pd.DataFrame({t: np.arange(len(dates), dtype=float) + 100 for t in tickers}, index=dates)
+
+    with tempfile.TemporaryDirectory() as directory:
+        # Test 1: a failed fetch must not poison the cache (asked twice, both go to the source)
+        failing = FailingSource()
+        cache = PriceCache(directory, source=failing)
+        for _ in range(2):
+            prices = cache.get_prices(["AAPL"], "2021-01-01", "2021-03-01")
+            assert prices["AAPL"].empty
+        assert failing.calls == 2 and cache.hits == 0
+        assert "AAPL" not in cache._coverage and not os.path.exists(cache._ticker_path("AAPL"))
+        print("Failed fetch: nothing cached, source asked again on the second call.")
+
+        # Test 2: a successful empty fetch is covered (no file), the second call is a hit
+        empty = EmptySource()
+        cache = PriceCache(directory, source=empty)
+        for _ in range(2):
+            prices = cache.get_prices(["NEWCO"], "2021-01-01", "2021-03-01")
+            assert prices["NEWCO"].empty
+        assert empty.calls == 1 and cache.hits == 1
+        assert "NEWCO" in cache._coverage and not os.path.exists(cache._ticker_path("NEWCO"))
+        print("Empty fetch: range covered without a file, second call is a hit.")
+
+        # Test 3: real rows are cached, the second call is a hit
+        cache = PriceCache(directory, source=FakeSource())
+        first = cache.get_prices(["AAPL", "MSFT"], "2021-01-01", "2021-03-01")
+        second = cache.get_prices(["AAPL", "MSFT"], "2021-01-01", "2021-03-01")
+        assert first.equals(second) and cache.hits == 2 and len(first) > 0
+        print(f"Cached {len(first)} rows, second call: {cache.hits} hit(s).")
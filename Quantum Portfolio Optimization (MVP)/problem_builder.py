@@ -6,18 +6,28 @@ and convert them into a Qiskit QuadraticProgram object.
 """
 
 # Step 1: Import necessary tools 
+import numpy as np
 import pandas as pd
 
 # Import the main Qiskit optimization class
 from qiskit_optimization import QuadraticProgram
 # Typing (optional, but good practice)
-from typing import Tuple
+from typing import Optional, Tuple, Union
+
+# Low-rank factor model for Sigma
+from risk_model import FactorCovariance
+# Stage timing / memory traces (instrumentation.py)
+from instrumentation import traced
 
 # --- Function to build the Qiskit Problem ---
 
-def create_quadratic_program(mu: pd.Series, sigma: pd.DataFrame, k: int, q: float = 1.0) -> QuadraticProgram:
+@traced("create_quadratic_program")
+def create_quadratic_program(mu: pd.Series, sigma: Union[pd.DataFrame, FactorCovariance], k: int, q: float = 1.0,
+                             n_factors: Optional[int] = None) -> QuadraticProgram:
     """
      Create a Qiskit QuadraticProgram object using mu, sigma, k, and q.
+     'sigma' can also be a FactorCovariance (risk_model.py). With 'n_factors' set,
+     a dense sigma is first replaced by its PCA factor model with that many factors.
     """
     print(f"[Problem Builder]: Creating Quadratic Program for n={len(mu)} assets, k={k}, q={q}...")
     
@@ -40,7 +50,13 @@ def create_quadratic_program(mu: pd.Series, sigma: pd.DataFrame, k: int, q: floa
     linear_objective = -mu.values
     
     # Risk (Quadratic part): q * sigma
-    quadratic_objective = q * sigma.values
+    if n_factors is not None and not isinstance(sigma, FactorCovariance):
+        sigma = FactorCovariance.from_pca(sigma, n_factors)
+    if isinstance(sigma, FactorCovariance):
+        # QuadraticProgram stores every (i, j) term, so here we do need the dense matrix
+        quadratic_objective = q * sigma.to_dense().values
+    else:
+        quadratic_objective = q * sigma.values
     
     # Tell Qiskit to minimize this objective
     qp.minimize(linear=linear_objective, quadratic=quadratic_objective)
@@ -59,6 +75,25 @@ def create_quadratic_program(mu: pd.Series, sigma: pd.DataFrame, k: int, q: floa
     # Return the final QuadraticProgram
     return qp
 
+# --- Function to score many portfolios at once ---
+
+def evaluate_portfolios(X: np.ndarray, mu: pd.Series, sigma: Union[pd.DataFrame, FactorCovariance], q: float = 1.0) -> np.ndarray:
+    """
+    Objective value q*(x^T Σ x) - mu^T x for every row x of X (0/1 matrix, m x n).
+    Same numbers as qp.objective.evaluate(x), but for all rows in a few array operations.
+    With a FactorCovariance this costs O(m*n*f) and never builds the dense Σ.
+    """
+    X = np.asarray(X, dtype=float)
+    if X.ndim == 1:
+        X = X[None, :]
+
+    returns = X @ np.asarray(mu, dtype=float)
+    if isinstance(sigma, FactorCovariance):
+        risk = sigma.quad_form(X)
+    else:
+        risk = np.einsum("ij,jk,ik->i", X, np.asarray(sigma, dtype=float), X)
+    return q * risk - returns
+
 # --- "Testing Block" ---
 # This code only runs when you execute this file directly.
 if __name__ == "__main__":
@@ -0,0 +1,447 @@
+"""
+QAOA Simulator (qaoa_simulator.py)
+A small statevector simulator built only for our QAOA circuits.
+
+Our cost Hamiltonian only has Z and ZZ terms, so it is diagonal:
+- the 2^n cost energies are computed ONCE,
+- the cost layer exp(-i*gamma*H) is just an elementwise phase,
+- the X mixer exp(-i*beta*X) is applied as vectorized "butterflies" (a few qubits at a time).
+No circuit building, transpiling or generic gate simulation is needed.
+"""
+
+# Step 1: Import necessary tools
+import numpy as np
+from itertools import combinations
+from math import comb
+from typing import Dict, List, Optional, Tuple
+
+from qiskit.quantum_info import SparsePauliOp
+
+from hamiltonian_converter import ising_from_pauli_op
+from samples import PackedSamples
+
+# Work on the state in slices of this many amplitudes, so temporary arrays stay small
+_CHUNK = 1 << 20
+# Number of qubits whose X-mixer rotations are applied together as one small matrix
+_MIXER_GROUP = 4
+
+# Supported precisions: (state dtype, energy dtype)
+PRECISIONS = {
+    "complex128": (np.complex128, np.float64),
+    "complex64": (np.complex64, np.float32),
+}
+
+
+def diagonal_energies(h: np.ndarray, J: np.ndarray, dtype=np.float64) -> np.ndarray:
+    """
+    Energy of every basis state |x> (index = sum_i x_i 2^i) for
+    H = sum_i h_i Z_i + sum_{i<j} J_ij Z_i Z_j, with Z_i = +1 for bit 0 and -1 for bit 1.
+
+    Built qubit by qubit by "doubling" the array, which costs O(2^n) in total
+    instead of O(n^2 * 2^n) for evaluating every term on every state.
+    """
+    n = len(h)
+    J = np.triu(J, 1) + np.triu(J.T, 1)  # accept upper, lower or symmetric input
+    energies = np.zeros(1, dtype=dtype)
+
+    for m in range(n):
+        # Local field on qubit m coming from the lower qubits 0..m-1
+        field = np.full(1, h[m], dtype=dtype)
+        for j in range(m):
+            field = np.concatenate([field + J[j, m], field - J[j, m]])
+        # bit m = 0 -> Z_m = +1, bit m = 1 -> Z_m = -1
+        energies = np.concatenate([energies + field, energies - field])
+
+    return energies
+
+
+class DiagonalQAOASimulator:
+    """
+    Statevector simulator for QAOA with a diagonal (Z / ZZ) cost Hamiltonian
+    and the standard X mixer.
+
+    Parameters are ordered like Qiskit's QAOAAnsatz: [beta_0..beta_{p-1}, gamma_0..gamma_{p-1}].
+    """
+
+    def __init__(self, hamiltonian: SparsePauliOp, reps: int = 1, precision: str = "complex128"):
+        if precision not in PRECISIONS:
+            raise ValueError(f"precision must be one of {list(PRECISIONS)}")
+
+        self.reps = reps
+        self.num_qubits = hamiltonian.num_qubits
+        self.state_dtype, self.energy_dtype = PRECISIONS[precision]
+
+        # Precompute the cost energies once (identity terms are a constant shift)
+        h, J, constant = ising_from_pauli_op(hamiltonian)
+        self.energies = diagonal_energies(h, J, dtype=self.energy_dtype)
+        self.energies += self.energy_dtype(constant)
+
+    @property
+    def num_parameters(self) -> int:
+        return 2 * self.reps
+
+    # --- Layers ---
+
+    def _apply_cost(self, state: np.ndarray, gamma: float) -> None:
+        # |psi> <- exp(-i*gamma*H)|psi>, done chunk by chunk
+        for start in range(0, len(state), _CHUNK):
+            stop = start + _CHUNK
+            phase = np.exp((-1j * gamma) * self.energies[start:stop]).astype(self.state_dtype, copy=False)
+            state[start:stop] *= phase
+
+    def _apply_mixer(self, state: np.ndarray, beta: float) -> None:
+        # |psi> <- prod_q exp(-i*beta*X_q)|psi>, i.e. RX(2*beta) on every qubit.
+        # The RX "butterflies" of _MIXER_GROUP neighbouring qubits are merged into one
+        # small (2^g x 2^g) matrix, which is much faster than one qubit at a time.
+        c, s = np.cos(beta), -1j * np.sin(beta)
+        rx = np.array([[c, s], [s, c]], dtype=self.state_dtype)
+        n = self.num_qubits
+
+        q = 0
+        while q < n:
+            g = min(_MIXER_GROUP, n - q)
+            group_matrix = rx
+            for _ in range(g - 1):
+                group_matrix = np.kron(group_matrix, rx)
+
+            # View the state as (high bits, bits q..q+g-1, low bits)
+            high, dim, low = 1 << (n - q - g), 1 << g, 1 << q
+            view = state.reshape(high, dim, low)
+
+            # Update slice by slice, so the temporary stays about _CHUNK amplitudes
+            if high >= low:
+                rows = max(1, _CHUNK // (dim * low))
+                for i in range(0, high, rows):
+                    view[i:i + rows] = np.matmul(group_matrix, view[i:i + rows])
+            else:
+                cols = max(1, _CHUNK // (dim * high))
+                for j in range(0, low, cols):
+                    view[:, :, j:j + cols] = np.matmul(group_matrix, view[:, :, j:j + cols])
+            q += g
+
+    # --- Overlaps used by the gradient ---
+
+    def _cost_overlap(self, bra: np.ndarray, ket: np.ndarray) -> complex:
+        # <bra| H |ket>, chunk by chunk
+        total = 0j
+        for start in range(0, len(ket), _CHUNK):
+            stop = start + _CHUNK
+            total += np.vdot(bra[start:stop], self.energies[start:stop] * ket[start:stop])
+        return complex(total)
+
+    def _mixer_overlap(self, bra: np.ndarray, ket: np.ndarray) -> complex:
+        # <bra| sum_q X_q |ket>, with the same qubit groups and slicing as _apply_mixer
+        # (one small "sum of X" matrix per group instead of one pass per qubit)
+        x_gate = np.array([[0, 1], [1, 0]], dtype=self.state_dtype)
+        n = self.num_qubits
+        total = 0j
+
+        q = 0
+        while q < n:
+            g = min(_MIXER_GROUP, n - q)
+            dim = 1 << g
+            group_matrix = np.zeros((dim, dim), dtype=self.state_dtype)
+            for position in range(g):
+                term = np.kron(np.eye(1 << (g - position - 1), dtype=self.state_dtype), x_gate)
+                group_matrix += np.kron(term, np.eye(1 << position, dtype=self.state_dtype))
+
+            high, low = 1 << (n - q - g), 1 << q
+            bra_view, ket_view = bra.reshape(high, dim, low), ket.reshape(high, dim, low)
+            if high >= low:
+                rows = max(1, _CHUNK // (dim * low))
+                for i in range(0, high, rows):
+                    total += np.vdot(bra_view[i:i + rows], np.matmul(group_matrix, ket_view[i:i + rows]))
+            else:
+                cols = max(1, _CHUNK // (dim * high))
+                for j in range(0, low, cols):
+                    total += np.vdot(bra_view[:, :, j:j + cols], np.matmul(group_matrix, ket_view[:, :, j:j + cols]))
+            q += g
+        return complex(total)
+
+    # --- Public API ---
+
+    def statevector(self, parameters: np.ndarray) -> np.ndarray:
+        """
+        Final QAOA state for the given parameters.
+        """
+        parameters = np.asarray(parameters, dtype=float)
+        betas, gammas = parameters[:self.reps], parameters[self.reps:]
+
+        # Start in |+>^n (uniform superposition)
+        state = np.full(1 << self.num_qubits, 1.0 / np.sqrt(1 << self.num_qubits), dtype=self.state_dtype)
+        for gamma, beta in zip(gammas, betas):
+            self._apply_cost(state, gamma)
+            self._apply_mixer(state, beta)
+        return state
+
+    def probabilities(self, parameters: np.ndarray) -> np.ndarray:
+        state = self.statevector(parameters)
+        probs = state.real ** 2 + state.imag ** 2
+        return probs / probs.sum()
+
+    def expectation_from_state(self, state: np.ndarray) -> float:
+        total = 0.0
+        for start in range(0, len(state), _CHUNK):
+            chunk = state[start:start + _CHUNK]
+            total += float(np.dot(chunk.real ** 2 + chunk.imag ** 2, self.energies[start:start + _CHUNK]))
+        return total
+
+    def expectation(self, parameters: np.ndarray) -> float:
+        """
+        <psi(parameters)| H |psi(parameters)>, the objective QAOA minimizes.
+        """
+        return self.expectation_from_state(self.statevector(parameters))
+
+    def expectation_and_gradient(self, parameters: np.ndarray) -> Tuple[float, np.ndarray]:
+        """
+        <H> and its exact gradient (same parameter order) with the "adjoint" method:
+        one forward simulation, then one backward sweep that undoes the layers while
+        carrying lambda = U_later^dagger H |psi>. For a layer exp(-i*theta*A),
+        dE/dtheta = 2 * Im <lambda|A|psi>. The cost is about 3 simulations,
+        no matter how many parameters (no shifted circuits at all).
+        """
+        parameters = np.asarray(parameters, dtype=float)
+        betas, gammas = parameters[:self.reps], parameters[self.reps:]
+
+        state = self.statevector(parameters)
+        energy = self.expectation_from_state(state)
+        lam = state * self.energies
+
+        gradient = np.zeros(2 * self.reps)
+        for layer in reversed(range(self.reps)):
+            gradient[layer] = 2.0 * self._mixer_overlap(lam, state).imag
+            self._apply_mixer(state, -betas[layer])
+            self._apply_mixer(lam, -betas[layer])
+
+            gradient[self.reps + layer] = 2.0 * self._cost_overlap(lam, state).imag
+            self._apply_cost(state, -gammas[layer])
+            self._apply_cost(lam, -gammas[layer])
+
+        return energy, gradient
+
+    def energy_of_state(self, state: int) -> float:
+        """Cost energy of one basis state (given as an integer, bit i = qubit i)."""
+        return float(self.energies[state])
+
+    def energies_of_states(self, states: np.ndarray) -> np.ndarray:
+        """Cost energies of many basis states at once (same convention as energy_of_state)."""
+        return self.energies[np.asarray(states, dtype=np.int64)]
+
+    def sample(self, parameters: np.ndarray, shots: int = 1024, seed: Optional[int] = None) -> Dict[str, float]:
+        """
+        Sample bitstrings from the final state, returned like the Qiskit sampler result:
+        {bitstring: frequency} with the highest qubit on the left.
+        """
+        return self.sample_packed(parameters, shots=shots, seed=seed).to_eigenstate()
+
+    def sample_packed(self, parameters: np.ndarray, shots: int = 1024, seed: Optional[int] = None) -> PackedSamples:
+        """
+        Same as sample(), but returns the compact PackedSamples (samples.py).
+        """
+        probs = self.probabilities(parameters)
+        states, counts = sample_states(probs, shots, np.random.default_rng(seed))
+        return PackedSamples.from_states(states, counts / shots, self.num_qubits)
+
+
+def sample_states(probs: np.ndarray, shots: int, rng: np.random.Generator) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Draw 'shots' samples from a probability vector. Returns (unique states, counts).
+    Works chunk by chunk, so no full-size cumulative array is needed for large n.
+    """
+    chunk_starts = np.arange(0, len(probs), _CHUNK)
+    chunk_probs = np.add.reduceat(probs.astype(np.float64), chunk_starts)
+    chunk_counts = rng.multinomial(shots, chunk_probs / chunk_probs.sum())
+
+    samples = []
+    for start, count in zip(chunk_starts, chunk_counts):
+        if count == 0:
+            continue
+        p = probs[start:start + _CHUNK].astype(np.float64)
+        samples.append(start + rng.choice(len(p), size=count, p=p / p.sum()))
+
+    return np.unique(np.concatenate(samples), return_counts=True)
+
+
+# --- Constraint-preserving QAOA: only the Hamming-weight-k subspace ---
+
+def hamming_weight_states(n: int, k: int) -> np.ndarray:
+    """
+    All n-bit integers with exactly k ones (the C(n,k) feasible portfolios), sorted.
+    """
+    count = comb(n, k)
+    states = np.fromiter((sum(1 << i for i in chosen) for chosen in combinations(range(n), k)),
+                         dtype=np.int64, count=count)
+    return np.sort(states)
+
+
+def subspace_energies(h: np.ndarray, J: np.ndarray, states: np.ndarray, dtype=np.float64) -> np.ndarray:
+    """
+    Energy of each given basis state for H = sum_i h_i Z_i + sum_{i<j} J_ij Z_i Z_j.
+    """
+    n = len(h)
+    J_sym = np.triu(J, 1) + np.triu(J.T, 1)
+    J_sym = J_sym + J_sym.T
+    energies = np.empty(len(states), dtype=dtype)
+    for start in range(0, len(states), _CHUNK // max(1, n)):
+        chunk = states[start:start + _CHUNK // max(1, n)]
+        # Z_i = +1 for bit 0 and -1 for bit 1
+        z = 1.0 - 2.0 * ((chunk[:, None] >> np.arange(n)) & 1)
+        energies[start:start + len(chunk)] = z @ h + 0.5 * ((z @ J_sym) * z).sum(axis=1)
+    return energies
+
+
+def xy_mixer_edges(n: int, mixer: str = "ring") -> List[Tuple[int, int]]:
+    """
+    Qubit pairs the XY mixer acts on, in the order they are applied.
+    "ring":     (i, i+1 mod n), even edges first, then odd edges (parity ring mixer).
+    "complete": every pair (i, j).
+    """
+    if mixer == "complete":
+        return list(combinations(range(n), 2))
+    if mixer != "ring":
+        raise ValueError("mixer must be 'ring' or 'complete'.")
+
+    if n == 2:
+        return [(0, 1)]
+    ring = [(i, (i + 1) % n) for i in range(n)]
+    even = [edge for i, edge in enumerate(ring) if i % 2 == 0 and not (n % 2 == 1 and i == n - 1)]
+    odd = [edge for i, edge in enumerate(ring) if i % 2 == 1]
+    # With an odd number of qubits the closing edge needs its own layer
+    last = [ring[-1]] if n % 2 == 1 else []
+    return even + odd + last
+
+
+class SubspaceQAOASimulator:
+    """
+    QAOA that never leaves the feasible set sum(x) = k:
+    - starts in the Dicke state (uniform superposition of all C(n,k) feasible bitstrings),
+    - uses the XY mixer exp(-i*beta*(XX+YY)/2) on pairs of qubits, which only swaps a 1 and a 0,
+    - stores ONLY the C(n,k) amplitudes of that subspace (not 2^n).
+
+    Parameters are ordered like the other simulator: [beta_0..beta_{p-1}, gamma_0..gamma_{p-1}].
+    """
+
+    def __init__(self, hamiltonian: SparsePauliOp, k: int, reps: int = 1, precision: str = "complex128",
+                 mixer: str = "ring"):
+        if precision not in PRECISIONS:
+            raise ValueError(f"precision must be one of {list(PRECISIONS)}")
+        n = hamiltonian.num_qubits
+        if not 0 <= k <= n:
+            raise ValueError(f"k must be between 0 and {n}.")
+
+        self.reps = reps
+        self.k = k
+        self.num_qubits = n
+        self.state_dtype, self.energy_dtype = PRECISIONS[precision]
+
+        # The feasible basis states and their cost energies
+        self.states = hamming_weight_states(n, k)
+        h, J, constant = ising_from_pauli_op(hamiltonian)
+        self.energies = subspace_energies(h, J, self.states, dtype=self.energy_dtype)
+        self.energies += self.energy_dtype(constant)
+
+        # For every mixer edge (i, j): positions of the states with bits (i, j) = (1, 0)
+        # and of their partners with (0, 1). The XY term only mixes these pairs.
+        self._edge_pairs = []
+        for i, j in xy_mixer_edges(n, mixer):
+            bit_i = (self.states >> i) & 1
+            bit_j = (self.states >> j) & 1
+            first = np.nonzero((bit_i == 1) & (bit_j == 0))[0]
+            partners = self.states[first] ^ ((1 << i) | (1 << j))
+            second = np.searchsorted(self.states, partners)
+            self._edge_pairs.append((first, second))
+
+    @property
+    def num_parameters(self) -> int:
+        return 2 * self.reps
+
+    @property
+    def dimension(self) -> int:
+        return len(self.states)
+
+    def _apply_edge(self, state: np.ndarray, first: np.ndarray, second: np.ndarray, beta: float) -> None:
+        # exp(-i*beta*(XX+YY)/2) acts on each (|10>, |01>) pair like [[cos, -i sin], [-i sin, cos]]
+        c = self.state_dtype(np.cos(beta))
+        s = self.state_dtype(-1j * np.sin(beta))
+        a = state[first]
+        b = state[second]
+        state[first] = c * a + s * b
+        state[second] = s * a + c * b
+
+    def _apply_mixer(self, state: np.ndarray, beta: float) -> None:
+        for first, second in self._edge_pairs:
+            self._apply_edge(state, first, second, beta)
+
+    def statevector(self, parameters: np.ndarray) -> np.ndarray:
+        """
+        Final QAOA state, as amplitudes over self.states.
+        """
+        parameters = np.asarray(parameters, dtype=float)
+        betas, gammas = parameters[:self.reps], parameters[self.reps:]
+
+        # Dicke state |D^n_k>
+        state = np.full(self.dimension, 1.0 / np.sqrt(self.dimension), dtype=self.state_dtype)
+        for gamma, beta in zip(gammas, betas):
+            state *= np.exp((-1j * gamma) * self.energies).astype(self.state_dtype, copy=False)
+            self._apply_mixer(state, beta)
+        return state
+
+    def probabilities(self, parameters: np.ndarray) -> np.ndarray:
+        state = self.statevector(parameters)
+        probs = state.real ** 2 + state.imag ** 2
+        return probs / probs.sum()
+
+    def expectation(self, parameters: np.ndarray) -> float:
+        state = self.statevector(parameters)
+        return float(np.dot(state.real ** 2 + state.imag ** 2, self.energies))
+
+    def expectation_and_gradient(self, parameters: np.ndarray) -> Tuple[float, np.ndarray]:
+        """
+        <H> and its exact gradient, with the same adjoint sweep as DiagonalQAOASimulator.
+        The XY edge terms do not commute, so the sweep undoes the mixer one edge at a
+        time and every edge adds its own share to dE/dbeta.
+        """
+        parameters = np.asarray(parameters, dtype=float)
+        betas, gammas = parameters[:self.reps], parameters[self.reps:]
+
+        state = self.statevector(parameters)
+        energy = float(np.dot(state.real ** 2 + state.imag ** 2, self.energies))
+        lam = state * self.energies
+
+        gradient = np.zeros(2 * self.reps)
+        for layer in reversed(range(self.reps)):
+            for first, second in reversed(self._edge_pairs):
+                # The edge term A swaps the amplitudes of each (|10>, |01>) pair
+                overlap = np.vdot(lam[first], state[second]) + np.vdot(lam[second], state[first])
+                gradient[layer] += 2.0 * overlap.imag
+                self._apply_edge(state, first, second, -betas[layer])
+                self._apply_edge(lam, first, second, -betas[layer])
+
+            gradient[self.reps + layer] = 2.0 * np.vdot(lam, self.energies * state).imag
+            phase = np.exp((1j * gammas[layer]) * self.energies).astype(self.state_dtype, copy=False)
+            state *= phase
+            lam *= phase
+
+        return energy, gradient
+
+    def energy_of_state(self, state: int) -> float:
+        return float(self.energies[np.searchsorted(self.states, state)])
+
+    def energies_of_states(self, states: np.ndarray) -> np.ndarray:
+        # Every sampled state is feasible, so it is in self.states
+        return self.energies[np.searchsorted(self.states, states)]
+
+    def sample(self, parameters: np.ndarray, shots: int = 1024, seed: Optional[int] = None) -> Dict[str, float]:
+        """
+        Sample bitstrings from the final state ({bitstring: frequency}, highest qubit on the left).
+        Every sampled bitstring has exactly k ones.
+        """
+        return self.sample_packed(parameters, shots=shots, seed=seed).to_eigenstate()
+
+    def sample_packed(self, parameters: np.ndarray, shots: int = 1024, seed: Optional[int] = None) -> PackedSamples:
+        """
+        Same as sample(), but returns the compact PackedSamples (samples.py).
+        """
+        probs = self.probabilities(parameters)
+        positions, counts = sample_states(probs, shots, np.random.default_rng(seed))
+        return PackedSamples.from_states(self.states[positions], counts / shots, self.num_qubits)
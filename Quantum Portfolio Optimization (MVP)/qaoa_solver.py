@@ -7,37 +7,204 @@ and solve it using the QAOA algorithm to produce the final result.
 # Step 1: Import necessary tools
 
 from qiskit_algorithms.minimum_eigensolvers import QAOA
-from qiskit_algorithms.optimizers import COBYLA
+from qiskit_algorithms.minimum_eigensolvers.sampling_vqe import SamplingVQEResult
+from qiskit_algorithms.optimizers import ADAM, COBYLA, L_BFGS_B, SPSA, OptimizerResult
+from qiskit_algorithms.gradients import ParamShiftSamplerGradient
+from qiskit.circuit.library import QAOAAnsatz
 
 # We use the default sampler from qiskit.primitives.
 from qiskit.primitives import StatevectorSampler as Sampler
+# ... or Aer's multi-threaded sampler (backend="aer")
+from qiskit_aer import AerSimulator
+from qiskit_aer.primitives import SamplerV2 as AerSampler
+from qiskit.transpiler import generate_preset_pass_manager
 
 # For representing Pauli operators (Z)
 from qiskit.quantum_info import SparsePauliOp
 # Type hints
-from typing import List, Tuple, Dict
+from typing import Callable, List, Optional, Tuple, Dict
 import numpy as np
+import time
 # QuadraticProgram type (imported elsewhere)
 from qiskit_optimization import QuadraticProgram
-import json
+
+# Our own QAOA simulators (qaoa_simulator.py)
+from qaoa_simulator import DiagonalQAOASimulator, SubspaceQAOASimulator, sample_states, subspace_energies
+from hamiltonian_converter import ising_from_pauli_op
+# Compact sampled bitstrings + vectorized scoring (samples.py)
+from samples import LazyEigenstate, PackedSamples, evaluate_samples, get_samples, top_feasible
+
+# Warm-start parameter store + layer growth (parameter_store.py)
+from parameter_store import ParameterStore, hamiltonian_scale, interpolate_parameters
+# Adaptive shot schedule + early-stopped readout (adaptive_shots.py)
+from adaptive_shots import MIN_SHOTS, AdaptiveShotSampler, ShotSchedule, early_stopped_readout
+# Stage timing / memory traces (instrumentation.py)
+from instrumentation import add_metrics, traced
+
+# Backends that solve_with_qaoa can use
+BACKENDS = ("sampler", "diagonal", "subspace", "aer")
+# Aer simulation methods for backend="aer"
+AER_METHODS = ("statevector", "matrix_product_state")
+
+# Classical optimizers solve_with_qaoa can use
+OPTIMIZERS = ("cobyla", "l_bfgs_b", "adam", "spsa")
+# ... and the ones that need the gradient of <H>
+GRADIENT_OPTIMIZERS = ("l_bfgs_b", "adam")
+
+# COBYLA's first step size when we already start near a good point (default is 1.0)
+WARM_START_RHOBEG = 0.2
+# ADAM's step size (in units of beta and gamma * scale, see _scaled_minimizer)
+ADAM_LR = 0.05
+WARM_START_ADAM_LR = 0.01
 
 # --- Function to Solve with QAOA ---
 
-def solve_with_qaoa(hamiltonian: SparsePauliOp) -> Dict:
+@traced("solve_with_qaoa")
+def solve_with_qaoa(hamiltonian: SparsePauliOp, backend: str = "sampler", reps: int = 1,
+                    initial_point: Optional[np.ndarray] = None, precision: str = "complex128",
+                    shots: int = 1024, seed: Optional[int] = None,
+                    k: Optional[int] = None, mixer: str = "ring", q: Optional[float] = None,
+                    parameter_store: Optional[ParameterStore] = None, layer_growth: bool = False,
+                    optimizer: str = "cobyla", aer_method: str = "statevector",
+                    threads: Optional[int] = None, aer_options: Optional[Dict] = None,
+                    adaptive_shots: bool = False, early_stop_readout: bool = False) -> Dict:
     """
     Take an Ising Hamiltonian and solve it using QAOA.
+
+    backend="sampler":  Qiskit's QAOA with the reference StatevectorSampler (original path).
+    backend="diagonal": our DiagonalQAOASimulator (qaoa_simulator.py). 'precision' can be
+                        "complex64" to halve memory. The result has the same fields.
+    backend="subspace": constraint-preserving QAOA (Dicke state + XY 'mixer', "ring" or
+                        "complete") that only stores the C(n, k) bitstrings with k ones.
+                        Needs 'k'. Every sampled portfolio is feasible.
+    backend="aer":      Qiskit's QAOA on Aer's SamplerV2 (CPU, shot-based), with
+                        aer_method "statevector" or "matrix_product_state" (MPS: memory
+                        grows with entanglement instead of 2^n, so weakly entangled p=1
+                        circuits fit beyond the statevector limit). threads = OpenMP
+                        threads (None: all cores). aer_options: extra Aer backend options,
+                        e.g. {"matrix_product_state_max_bond_dimension": 16}.
+
+    Warm starts (parameter_store.py):
+    parameter_store: seeds the optimizer from stored angles of a similar problem (keyed by
+                     n, k, q, reps, the mixer and the Hamiltonian fingerprint) and stores
+                     the new optimum.
+    layer_growth:    solve p=1, 2, ..., reps in turn, starting each depth from the
+                     interpolated optimum of the previous one (skipped if the store already
+                     provides a starting point). cost_function_evals counts all depths.
+
+    optimizer: "cobyla" (default), "spsa", or the gradient-based "l_bfgs_b" / "adam".
+               On the "diagonal" and "subspace" backends the gradient is exact
+               (adjoint method, about 3 simulations per gradient). On the "sampler"
+               backend it comes from the parameter-shift rule, with all shifted circuits
+               sent to the sampler as one batched job.
+
+    Shot budget (adaptive_shots.py):
+    adaptive_shots:     ("sampler" / "aer") start the optimization with few shots per
+                        evaluation and double them whenever the objective stops improving,
+                        up to 'shots'. The simulators compute <H> exactly and ignore this.
+    early_stop_readout: sample the final state in batches and stop once the top feasible
+                        bitstring (k ones, if k is given) is clearly ahead of the runner-up.
+                        It never uses more than 'shots'; the result then holds its counts.
+    Every result has result.shots_used = {"optimization", "readout", "total"} (on "sampler" /
+    "aer", QAOA's own final sampling counts as "optimization").
     """
-    print("[QAOA Solver]: Setting up the QAOA engine...")
-    
-     # 1. Classical optimizer
-    optimizer = COBYLA()
-    
-    # 2. Quantum sampler (simulator)
-    simulator = Sampler()
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown backend '{backend}'. Choose one of {BACKENDS}.")
+    if optimizer not in OPTIMIZERS:
+        raise ValueError(f"Unknown optimizer '{optimizer}'. Choose one of {OPTIMIZERS}.")
+    if backend == "aer" and aer_method not in AER_METHODS:
+        raise ValueError(f"Unknown aer_method '{aer_method}'. Choose one of {AER_METHODS}.")
+
+    # The mixer the angles belong to: the XY mixer on "subspace", the X mixer otherwise
+    mixer_family = f"xy-{mixer}" if backend == "subspace" else "x"
+    if initial_point is None and parameter_store is not None:
+        initial_point = parameter_store.lookup(hamiltonian, reps, k=k, q=q, mixer=mixer_family)
+        add_metrics(parameter_store_hit=initial_point is not None)
+
+    options = dict(backend=backend, precision=precision, shots=shots, seed=seed, k=k, mixer=mixer,
+                   optimizer=optimizer, aer_method=aer_method, threads=threads, aer_options=aer_options,
+                   adaptive_shots=adaptive_shots, early_stop_readout=early_stop_readout)
+
+    if layer_growth and reps > 1 and initial_point is None:
+        total_evals = 0
+        total_shots = {"optimization": 0, "readout": 0, "total": 0}
+        # Interpolation needs a smooth p=1 optimum, so p=1 starts from small angles
+        scale = hamiltonian_scale(hamiltonian)
+        point = np.array([np.pi / 8, np.pi / (8 * scale)])
+        for depth in range(1, reps + 1):
+            print(f"[QAOA Solver]: Layer growth: solving with p={depth}...")
+            result = _solve_once(hamiltonian, reps=depth, initial_point=point, warm_start=depth > 1, **options)
+            total_evals += int(result.cost_function_evals)
+            for key in total_shots:
+                total_shots[key] += result.shots_used[key]
+            if parameter_store is not None:
+                parameter_store.save(hamiltonian, result.optimal_point, result.eigenvalue, k=k, q=q,
+                                     mixer=mixer_family)
+            if depth < reps:
+                point = interpolate_parameters(result.optimal_point)
+        result.cost_function_evals = total_evals
+        result.shots_used = total_shots
+        return result
+
+    result = _solve_once(hamiltonian, reps=reps, initial_point=initial_point,
+                         warm_start=initial_point is not None, **options)
+    if parameter_store is not None:
+        parameter_store.save(hamiltonian, result.optimal_point, result.eigenvalue, k=k, q=q, mixer=mixer_family)
+    return result
+
+def _solve_once(hamiltonian: SparsePauliOp, backend: str, reps: int, initial_point: Optional[np.ndarray],
+                warm_start: bool, precision: str, shots: int, seed: Optional[int], k: Optional[int],
+                mixer: str, optimizer: str, aer_method: str, threads: Optional[int],
+                aer_options: Optional[Dict], adaptive_shots: bool, early_stop_readout: bool) -> Dict:
+    # One QAOA run at a fixed depth on the chosen backend
+    if backend == "diagonal":
+        print(f"[QAOA Solver]: Setting up the diagonal QAOA simulator ({hamiltonian.num_qubits} qubits, {precision})...")
+        simulator = DiagonalQAOASimulator(hamiltonian, reps=reps, precision=precision)
+        return _solve_with_simulator(simulator, hamiltonian, optimizer, initial_point, warm_start, shots, seed,
+                                     k, early_stop_readout)
+
+    if backend == "subspace":
+        if k is None:
+            raise ValueError("backend='subspace' needs the budget k (number of assets to pick).")
+        simulator = SubspaceQAOASimulator(hamiltonian, k=k, reps=reps, precision=precision, mixer=mixer)
+        print(f"[QAOA Solver]: Set up the Dicke-state / XY-mixer QAOA ({simulator.dimension} feasible states "
+              f"instead of {2 ** hamiltonian.num_qubits}, {precision})...")
+        return _solve_with_simulator(simulator, hamiltonian, optimizer, initial_point, warm_start, shots, seed,
+                                     k, early_stop_readout)
+
+     # 1. Quantum sampler (simulator)
+    if backend == "aer":
+        print(f"[QAOA Solver]: Setting up the QAOA engine (Aer {aer_method}, "
+              f"{'all' if not threads else threads} thread(s))...")
+        simulator, transpiler = _make_aer_sampler(aer_method, threads, aer_options, shots, seed)
+    else:
+        print("[QAOA Solver]: Setting up the QAOA engine...")
+        simulator, transpiler = Sampler(default_shots=shots, seed=seed), None
+    # Counts every shot sent; with adaptive_shots the schedule raises its shots step by step
+    counting_sampler = AdaptiveShotSampler(simulator, min(MIN_SHOTS, shots) if adaptive_shots else shots)
+    schedule = ShotSchedule(counting_sampler, max_shots=shots) if adaptive_shots else None
+
+    # 2. Classical optimizer (gradient-based ones get batched parameter-shift gradients)
+    gradient = (_param_shift_gradient(hamiltonian, reps, counting_sampler, transpiler)
+                if optimizer in GRADIENT_OPTIMIZERS else None)
+
+    def make_minimizer(warm: bool):
+        classical_optimizer = _make_optimizer(optimizer, warm)
+        if optimizer == "cobyla":
+            return classical_optimizer
+        return _scaled_minimizer(classical_optimizer, hamiltonian_scale(hamiltonian), gradient)
+
+    classical_optimizer = make_minimizer(warm_start)
+    if schedule is not None:
+        # Restarts after a shot increase refine the point reached so far
+        classical_optimizer = schedule.minimizer(_as_function(classical_optimizer),
+                                                 _as_function(make_minimizer(True)))
 
     # 3. Build QAOA instance
-    reps = 1 # number of QAOA layers (p=1)
-    qaoa_engine = QAOA(sampler=simulator, optimizer=optimizer, reps=reps)
+    # reps = number of QAOA layers (p=1 by default)
+    qaoa_engine = QAOA(sampler=counting_sampler, optimizer=classical_optimizer, reps=reps,
+                       initial_point=initial_point, transpiler=transpiler,
+                       callback=schedule.callback if schedule is not None else None)
     
     print("[QAOA Solver]: Solving the Hamiltonian (searching for best solution)...")
     
@@ -45,46 +212,281 @@ def solve_with_qaoa(hamiltonian: SparsePauliOp) -> Dict:
     result = qaoa_engine.compute_minimum_eigenvalue(hamiltonian)
     
     print("[QAOA Solver]: Solution obtained.")
-    
-    # 5. Return the raw result
+
+    # 5. Final readout (optionally stopped early) and the shot report
+    readout_shots = 0
+    if early_stop_readout:
+        circuit = result.optimal_circuit
+        register = circuit.cregs[0].name
+
+        def draw(batch: int) -> Dict[str, int]:
+            job = simulator.run([(circuit, result.optimal_point)], shots=batch)
+            return getattr(job.result()[0].data, register).get_counts()
+
+        readout = early_stopped_readout(draw, k=k, max_shots=shots)
+        readout_shots = readout["shots"]
+        result.eigenstate = {bits: count / readout_shots for bits, count in readout["counts"].items()}
+        result.samples = PackedSamples.from_eigenstate(result.eigenstate)
+    result.shots_used = {"optimization": counting_sampler.shots_used, "readout": readout_shots,
+                         "total": counting_sampler.shots_used + readout_shots}
+    print(f"[QAOA Solver]: Shots used: {result.shots_used}.")
+
+    # 6. Return the raw result
+    return result
+
+def _make_optimizer(optimizer: str, warm_start: bool):
+    # Smaller first steps when starting from stored / interpolated / given parameters,
+    # so the optimizer refines them instead of jumping far away
+    if optimizer == "l_bfgs_b":
+        return L_BFGS_B(maxiter=1000)
+    if optimizer == "adam":
+        return ADAM(maxiter=500, lr=WARM_START_ADAM_LR if warm_start else ADAM_LR)
+    if optimizer == "spsa":
+        return SPSA(maxiter=300)
+    if warm_start:
+        return COBYLA(rhobeg=WARM_START_RHOBEG)
+    return COBYLA()
+
+def _as_function(minimizer) -> Callable:
+    # Qiskit Optimizer object or minimizer function -> minimizer function
+    return minimizer.minimize if hasattr(minimizer, "minimize") else minimizer
+
+def _scaled_minimizer(optimizer, scale: float, gradient: Optional[Callable] = None) -> Callable:
+    """
+    Wrap a Qiskit optimizer as a "minimizer" function that works on (beta, gamma * scale).
+    gamma multiplies the Hamiltonian's coefficients, so its useful range is about 1/scale;
+    rescaling lets one step size (ADAM, SPSA) suit both kinds of angles.
+    If 'gradient' is given, it is used as the jacobian (instead of what QAOA passes in).
+    """
+    def minimize(fun: Callable, x0: np.ndarray, jac: Optional[Callable] = None, bounds=None) -> OptimizerResult:
+        x0 = np.asarray(x0, dtype=float)
+        reps = len(x0) // 2
+        factors = np.concatenate([np.ones(reps), np.full(reps, scale)])
+        jac = gradient if gradient is not None else jac
+
+        # fun may get a batch of points (SPSA), dividing by 'factors' works for both
+        scaled_jac = None if jac is None else (lambda y: np.asarray(jac(np.asarray(y) / factors)) / factors)
+        result = optimizer.minimize(fun=lambda y: fun(np.asarray(y) / factors), x0=x0 * factors, jac=scaled_jac)
+        result.x = np.asarray(result.x) / factors
+        return result
+
+    return minimize
+
+def _make_aer_sampler(method: str, threads: Optional[int], aer_options: Optional[Dict], shots: int,
+                      seed: Optional[int]):
+    """
+    Aer's SamplerV2 on the CPU, plus a pass manager that rewrites the QAOA circuit
+    into gates Aer supports (the Pauli evolution gates are not native).
+    """
+    backend_options = {"method": method, "device": "CPU", "max_parallel_threads": threads or 0}
+    backend_options.update(aer_options or {})
+    sampler = AerSampler(default_shots=shots, seed=seed, options={"backend_options": backend_options})
+    pass_manager = generate_preset_pass_manager(optimization_level=1, backend=AerSimulator(**backend_options))
+    return sampler, pass_manager
+
+def _param_shift_gradient(hamiltonian: SparsePauliOp, reps: int, sampler, transpiler=None) -> Callable:
+    """
+    d<H>/d(parameters) for the sampler backend with Qiskit's ParamShiftSamplerGradient.
+    All shifted circuits of one gradient are submitted to the sampler as ONE job.
+    """
+    # Same circuit and parameter order (beta..., gamma...) as Qiskit's QAOA uses
+    ansatz = QAOAAnsatz(hamiltonian, reps=reps).decompose()
+    ansatz.measure_all()
+    gradient = ParamShiftSamplerGradient(sampler, transpiler=transpiler)
+    h, J, _ = ising_from_pauli_op(hamiltonian)
+
+    def jac(parameters: np.ndarray) -> np.ndarray:
+        result = gradient.run([ansatz], [np.asarray(parameters, dtype=float)]).result()
+        values = []
+        # One "quasi-distribution" d p(x) / d theta per parameter -> sum_x E(x) dp(x)/dtheta
+        for distribution in result.gradients[0]:
+            states = np.fromiter(distribution.keys(), dtype=np.int64, count=len(distribution))
+            weights = np.fromiter(distribution.values(), dtype=float, count=len(distribution))
+            values.append(float(np.dot(weights, subspace_energies(h, J, states))))
+        return np.array(values)
+
+    return jac
+
+class _SimulatorObjective:
+    """
+    fun / jac for the optimizer on one of our simulators.
+    With a gradient optimizer, the energy and gradient come from one adjoint sweep and
+    are cached, so fun(x) and jac(x) at the same point only simulate once.
+    'evaluations' counts simulations (forward runs or adjoint sweeps).
+    """
+
+    def __init__(self, simulator, with_gradient: bool):
+        self.simulator = simulator
+        self.with_gradient = with_gradient
+        self.evaluations = 0
+        self._point = None
+        self._cached = None
+
+    def _evaluate_with_gradient(self, x: np.ndarray) -> Tuple[float, np.ndarray]:
+        if self._point is None or not np.array_equal(x, self._point):
+            self.evaluations += 1
+            self._cached = self.simulator.expectation_and_gradient(x)
+            self._point = x.copy()
+        return self._cached
+
+    def energy(self, x: np.ndarray):
+        x = np.asarray(x, dtype=float)
+        if x.ndim == 2:
+            # A batch of points (SPSA evaluates several at once)
+            return [self.energy(row) for row in x]
+        if self.with_gradient:
+            return self._evaluate_with_gradient(x)[0]
+        self.evaluations += 1
+        return self.simulator.expectation(x)
+
+    def gradient(self, x: np.ndarray) -> np.ndarray:
+        return self._evaluate_with_gradient(np.asarray(x, dtype=float))[1]
+
+def _random_initial_point(num_parameters: int, seed: Optional[int]) -> np.ndarray:
+    # Same default as Qiskit's QAOA: uniform in [-2*pi, 2*pi]
+    return np.random.default_rng(seed).uniform(-2 * np.pi, 2 * np.pi, num_parameters)
+
+def _build_result(optimizer_result, samples: PackedSamples, simulator, optimizer_time: float) -> SamplingVQEResult:
+    """
+    Pack our own simulation into the same result type Qiskit's QAOA returns,
+    so interpret_result (and everything after it) works unchanged.
+    The compact samples are kept as result.samples; result.eigenstate is only turned
+    into a {bitstring: probability} dictionary when something reads it.
+    """
+    # Best measurement = sampled bitstring with the lowest energy (like Qiskit does),
+    # scored on the packed samples in one go
+    states = samples.to_states()
+    energies = simulator.energies_of_states(states)
+    best = int(np.argmin(energies))
+    best_state = int(states[best])
+
+    result = SamplingVQEResult()
+    result.eigenvalue = optimizer_result.fun
+    result.optimal_value = optimizer_result.fun
+    result.optimal_point = optimizer_result.x
+    reps = len(optimizer_result.x) // 2
+    names = [f"β[{i}]" for i in range(reps)] + [f"γ[{i}]" for i in range(reps)]
+    result.optimal_parameters = dict(zip(names, optimizer_result.x))
+    result.cost_function_evals = optimizer_result.nfev
+    result.optimizer_time = optimizer_time
+    result.optimizer_result = optimizer_result
+    result.best_measurement = {
+        "state": best_state,
+        "bitstring": samples.bitstring(best),
+        "value": complex(energies[best]),
+        "probability": float(samples.probabilities[best]),
+    }
+    result.eigenstate = LazyEigenstate(samples)
+    result.samples = samples
+    result.optimal_circuit = None
     return result
 
-def interpret_result(result: Dict, tickers: List[str], qp: 'QuadraticProgram') -> Tuple[List[str], float]:
+def _simulator_draw(simulator, parameters: np.ndarray, seed: Optional[int]) -> Callable[[int], Dict[str, int]]:
+    # draw(shots) -> {bitstring: count} from one of our simulators, for early_stopped_readout
+    probs = simulator.probabilities(parameters)
+    states = getattr(simulator, "states", None)  # the subspace simulator indexes feasible states only
+    rng = np.random.default_rng(seed)
+
+    def draw(batch: int) -> Dict[str, int]:
+        positions, counts = sample_states(probs, batch, rng)
+        drawn = positions if states is None else states[positions]
+        return {format(int(state), f"0{simulator.num_qubits}b"): int(count) for state, count in zip(drawn, counts)}
+
+    return draw
+
+def _solve_with_simulator(simulator, hamiltonian: SparsePauliOp, optimizer: str,
+                          initial_point: Optional[np.ndarray], warm_start: bool, shots: int,
+                          seed: Optional[int], k: Optional[int] = None,
+                          early_stop_readout: bool = False) -> SamplingVQEResult:
+    # Shared optimizer loop for our own simulators (qaoa_simulator.py)
+    if initial_point is None:
+        initial_point = _random_initial_point(simulator.num_parameters, seed)
+
+    print(f"[QAOA Solver]: Solving the Hamiltonian with {optimizer.upper()} (searching for best solution)...")
+    objective = _SimulatorObjective(simulator, with_gradient=optimizer in GRADIENT_OPTIMIZERS)
+    classical_optimizer = _make_optimizer(optimizer, warm_start)
+    start_time = time.time()
+    if optimizer == "cobyla":
+        optimizer_result = classical_optimizer.minimize(fun=objective.energy, x0=initial_point)
+    else:
+        minimize = _scaled_minimizer(classical_optimizer, hamiltonian_scale(hamiltonian),
+                                     objective.gradient if objective.with_gradient else None)
+        optimizer_result = minimize(objective.energy, initial_point)
+    optimizer_time = time.time() - start_time
+    optimizer_result.nfev = objective.evaluations
+    if optimizer_result.fun is None:
+        optimizer_result.fun = objective.energy(optimizer_result.x)
+
+    # Final readout: sample the optimal state like the sampler would (<H> itself was exact, no shots)
+    if early_stop_readout:
+        readout = early_stopped_readout(_simulator_draw(simulator, optimizer_result.x, seed), k=k,
+                                        max_shots=shots)
+        readout_shots = readout["shots"]
+        samples = PackedSamples.from_eigenstate({bits: count / readout_shots
+                                                 for bits, count in readout["counts"].items()})
+    else:
+        readout_shots = shots
+        samples = simulator.sample_packed(optimizer_result.x, shots=shots, seed=seed)
+    result = _build_result(optimizer_result, samples, simulator, optimizer_time)
+    result.shots_used = {"optimization": 0, "readout": readout_shots, "total": readout_shots}
+
+    print("[QAOA Solver]: Solution obtained.")
+    return result
+
+@traced("interpret_result")
+def interpret_result(result: Dict, tickers: List[str], qp: 'QuadraticProgram',
+                     rank_by: str = "probability") -> Tuple[List[str], float]:
     """
     Convert the raw QAOA result into human-friendly output (stock names).
+
+    rank_by="probability": pick the most often sampled bitstring (original behaviour).
+    rank_by="objective":   score ALL sampled bitstrings and pick the best feasible one.
     """
     
-    # ***** FIX APPLIED HERE *****
     # In recent Qiskit versions, result.eigenstate is a dictionary mapping bitstrings to counts.
-    
-    eigenstate_dict = result.eigenstate
-    print(f"[Interpreter]: Raw eigenstate dictionary (solution_str: counts): {eigenstate_dict}")
+    # We work on the packed form (samples.py): one bit matrix + probabilities.
+    samples = get_samples(result)
+    if len(samples) <= 32:
+        print(f"[Interpreter]: Raw eigenstate dictionary (solution_str: counts): {samples.to_eigenstate()}")
+    else:
+        print(f"[Interpreter]: {len(samples)} distinct bitstrings sampled.")
 
-    # Select the bitstring with the highest count
-    best_solution_str = max(eigenstate_dict, key=eigenstate_dict.get)
+    best_index = None
+    if rank_by == "objective":
+        best = top_feasible(samples, qp, top_m=1, rank_by="objective")
+        if best:
+            best_index = best[0]["index"]
+        else:
+            print("[Interpreter]: Warning: no feasible bitstring sampled, using the most frequent one.")
+    elif rank_by != "probability":
+        raise ValueError("rank_by must be 'probability' or 'objective'.")
 
-    # Use that string directly as the binary solution
-    binary_string = best_solution_str
-  
-    
+    if best_index is None:
+        # Select the bitstring with the highest count
+        best_index = int(np.argmax(samples.probabilities))
+
+    # Column i of the bit matrix is ticker i (Qiskit bitstrings are reversed, 'x_3 x_2 x_1 x_0')
+    solution_vector = samples.to_matrix()[best_index]
+    binary_string = "".join(str(bit) for bit in solution_vector[::-1])
     print(f"[Interpreter]: Best binary string result: {binary_string}")
-    
-    selected_stocks = []
-    # Qiskit bitstrings may be little-endian (e.g., 'x_3 x_2 x_1 x_0'), so reverse to match tickers
 
-    reversed_binary_string = binary_string[::-1]
-    
-    for i in range(len(tickers)):
-        if reversed_binary_string[i] == '1':
-            selected_stocks.append(tickers[i])
-            
-    # Compute the actual objective value using the original QuadraticProgram
-    solution_vector = [int(bit) for bit in reversed_binary_string]
+    selected_stocks = [tickers[i] for i in np.nonzero(solution_vector)[0]]
 
-    final_score = qp.objective.evaluate(solution_vector)
+    # Compute the actual objective value using the original QuadraticProgram
+    final_score = qp.objective.evaluate(solution_vector.tolist())
             
     return selected_stocks, final_score
 
+def top_portfolios(result: Dict, tickers: List[str], qp: 'QuadraticProgram', top_m: int = 5) -> List[Dict]:
+    """
+    Score every sampled bitstring at once and return the 'top_m' best FEASIBLE portfolios:
+    [{"selected_stocks", "score", "probability"}, ...], best (lowest objective) first.
+    """
+    best = top_feasible(get_samples(result), qp, top_m=top_m, rank_by="objective")
+    return [{"selected_stocks": [tickers[i] for i in np.nonzero(entry["bits"])[0]],
+             "score": entry["score"],
+             "probability": entry["probability"]} for entry in best]
+
 
 # --- "Testing Block" ---
 # This code runs only when this file is executed directly.
@@ -141,48 +543,52 @@ if __name__ == "__main__":
         hamiltonian, offset = convert_to_ising(qp_problem)
         
         if hamiltonian is not None:
-             # --- Step 4: Solve Problem  ---
-            print("\n--- [Test Run] Step 4: Solve with QAOA ---")
-            
-            raw_result = solve_with_qaoa(hamiltonian)
-            
-            print("\n--- [Test Run] Step 5: Display Final Result ---")
-            stocks, score = interpret_result(raw_result, tickers_mvp, qp_problem)
-            
-            # Convert result to human-readable form            
-            print("\n=================================================")
-            print("          FINAL OPTIMAL PORTFOLIO RESULT          ")
-            print("=================================================")
-            print(f"Optimal Score (Risk-Return): {score:.4f}")
-            print(f"Chune gaye Stocks (k=2): {stocks}")
-            print("=================================================")
-            # ***** NEW STEP: Save results to JSON *****
-            print(f"\n--- [Test Run] Step 6: Saving result to 'results.json' ---")
-            
+            # Results history (results_store.py): an identical problem is not solved again
+            from results_store import ResultsStore, make_record, problem_key
+            results_store = ResultsStore("results.jsonl")
+            result_key = problem_key(mu, sigma, k_budget, q_risk, solver="qaoa", reps=1)
+            cached = results_store.get(result_key)
 
-            result_data = {
-                "selected_stocks": stocks,
-                "optimal_score": score,
-                "parameters": {
-                    "tickers": tickers_mvp,
-                    "k_budget": k_budget,
-                    "q_risk": q_risk
-                },
-                
-                # Use the raw_result.eigenstate dictionary
-                "raw_eigenstate_dict": raw_result.eigenstate
-            }
-            
-            try:
-               
-                with open("results.json", "w") as f:
-                    # 'json.dump' ka istemal karke dictionary ko file mein likh denge
-                    # indent=4 se file sundar dikhti hai (pretty-print)
-                    json.dump(result_data, f, indent=4, default=str) # default=str sureksha ke liye
-                print("Result successfully saved to 'results.json'.")
-            except Exception as e:
-                print(f"Error: Result not save :  {e}")
-            # ***** BADLAV KHATM *****
+            if cached is not None:
+                print(f"\n--- [Test Run] Step 4: Already solved on {cached['created_at']} (results.jsonl) ---")
+                print(f"Optimal Score (Risk-Return): {cached['score']:.4f}")
+                print(f"Chune gaye Stocks (k=2): {cached['selected_stocks']}")
+            else:
+                # --- Step 4: Solve Problem  ---
+                print("\n--- [Test Run] Step 4: Solve with QAOA ---")
+
+                start_time = time.time()
+                raw_result = solve_with_qaoa(hamiltonian)
+
+                print("\n--- [Test Run] Step 5: Display Final Result ---")
+                stocks, score = interpret_result(raw_result, tickers_mvp, qp_problem)
+                solve_seconds = time.time() - start_time
+
+                # Convert result to human-readable form
+                print("\n=================================================")
+                print("          FINAL OPTIMAL PORTFOLIO RESULT          ")
+                print("=================================================")
+                print(f"Optimal Score (Risk-Return): {score:.4f}")
+                print(f"Chune gaye Stocks (k=2): {stocks}")
+                print("=================================================")
+
+                # Best feasible portfolios among ALL sampled bitstrings (scored at once)
+                print("\nTop feasible portfolios (by objective):")
+                for entry in top_portfolios(raw_result, tickers_mvp, qp_problem, top_m=3):
+                    print(f"  {entry['selected_stocks']}  score={entry['score']:.4f}  p={entry['probability']:.4f}")
+
+                # Ground truth: check every feasible portfolio classically (classical_solvers.py)
+                from classical_solvers import exact_bounds, approximation_ratio
+                bounds = exact_bounds(mu, sigma, k_budget, q=q_risk, max_workers=1)
+                print(f"\nExact optimum: {bounds['selected_stocks']}  score={bounds['score']:.4f}")
+                print(f"QAOA approximation ratio: {approximation_ratio(score, bounds['score'], bounds['worst_score']):.4f}")
+
+                # --- Step 6: Append the result to the history (never overwritten) ---
+                print(f"\n--- [Test Run] Step 6: Saving result to 'results.jsonl' ---")
+                results_store.append(make_record(result_key, raw_result, tickers_mvp, k_budget, q_risk, "qaoa",
+                                                 stocks, score, offset=offset, reps=1, as_of=end_date,
+                                                 solve_seconds=solve_seconds))
+                print(f"Result saved ({len(results_store)} result(s) in the history).")
 
         else:
             print("Test Run Failed: Hamiltonian not  conversion .")
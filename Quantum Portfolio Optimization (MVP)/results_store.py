@@ -0,0 +1,300 @@
+"""
+Results Store (results_store.py)
+Its job is to keep EVERY solved problem, and to never solve the same problem twice.
+
+- Results are appended (never overwritten) to a JSON-lines file, one record per line.
+- Each record is keyed by a content hash of the problem: sha256 over (mu, Σ, k, q,
+  solver, reps, seed, other solver options). Identical inputs -> identical key.
+- solve_memoized() looks the key up before running build -> convert -> solve -> interpret,
+  so dashboard refreshes and sweeps skip problems that were already solved.
+- The store keeps an in-memory index by key and by universe (the set of tickers),
+  so lookups and query(date range / universe / solver) do not re-read the file.
+"""
+
+# Step 1: Import necessary tools
+import os
+import io
+import json
+import time
+import hashlib
+import contextlib
+import numpy as np
+import pandas as pd
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Sequence, Union
+
+from risk_model import FactorCovariance
+from samples import get_samples
+
+# Bitstrings kept per record (the most probable ones), so lines stay small for large n
+MAX_STORED_BITSTRINGS = 32
+
+
+# --- Problem keys ---
+
+def _json_default(value):
+    # numpy values -> plain Python; a file-backed object (e.g. a ParameterStore) -> its type
+    # and file, so two different stores never share a key. Anything else is refused rather
+    # than hashed by its type alone.
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    path = getattr(value, "path", None)
+    if isinstance(path, str):
+        return f"{type(value).__name__}({os.path.abspath(path)})"
+    raise TypeError(f"Solver option of type {type(value).__name__} cannot be stored in the results store.")
+
+
+def problem_key(mu: pd.Series, sigma: Union[pd.DataFrame, FactorCovariance], k: int, q: float,
+                solver: str = "qaoa", reps: Optional[int] = None, seed: Optional[int] = None,
+                options: Optional[Dict] = None) -> str:
+    """
+    Content hash (hex sha256) of one problem + how it is solved.
+    mu / Σ enter with their tickers and exact float64 bytes; a FactorCovariance is
+    hashed through its loadings and specific variances. For "qaoa", reps=None is the
+    solver's default of 1 and gets the same key.
+    """
+    digest = hashlib.sha256()
+    digest.update(json.dumps(list(map(str, mu.index))).encode())
+    digest.update(np.ascontiguousarray(mu, dtype=np.float64).tobytes())
+    if isinstance(sigma, FactorCovariance):
+        digest.update(b"factor")
+        digest.update(np.ascontiguousarray(sigma.loadings, dtype=np.float64).tobytes())
+        digest.update(np.ascontiguousarray(sigma.specific_var, dtype=np.float64).tobytes())
+    else:
+        digest.update(b"dense")
+        digest.update(np.ascontiguousarray(sigma, dtype=np.float64).tobytes())
+    if solver == "qaoa" and reps is None:
+        reps = 1
+    settings = {"k": int(k), "q": float(q), "solver": solver, "reps": reps, "seed": seed,
+                "options": options or {}}
+    digest.update(json.dumps(settings, sort_keys=True, default=_json_default).encode())
+    return digest.hexdigest()
+
+
+def universe_key(tickers: Sequence[str]) -> str:
+    """The universe of a problem: its sorted tickers, comma separated."""
+    return ",".join(sorted(map(str, tickers)))
+
+
+# --- The store ---
+
+class ResultsStore:
+    """
+    Append-only JSON-lines results store (see the module docstring).
+
+    Every record has at least: key, created_at (UTC, ISO format), as_of (data date,
+    optional), universe, tickers, k, q, solver, reps, seed, options, selected_stocks,
+    score. If the same key was written more than once, the latest record wins.
+    """
+
+    def __init__(self, path: str = "results.jsonl"):
+        self.path = path
+        self._records: List[Dict] = []
+        self._by_key: Dict[str, Dict] = {}
+        self._by_universe: Dict[str, List[Dict]] = {}
+        self._offset = 0  # how far into the file we have read
+
+        self.hits = 0
+        self.misses = 0
+        self.refresh()
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def _index(self, record: Dict) -> None:
+        self._records.append(record)
+        self._by_key[record["key"]] = record
+        self._by_universe.setdefault(record["universe"], []).append(record)
+
+    def refresh(self) -> None:
+        """Read records appended since the last read (e.g. by another process)."""
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "rb") as f:
+            f.seek(self._offset)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break  # a line still being written; read it next time
+                self._offset += len(line)
+                if line.strip():
+                    self._index(json.loads(line))
+
+    def get(self, key: str) -> Optional[Dict]:
+        """The stored record for 'key', or None."""
+        record = self._by_key.get(key)
+        if record is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return record
+
+    def append(self, record: Dict) -> Dict:
+        """
+        Add one record (needs 'key' and 'tickers'). 'created_at' and 'universe' are
+        filled in if missing. The line is written in a single call, so concurrent
+        writers never interleave inside a record.
+        """
+        record = dict(record)
+        record.setdefault("created_at", datetime.now(timezone.utc).isoformat())
+        record.setdefault("universe", universe_key(record["tickers"]))
+        line = json.dumps(record, default=_json_default) + "\n"
+
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        self.refresh()
+        with open(self.path, "ab") as f:
+            f.write(line.encode())
+        self._offset += len(line.encode())
+        self._index(record)
+        return record
+
+    def query(self, start: Optional[str] = None, end: Optional[str] = None,
+              universe: Optional[Sequence[str]] = None, solver: Optional[str] = None,
+              date_field: str = "created_at") -> pd.DataFrame:
+        """
+        Records as a DataFrame (one row each, oldest first), filtered by:
+        start / end: ISO dates, inclusive, compared with 'date_field' ("created_at" or "as_of"),
+        universe:    a list of tickers (order does not matter), solver: solver name.
+        """
+        self.refresh()
+        records = self._records if universe is None else self._by_universe.get(universe_key(universe), [])
+        selected = []
+        for record in records:
+            date = record.get(date_field)
+            if start is not None and (date is None or date[:len(start)] < start):
+                continue
+            if end is not None and (date is None or date[:len(end)] > end):
+                continue
+            if solver is not None and record.get("solver") != solver:
+                continue
+            selected.append(record)
+        return pd.DataFrame(selected)
+
+
+# --- Records and memoized solving ---
+
+def make_record(key: str, result, tickers: List[str], k: int, q: float, solver: str,
+                selected_stocks: List[str], score: float, offset: float = 0.0,
+                reps: Optional[int] = None, seed: Optional[int] = None, options: Optional[Dict] = None,
+                as_of: Optional[str] = None, solve_seconds: Optional[float] = None) -> Dict:
+    """
+    One store record from a solver result (plain JSON values only: the eigenstate is
+    kept as {bitstring: probability} for the MAX_STORED_BITSTRINGS most probable ones).
+    """
+    # Only the kept bitstrings are turned into strings (the packed samples can be large)
+    eigenstate = get_samples(result).to_eigenstate(top=MAX_STORED_BITSTRINGS)
+    top = sorted(eigenstate.items(), key=lambda item: item[1], reverse=True)
+    return {
+        "key": key,
+        "as_of": as_of,
+        "tickers": list(tickers),
+        "k": int(k),
+        "q": float(q),
+        "solver": solver,
+        "reps": reps,
+        "seed": seed,
+        "options": options or {},
+        "selected_stocks": list(selected_stocks),
+        "score": float(score),
+        "energy": float(np.real(result.eigenvalue)) + float(offset),
+        "eigenstate": dict(top),
+        "solve_seconds": solve_seconds,
+    }
+
+
+def solve_memoized(mu: pd.Series, sigma: Union[pd.DataFrame, FactorCovariance], k: int, q: float = 1.0,
+                   solver: str = "qaoa", reps: Optional[int] = None, seed: Optional[int] = None,
+                   store: Optional[ResultsStore] = None, as_of: Optional[str] = None,
+                   verbose: bool = False, **solver_options) -> Dict:
+    """
+    Solve (build -> convert -> solver -> interpret) unless the store already has
+    this exact problem, and return its record. 'reps' is passed to solvers that
+    take it ("qaoa"); 'seed' and **solver_options go to the solver.
+    The record has 'cached': True when it came from the store.
+    """
+    if store is None:
+        store = ResultsStore()
+    key = problem_key(mu, sigma, k, q, solver=solver, reps=reps, seed=seed, options=solver_options)
+    cached = store.get(key)
+    if cached is not None:
+        print(f"[Results Store]: Cache hit ({key[:12]}), skipping the solve.")
+        return dict(cached, cached=True)
+
+    # Imported here: a cache hit never needs the solver stack
+    from problem_builder import create_quadratic_program
+    from hamiltonian_converter import convert_to_ising_direct
+    from qaoa_solver import interpret_result
+    from solvers import get_solver
+
+    print(f"[Results Store]: Not solved before ({key[:12]}), solving...")
+    start_time = time.time()
+    tickers = list(mu.index)
+    options = dict(solver_options, seed=seed)
+    if reps is not None:
+        options["reps"] = reps
+    if solver == "qaoa":
+        # The QAOA backends need the budget (subspace / warm start) and the risk weight
+        options.update(k=k, q=q)
+    with contextlib.nullcontext() if verbose else contextlib.redirect_stdout(io.StringIO()):
+        qp = create_quadratic_program(mu, sigma, k=k, q=q)
+        hamiltonian, offset = convert_to_ising_direct(mu, sigma, k, q=q)
+        result = get_solver(solver)(hamiltonian, **options)
+        selected_stocks, score = interpret_result(result, tickers, qp, rank_by="objective")
+
+    record = make_record(key, result, tickers, k, q, solver, selected_stocks, score, offset=offset,
+                         reps=reps, seed=seed, options=solver_options, as_of=as_of,
+                         solve_seconds=time.time() - start_time)
+    return dict(store.append(record), cached=False)
+
+
+# --- "Testing Block" ---
+# This code runs only when this file is executed directly.
+if __name__ == "__main__":
+
+    print("\n---------------------------------------------------------")
+    print(">>> 'results_store.py' was RUN DIRECTLY (Testing Mode) <<<")
+    print("---------------------------------------------------------")
+
+    import tempfile
+
+    rng = np.random.default_rng(0)
+    tickers_test = [f"T{i}" for i in range(6)]
+    A = rng.normal(0.0, 0.1, (6, 6))
+    sigma_test = pd.DataFrame(A @ A.T + 0.02 * np.eye(6), index=tickers_test, columns=tickers_test)
+    mu_test = pd.Series(rng.normal(0.1, 0.05, 6), index=tickers_test)
+
+    # Same inputs -> same key; any change -> different key
+    key = problem_key(mu_test, sigma_test, 3, 1.0, solver="annealing", seed=1)
+    assert key == problem_key(mu_test.copy(), sigma_test.copy(), 3, 1.0, solver="annealing", seed=1)
+    assert key != problem_key(mu_test, sigma_test, 3, 1.0, solver="annealing", seed=2)
+    assert key != problem_key(mu_test * 1.0000001, sigma_test, 3, 1.0, solver="annealing", seed=1)
+    assert problem_key(mu_test, sigma_test, 3, 1.0) == problem_key(mu_test, sigma_test, 3, 1.0, reps=1)
+
+    # File-backed options are keyed by their file, anything else without a JSON form is refused
+    class FileOption:
+        def __init__(self, path):
+            self.path = path
+
+    assert (problem_key(mu_test, sigma_test, 3, 1.0, options={"parameter_store": FileOption("a.json")})
+            != problem_key(mu_test, sigma_test, 3, 1.0, options={"parameter_store": FileOption("b.json")}))
+    try:
+        problem_key(mu_test, sigma_test, 3, 1.0, options={"callback": object()})
+        raise AssertionError("an option without a stable identity was hashed")
+    except TypeError:
+        pass
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "results.jsonl")
+        store = ResultsStore(path)
+        first = solve_memoized(mu_test, sigma_test, 3, solver="annealing", seed=1, store=store, as_of="2024-01-02")
+        second = solve_memoized(mu_test, sigma_test, 3, solver="annealing", seed=1, store=store, as_of="2024-01-02")
+        assert not first["cached"] and second["cached"]
+        assert first["selected_stocks"] == second["selected_stocks"]
+
+        # A new store on the same file sees the history
+        reopened = ResultsStore(path)
+        assert len(reopened) == 1 and reopened.get(first["key"]) is not None
+        print(reopened.query(universe=list(reversed(tickers_test)), start="2024-01-01",
+                             date_field="as_of")[["k", "q", "solver", "selected_stocks", "score"]])
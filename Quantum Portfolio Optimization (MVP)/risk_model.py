@@ -0,0 +1,113 @@
+"""
+Risk Model (risk_model.py)
+Its job is to describe the covariance matrix (Σ) in a compact "factor model" form:
+
+    Σ = B F B^T + diag(d)
+
+B = factor loadings (n x f), F = factor covariance (f x f), d = specific (own) risk.
+For f << n this needs O(n*f) memory instead of O(n^2), and things like Σx or x^T Σ x
+can be computed without ever building the dense n x n matrix.
+"""
+
+# Step 1: Import necessary tools
+import numpy as np
+import pandas as pd
+from typing import List, Optional, Union
+
+
+class FactorCovariance:
+    """
+    Covariance matrix stored as factor loadings plus diagonal specific risk.
+    Internally we keep L = B * chol(F), so that Σ = L L^T + diag(d).
+    """
+
+    def __init__(self, loadings: Union[pd.DataFrame, np.ndarray], specific_var: Union[pd.Series, np.ndarray],
+                 factor_cov: Optional[np.ndarray] = None, tickers: Optional[List[str]] = None):
+        if isinstance(loadings, pd.DataFrame) and tickers is None:
+            tickers = list(loadings.index)
+        loadings = np.asarray(loadings, dtype=float)
+        specific_var = np.asarray(specific_var, dtype=float)
+
+        if loadings.ndim != 2 or loadings.shape[0] != specific_var.shape[0]:
+            raise ValueError("loadings must be (n x f) and specific_var must have n entries.")
+
+        if factor_cov is not None:
+            # Fold the factor covariance into the loadings: B F B^T = (B C)(B C)^T with F = C C^T
+            loadings = loadings @ np.linalg.cholesky(np.asarray(factor_cov, dtype=float))
+
+        self.loadings = loadings
+        self.specific_var = specific_var
+        self.tickers = tickers if tickers is not None else [f"asset_{i}" for i in range(len(specific_var))]
+
+    # --- Constructors ---
+
+    @classmethod
+    def from_pca(cls, sigma: pd.DataFrame, n_factors: int) -> "FactorCovariance":
+        """
+        Build a factor model from a dense Σ by keeping its 'n_factors' largest
+        principal components. The specific risk is chosen so that the diagonal
+        (each asset's own variance) is kept exactly.
+        """
+        values = np.asarray(sigma, dtype=float)
+        n_factors = min(n_factors, values.shape[0])
+
+        eigenvalues, eigenvectors = np.linalg.eigh(values)
+        # eigh returns ascending eigenvalues, take the largest ones
+        top = np.argsort(eigenvalues)[::-1][:n_factors]
+        loadings = eigenvectors[:, top] * np.sqrt(np.clip(eigenvalues[top], 0.0, None))
+
+        specific_var = np.clip(np.diag(values) - (loadings ** 2).sum(axis=1), 0.0, None)
+
+        tickers = list(sigma.index) if isinstance(sigma, pd.DataFrame) else None
+        return cls(loadings, specific_var, tickers=tickers)
+
+    @classmethod
+    def from_factors(cls, loadings: Union[pd.DataFrame, np.ndarray], factor_cov: np.ndarray,
+                     specific_var: Union[pd.Series, np.ndarray],
+                     tickers: Optional[List[str]] = None) -> "FactorCovariance":
+        """
+        Build a factor model from a supplied loadings matrix B, factor covariance F
+        and specific variances d.
+        """
+        return cls(loadings, specific_var, factor_cov=factor_cov, tickers=tickers)
+
+    # --- Basic properties ---
+
+    def __len__(self) -> int:
+        return len(self.specific_var)
+
+    @property
+    def n_factors(self) -> int:
+        return self.loadings.shape[1]
+
+    def diagonal(self) -> np.ndarray:
+        """Σ_ii for every asset, O(n*f)."""
+        return (self.loadings ** 2).sum(axis=1) + self.specific_var
+
+    def row_sums(self) -> np.ndarray:
+        """Σ @ 1 (sum of every row), O(n*f)."""
+        return self.loadings @ self.loadings.sum(axis=0) + self.specific_var
+
+    def matvec(self, x: np.ndarray) -> np.ndarray:
+        """Σ @ x for a vector (n) or a matrix of column vectors (n x m), O(n*f*m)."""
+        x = np.asarray(x, dtype=float)
+        if x.ndim == 1:
+            return self.loadings @ (self.loadings.T @ x) + self.specific_var * x
+        return self.loadings @ (self.loadings.T @ x) + self.specific_var[:, None] * x
+
+    def quad_form(self, X: np.ndarray) -> np.ndarray:
+        """
+        x^T Σ x for every row x of X (m x n), O(m*n*f).
+        Used to score many candidate portfolios at once.
+        """
+        X = np.asarray(X, dtype=float)
+        if X.ndim == 1:
+            X = X[None, :]
+        factor_exposure = X @ self.loadings
+        return (factor_exposure ** 2).sum(axis=1) + (X ** 2) @ self.specific_var
+
+    def to_dense(self) -> pd.DataFrame:
+        """Build the full n x n Σ (only call this when it is really needed)."""
+        dense = self.loadings @ self.loadings.T
+        dense[np.diag_indices_from(dense)] += self.specific_var
+        return pd.DataFrame(dense, index=self.tickers, columns=self.tickers)
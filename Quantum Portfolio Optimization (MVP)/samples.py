@@ -0,0 +1,186 @@
+"""
+Sampled Solutions (samples.py)
+Its job is to store sampled bitstrings compactly and to score all of them at once.
+
+Instead of a {bitstring: probability} dictionary with one Python string per sample,
+we keep a packed bit matrix (8 qubits per byte, qubit i = column i) plus a
+probability array. Scoring every candidate against the QuadraticProgram is then
+a couple of matrix products instead of a Python loop over a dictionary.
+"""
+
+# Step 1: Import necessary tools
+import numpy as np
+from collections.abc import Mapping
+from typing import Dict, Iterator, List, Optional
+
+
+class PackedSamples:
+    """
+    Sampled bitstrings as a packed bit matrix plus their probabilities.
+
+    bits[r] holds sample r with qubit i in bit i (np.packbits with bitorder="little"),
+    so column i of to_matrix() is variable x_i / ticker i.
+    """
+
+    def __init__(self, bits: np.ndarray, probabilities: np.ndarray, num_qubits: int):
+        self.bits = np.asarray(bits, dtype=np.uint8)
+        self.probabilities = np.asarray(probabilities, dtype=float)
+        self.num_qubits = num_qubits
+
+    def __len__(self) -> int:
+        return len(self.probabilities)
+
+    # --- Constructors ---
+
+    @classmethod
+    def from_matrix(cls, matrix: np.ndarray, probabilities: np.ndarray) -> "PackedSamples":
+        """From a (samples x qubits) 0/1 matrix."""
+        matrix = np.asarray(matrix, dtype=np.uint8)
+        return cls(np.packbits(matrix, axis=1, bitorder="little"), probabilities, matrix.shape[1])
+
+    @classmethod
+    def from_states(cls, states: np.ndarray, probabilities: np.ndarray, num_qubits: int) -> "PackedSamples":
+        """From integer basis states (bit i of the integer = qubit i)."""
+        states = np.asarray(states, dtype=np.int64)
+        matrix = (states[:, None] >> np.arange(num_qubits)) & 1
+        return cls.from_matrix(matrix, probabilities)
+
+    @classmethod
+    def from_eigenstate(cls, eigenstate: Dict[str, float]) -> "PackedSamples":
+        """
+        From the Qiskit-style {bitstring: probability} dictionary
+        (the leftmost character of a bitstring is the highest qubit).
+        """
+        keys = list(eigenstate.keys())
+        num_qubits = len(keys[0])
+        chars = np.frombuffer("".join(keys).encode("ascii"), dtype=np.uint8).reshape(len(keys), num_qubits)
+        # '0' / '1' characters -> 0 / 1, then reverse so column i is qubit i
+        matrix = (chars - ord("0"))[:, ::-1]
+        return cls.from_matrix(matrix, np.fromiter(eigenstate.values(), dtype=float, count=len(keys)))
+
+    # --- Conversions ---
+
+    def to_matrix(self) -> np.ndarray:
+        """(samples x qubits) 0/1 matrix, column i = qubit i."""
+        return np.unpackbits(self.bits, axis=1, count=self.num_qubits, bitorder="little")
+
+    def to_states(self) -> np.ndarray:
+        """Integer basis states (bit i of the integer = qubit i), straight from the packed bytes."""
+        weights = np.left_shift(1, 8 * np.arange(self.bits.shape[1], dtype=np.int64))
+        return self.bits.astype(np.int64) @ weights
+
+    def bitstring(self, index: int) -> str:
+        """Qiskit-style bitstring (highest qubit on the left) of one sample."""
+        row = np.unpackbits(self.bits[index], count=self.num_qubits, bitorder="little")
+        return (row[::-1] + ord("0")).tobytes().decode("ascii")
+
+    def to_bitstrings(self) -> List[str]:
+        """Qiskit-style bitstrings (highest qubit on the left)."""
+        matrix = self.to_matrix()[:, ::-1] + ord("0")
+        return [row.tobytes().decode("ascii") for row in matrix]
+
+    def to_eigenstate(self, top: Optional[int] = None) -> Dict[str, float]:
+        """
+        {bitstring: probability} of all samples, or of the 'top' most probable ones
+        (most probable first).
+        """
+        if top is None or top >= len(self):
+            return dict(zip(self.to_bitstrings(), self.probabilities.tolist()))
+        order = np.argsort(-self.probabilities, kind="stable")[:top]
+        return {self.bitstring(i): float(self.probabilities[i]) for i in order}
+
+
+class LazyEigenstate(Mapping):
+    """
+    The {bitstring: probability} dictionary of some PackedSamples, only built when it is
+    first read. Solvers store this as result.eigenstate: our own code works on
+    result.samples, so for large samples the Python strings are usually never made.
+    """
+
+    def __init__(self, samples: PackedSamples):
+        self.samples = samples
+        self._eigenstate: Optional[Dict[str, float]] = None
+
+    def _dict(self) -> Dict[str, float]:
+        if self._eigenstate is None:
+            self._eigenstate = self.samples.to_eigenstate()
+        return self._eigenstate
+
+    def __getitem__(self, bitstring: str) -> float:
+        return self._dict()[bitstring]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._dict())
+
+    def __len__(self) -> int:
+        return len(self.samples)
+
+    def __repr__(self) -> str:
+        return repr(self._dict())
+
+
+# --- Vectorized scoring ---
+
+def evaluate_samples(samples: PackedSamples, qp) -> Dict[str, np.ndarray]:
+    """
+    Score every sample against the QuadraticProgram at once.
+    Returns {"scores": objective values (same as qp.objective.evaluate),
+             "feasible": True where all linear constraints hold}.
+    """
+    X = samples.to_matrix().astype(float)
+
+    objective = qp.objective
+    linear = objective.linear.to_array()
+    quadratic = objective.quadratic.to_array()
+    scores = objective.constant + X @ linear + ((X @ quadratic) * X).sum(axis=1)
+
+    feasible = np.ones(len(X), dtype=bool)
+    for constraint in qp.linear_constraints:
+        lhs = X @ constraint.linear.to_array()
+        sense = constraint.sense.label
+        if sense == "==":
+            feasible &= np.isclose(lhs, constraint.rhs)
+        elif sense == "<=":
+            feasible &= lhs <= constraint.rhs + 1e-9
+        else:
+            feasible &= lhs >= constraint.rhs - 1e-9
+
+    return {"scores": scores, "feasible": feasible}
+
+
+def top_feasible(samples: PackedSamples, qp, top_m: int = 5, rank_by: str = "objective") -> List[Dict]:
+    """
+    Return the best 'top_m' feasible samples, best first.
+    rank_by="objective":   lowest objective value first.
+    rank_by="probability": most often sampled first.
+    Each entry: {"index", "bits" (0/1 array), "probability", "score"}.
+    """
+    evaluated = evaluate_samples(samples, qp)
+    candidates = np.nonzero(evaluated["feasible"])[0]
+    if len(candidates) == 0:
+        return []
+
+    if rank_by == "objective":
+        keys = evaluated["scores"][candidates]
+    elif rank_by == "probability":
+        keys = -samples.probabilities[candidates]
+    else:
+        raise ValueError("rank_by must be 'objective' or 'probability'.")
+
+    order = candidates[np.argsort(keys, kind="stable")[:top_m]]
+    matrix = samples.to_matrix()
+    return [{"index": int(i),
+             "bits": matrix[i],
+             "probability": float(samples.probabilities[i]),
+             "score": float(evaluated["scores"][i])} for i in order]
+
+
+def get_samples(result) -> PackedSamples:
+    """
+    Packed samples of a solver result: uses result.samples if the solver stored it,
+    otherwise packs the eigenstate dictionary.
+    """
+    samples = getattr(result, "samples", None)
+    if samples is not None:
+        return samples
+    return PackedSamples.from_eigenstate(result.eigenstate)
@@ -0,0 +1,398 @@
+"""
+Solver Service (solver_service.py)
+Its job is to keep the solver stack loaded and warm between requests, so a client only
+waits for the solve itself (not for importing qiskit and rebuilding everything).
+
+- An asyncio server on a Unix socket (or localhost TCP) speaks JSON lines: one request
+  object per line in, one response object per line out. Many clients can be connected
+  and send requests at the same time.
+- Solves run on a pool of worker processes that imported qiskit once at start-up and
+  keep a warm QAOA ParameterStore. Every worker writes its own copy of the store
+  ("qaoa_parameters.worker0.json", ...), seeded from the shared file, so workers never
+  overwrite each other's angles.
+- Identical requests that arrive while the first one is still being solved wait for
+  that solve instead of solving the same problem again.
+- The server process itself never imports qiskit: it fetches prices (through the
+  on-disk price cache), computes mu / Σ and answers repeated problems straight from
+  the results store (results_store.py), then hands the rest to the workers.
+
+Requests:
+    {"op": "ping"}
+    {"op": "status"}
+    {"op": "solve", "id": ..., "k": 2, "q": 1.0, "solver": "qaoa", "reps": 1, "seed": null,
+     "options": {...solver options...},
+     and EITHER "tickers", "start_date", "end_date" (+ "synthetic": seed)  OR  "mu": {ticker: value}, "sigma": [[...]]}
+Responses: {"id": ..., "ok": true, "result": {...results store record...}} or {"ok": false, "error": "..."}
+"""
+
+# Step 1: Import necessary tools
+import os
+import json
+import time
+import contextlib
+import socket
+import asyncio
+import threading
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Optional
+
+# Default addresses
+DEFAULT_SOCKET = "/tmp/qpo_solver.sock"
+DEFAULT_HOST, DEFAULT_PORT = "127.0.0.1", 8765
+
+# Per-worker state, filled in by _init_worker (one copy per process)
+_WORKER: Dict = {}
+
+
+# --- Work done inside the workers ---
+
+def worker_parameter_path(parameter_path: str, slot: int) -> str:
+    """The parameter store file of worker 'slot': 'qaoa_parameters.json' -> 'qaoa_parameters.worker0.json'."""
+    root, extension = os.path.splitext(parameter_path)
+    return f"{root}.worker{slot}{extension}"
+
+
+def _init_worker(parameter_path: Optional[str], next_slot) -> None:
+    """
+    Runs once in every worker process: import the solver stack and open this
+    worker's own parameter store, so every request after that starts warm.
+    """
+    import shutil
+    from problem_builder import create_quadratic_program
+    from hamiltonian_converter import convert_to_ising_direct
+    from qaoa_solver import interpret_result
+    from parameter_store import ParameterStore
+    from solvers import get_solver
+
+    with next_slot.get_lock():
+        slot = next_slot.value
+        next_slot.value += 1
+
+    store = None
+    if parameter_path:
+        # One file per worker (ParameterStore has no cross-process lock); a new worker
+        # file starts as a copy of the shared store
+        path = worker_parameter_path(parameter_path, slot)
+        if not os.path.exists(path) and os.path.exists(parameter_path):
+            shutil.copyfile(parameter_path, path)
+        store = ParameterStore(path)
+    _WORKER["parameter_store"] = store
+    _WORKER["slot"] = slot
+    _WORKER["solved"] = 0
+
+
+def _solve_request(key: str, tickers, mu_values, sigma_values, k: int, q: float, solver: str,
+                   reps: Optional[int], seed: Optional[int], options: Dict) -> Dict:
+    # Build -> convert -> solve -> interpret for one request; returns a results store record
+    import io
+    import contextlib
+    import numpy as np
+    import pandas as pd
+    from problem_builder import create_quadratic_program
+    from hamiltonian_converter import convert_to_ising_direct
+    from qaoa_solver import interpret_result
+    from results_store import make_record
+    from solvers import get_solver
+
+    start_time = time.time()
+    mu = pd.Series(mu_values, index=tickers)
+    sigma = pd.DataFrame(np.asarray(sigma_values, dtype=float), index=tickers, columns=tickers)
+    solver_options = dict(options, seed=seed)
+    if reps is not None:
+        solver_options["reps"] = reps
+    # Same options as results_store.solve_memoized, plus this worker's warm parameter store
+    if solver == "qaoa":
+        solver_options.update(k=k, q=q)
+        if _WORKER.get("parameter_store") is not None:
+            solver_options.setdefault("parameter_store", _WORKER["parameter_store"])
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        qp = create_quadratic_program(mu, sigma, k=k, q=q)
+        hamiltonian, offset = convert_to_ising_direct(mu, sigma, k, q=q)
+        result = get_solver(solver)(hamiltonian, **solver_options)
+        selected_stocks, score = interpret_result(result, list(tickers), qp, rank_by="objective")
+
+    _WORKER["solved"] = _WORKER.get("solved", 0) + 1
+    return make_record(key, result, list(tickers), k, q, solver, selected_stocks, score, offset=offset,
+                       reps=reps, seed=seed, options=options, solve_seconds=time.time() - start_time)
+
+
+# --- The server ---
+
+class SolverService:
+    """
+    The server state: the worker pool, the results store and some counters.
+    Use serve() to run it.
+    """
+
+    def __init__(self, max_workers: Optional[int] = None, cache_dir: Optional[str] = ".price_cache",
+                 results_path: Optional[str] = "results.jsonl",
+                 parameter_path: Optional[str] = "qaoa_parameters.json"):
+        from results_store import ResultsStore
+
+        self.max_workers = max_workers or mp.cpu_count()
+        self.cache_dir = cache_dir
+        # The price cache has no locking of its own (it rewrites coverage.json and the
+        # Parquet files), so requests that use it take turns
+        self.cache_lock = threading.Lock()
+        self.store = ResultsStore(results_path) if results_path else None
+        context = mp.get_context("spawn")
+        self.pool = ProcessPoolExecutor(max_workers=self.max_workers, mp_context=context,
+                                        initializer=_init_worker, initargs=(parameter_path, context.Value("i", 0)))
+        # key -> Future of the solve that is running for it (duplicates wait on it)
+        self.in_flight: Dict[str, asyncio.Future] = {}
+        self.started_at = time.time()
+        self.counts = {"requests": 0, "solved": 0, "cached": 0, "shared": 0, "errors": 0}
+        self.shutdown_event: Optional[asyncio.Event] = None
+
+    def warm_up(self) -> None:
+        # Start every worker now (running its initializer), not on the first request
+        for future in [self.pool.submit(time.sleep, 0.01) for _ in range(self.max_workers)]:
+            future.result()
+
+    def _inputs(self, request: Dict):
+        # mu / Σ of a request: given directly, or computed from (cached) prices. Runs in a thread.
+        import numpy as np
+        import pandas as pd
+
+        if "mu" in request:
+            mu = pd.Series(request["mu"], dtype=float)
+            sigma = np.asarray(request["sigma"], dtype=float)
+            return list(mu.index), mu.values, sigma
+
+        from data_pipeline import fetch_stock_data, calculate_mu_and_sigma
+        source, cache_dir = None, self.cache_dir
+        if request.get("synthetic") is not None:
+            # Offline testing: synthetic prices with this seed (never mixed into the price cache)
+            from synthetic_market import SyntheticSource
+            source, cache_dir = SyntheticSource(seed=request["synthetic"]), None
+        with self.cache_lock if cache_dir is not None else contextlib.nullcontext():
+            prices = fetch_stock_data(request["tickers"], request["start_date"], request["end_date"],
+                                      cache_dir=cache_dir, source=source)
+        if prices.empty:
+            raise ValueError(f"No price data for {request['tickers']}.")
+        mu, sigma = calculate_mu_and_sigma(prices)
+        return list(mu.index), mu.values, sigma.values
+
+    async def solve(self, request: Dict) -> Dict:
+        import pandas as pd
+        from results_store import problem_key
+
+        loop = asyncio.get_running_loop()
+        tickers, mu_values, sigma_values = await loop.run_in_executor(None, self._inputs, request)
+        k, q = int(request["k"]), float(request.get("q", 1.0))
+        solver, reps, seed = request.get("solver", "qaoa"), request.get("reps"), request.get("seed")
+        options = request.get("options", {})
+
+        mu = pd.Series(mu_values, index=tickers)
+        sigma = pd.DataFrame(sigma_values, index=tickers, columns=tickers)
+        key = problem_key(mu, sigma, k, q, solver=solver, reps=reps, seed=seed, options=options)
+        if self.store is not None:
+            cached = self.store.get(key)
+            if cached is not None:
+                self.counts["cached"] += 1
+                return dict(cached, cached=True)
+
+        pending = self.in_flight.get(key)
+        if pending is not None:
+            # Same problem already being solved: wait for it (shield: a waiter going away
+            # must not cancel the solve the others are waiting for)
+            self.counts["shared"] += 1
+            return dict(await asyncio.shield(pending), cached=True)
+
+        future = loop.create_future()
+        self.in_flight[key] = future
+        try:
+            record = await loop.run_in_executor(self.pool, _solve_request, key, tickers, mu_values, sigma_values,
+                                                k, q, solver, reps, seed, options)
+            record["as_of"] = request.get("end_date")
+            if self.store is not None:
+                record = self.store.append(record)
+            self.counts["solved"] += 1
+            future.set_result(record)
+        except BaseException as e:
+            future.set_exception(e)
+            future.exception()  # retrieved here, so an unshared failure is not logged twice
+            raise
+        finally:
+            del self.in_flight[key]
+        return dict(record, cached=False)
+
+    async def handle(self, request: Dict) -> Dict:
+        op = request.get("op", "solve")
+        if op == "ping":
+            return {"ok": True, "result": "pong"}
+        if op == "status":
+            return {"ok": True, "result": dict(self.counts, workers=self.max_workers,
+                                               uptime_seconds=time.time() - self.started_at)}
+        if op == "shutdown":
+            self.shutdown_event.set()
+            return {"ok": True, "result": "shutting down"}
+        if op != "solve":
+            raise ValueError(f"Unknown op '{op}'.")
+        return {"ok": True, "result": await self.solve(request)}
+
+    async def client_connected(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        # One connection can send many requests; each is answered as soon as it is done
+        lock = asyncio.Lock()
+
+        async def answer(line: bytes) -> None:
+            request = {}
+            try:
+                request = json.loads(line)
+                self.counts["requests"] += 1
+                response = await self.handle(request)
+            except Exception as e:
+                self.counts["errors"] += 1
+                response = {"ok": False, "error": f"{type(e).__name__}: {e}"}
+            response["id"] = request.get("id") if isinstance(request, dict) else None
+            async with lock:
+                writer.write((json.dumps(response, default=str) + "\n").encode())
+                await writer.drain()
+
+        tasks = set()
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                if line.strip():
+                    task = asyncio.create_task(answer(line))
+                    tasks.add(task)
+                    task.add_done_callback(tasks.discard)
+            if tasks:
+                await asyncio.gather(*tasks)
+        except asyncio.CancelledError:
+            # The service is shutting down while this client is still connected
+            pass
+        finally:
+            writer.close()
+
+    def close(self) -> None:
+        self.pool.shutdown(cancel_futures=True)
+
+
+async def _serve(service: SolverService, socket_path: Optional[str], host: str, port: int) -> None:
+    service.shutdown_event = asyncio.Event()
+    if socket_path is not None:
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        server = await asyncio.start_unix_server(service.client_connected, path=socket_path, limit=1 << 26)
+        address = socket_path
+    else:
+        server = await asyncio.start_server(service.client_connected, host=host, port=port, limit=1 << 26)
+        address = f"{host}:{port}"
+    print(f"[Solver Service]: Listening on {address} with {service.max_workers} warm worker(s).")
+    async with server:
+        await service.shutdown_event.wait()
+    if socket_path is not None and os.path.exists(socket_path):
+        os.remove(socket_path)
+
+
+def serve(socket_path: Optional[str] = DEFAULT_SOCKET, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT,
+          max_workers: Optional[int] = None, cache_dir: Optional[str] = ".price_cache",
+          results_path: Optional[str] = "results.jsonl",
+          parameter_path: Optional[str] = "qaoa_parameters.json") -> None:
+    """
+    Run the service until a {"op": "shutdown"} request (or Ctrl+C).
+    socket_path=None listens on localhost TCP (host, port) instead of a Unix socket.
+    results_path / parameter_path = None turn the results store / parameter store off.
+    """
+    service = SolverService(max_workers=max_workers, cache_dir=cache_dir, results_path=results_path,
+                            parameter_path=parameter_path)
+    print("[Solver Service]: Starting the workers (importing the solver stack once)...")
+    start_time = time.time()
+    service.warm_up()
+    print(f"[Solver Service]: Workers ready in {time.time() - start_time:.1f}s.")
+    try:
+        asyncio.run(_serve(service, socket_path, host, port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.close()
+        print("[Solver Service]: Stopped.")
+
+
+# --- Client ---
+
+def send_request(request: Dict, socket_path: Optional[str] = DEFAULT_SOCKET, host: str = DEFAULT_HOST,
+                 port: int = DEFAULT_PORT, timeout: Optional[float] = None) -> Dict:
+    """
+    Send one request to a running service and wait for its response (plain sockets,
+    so the client needs neither asyncio nor qiskit). Raises RuntimeError on an error response.
+    """
+    if socket_path is not None:
+        connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        address = socket_path
+    else:
+        connection = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        address = (host, port)
+    connection.settimeout(timeout)
+    with connection:
+        connection.connect(address)
+        connection.sendall((json.dumps(request) + "\n").encode())
+        with connection.makefile("rb") as stream:
+            line = stream.readline()
+    if not line:
+        raise RuntimeError("The solver service closed the connection without answering.")
+    response = json.loads(line)
+    if not response.get("ok"):
+        raise RuntimeError(f"Solver service error: {response.get('error')}")
+    return response["result"]
+
+
+# --- "Testing Block" ---
+# This code runs only when this file is executed directly.
+if __name__ == "__main__":
+
+    print("\n---------------------------------------------------------")
+    print(">>> 'solver_service.py' was RUN DIRECTLY (Testing Mode) <<<")
+    print("---------------------------------------------------------")
+
+    import tempfile
+    import numpy as np
+    from concurrent.futures import ThreadPoolExecutor
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "solver.sock")
+        server = threading.Thread(target=serve, kwargs=dict(socket_path=path, max_workers=1,
+                                                            results_path=os.path.join(directory, "results.jsonl"),
+                                                            parameter_path=os.path.join(directory, "params.json")))
+        server.start()
+        while not os.path.exists(path):
+            time.sleep(0.1)
+        print(send_request({"op": "ping"}, socket_path=path))
+
+        rng = np.random.default_rng(0)
+        A = rng.normal(0.0, 0.1, (4, 4))
+        problem = {"op": "solve", "k": 2, "solver": "qaoa", "reps": 1, "seed": 1,
+                   "options": {"backend": "diagonal"},
+                   "mu": dict(zip(["AAPL", "GOOG", "MSFT", "AMZN"], rng.normal(0.1, 0.05, 4).tolist())),
+                   "sigma": (A @ A.T + 0.02 * np.eye(4)).tolist()}
+
+        # Concurrent requests (two different q values, asked twice each)
+        requests = [dict(problem, id=i, q=q) for i, q in enumerate([0.5, 2.0, 0.5, 2.0])]
+        start = time.time()
+        with ThreadPoolExecutor(max_workers=4) as clients:
+            answers = list(clients.map(lambda request: send_request(request, socket_path=path), requests))
+        for request, answer in zip(requests, answers):
+            print(f"q={request['q']}: {answer['selected_stocks']} cached={answer['cached']} "
+                  f"solve={answer['solve_seconds']:.3f}s")
+        print(f"4 requests answered in {time.time() - start:.2f}s")
+
+        # The repeats waited for the first solve instead of solving again
+        assert sum(answer["cached"] for answer in answers) == 2
+
+        # The same problem again is served from the results store
+        assert send_request(requests[0], socket_path=path)["cached"]
+
+        # The subspace backend needs k from the request
+        subspace = send_request(dict(problem, id=4, q=0.5, options={"backend": "subspace"}), socket_path=path)
+        assert len(subspace["selected_stocks"]) == 2
+        status = send_request({"op": "status"}, socket_path=path)
+        print(status)
+        assert status["solved"] == 3
+        send_request({"op": "shutdown"}, socket_path=path)
+        server.join()
+        assert os.path.exists(worker_parameter_path(os.path.join(directory, "params.json"), 0))
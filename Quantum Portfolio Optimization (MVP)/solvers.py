@@ -0,0 +1,46 @@
+"""
+Solver Registry (solvers.py)
+Its job is to let the pipeline pick HOW to solve the Ising Hamiltonian by name.
+
+Every solver takes the Hamiltonian from convert_to_ising (or convert_to_ising_direct)
+plus its own keyword options, and returns a result with 'eigenvalue', 'eigenstate',
+'best_measurement' and 'samples', so interpret_result / top_portfolios work for all of them.
+
+    "qaoa":      solve_with_qaoa (qaoa_solver.py)
+    "annealing": solve_with_annealing (classical_solvers.py)
+    "tabu":      solve_with_tabu (classical_solvers.py)
+"""
+
+# Step 1: Import necessary tools
+from typing import Callable
+
+from qiskit.quantum_info import SparsePauliOp
+
+# Names of the available solvers
+SOLVERS = ("qaoa", "annealing", "tabu")
+
+
+def get_solver(name: str) -> Callable:
+    """
+    Return the solve function for 'name'. Modules are imported only when asked for,
+    so the classical solvers never load qaoa_solver (Qiskit's QAOA, Aer and the
+    optimizers). They do still use qiskit itself, for SparsePauliOp and the result type.
+    """
+    if name == "qaoa":
+        from qaoa_solver import solve_with_qaoa
+        return solve_with_qaoa
+    if name == "annealing":
+        from classical_solvers import solve_with_annealing
+        return solve_with_annealing
+    if name == "tabu":
+        from classical_solvers import solve_with_tabu
+        return solve_with_tabu
+    raise ValueError(f"Unknown solver '{name}'. Choose one of {SOLVERS}.")
+
+
+def solve(hamiltonian: SparsePauliOp, solver: str = "qaoa", **options):
+    """
+    Solve the Ising Hamiltonian with the named solver; 'options' go to that solver
+    (e.g. reps / backend for "qaoa", num_sweeps for "annealing").
+    """
+    return get_solver(solver)(hamiltonian, **options)
@@ -0,0 +1,107 @@
+"""
+Synthetic Market (synthetic_market.py)
+Its job is to make realistic-looking, REPRODUCIBLE market data without the network.
+
+Daily log returns follow a factor model with a controllable correlation structure:
+
+    r_i = drift_i + vol_i * ( sqrt(a) * market + sqrt(b) * sector(i) + sqrt(1 - a - b) * noise_i )
+
+so two assets in the same sector have correlation a + b and assets in different
+sectors have correlation a (a = market_correlation, b = sector_correlation).
+The same seed always gives the same prices.
+"""
+
+# Step 1: Import necessary tools
+import numpy as np
+import pandas as pd
+from typing import List, Optional, Tuple
+
+from price_cache import PriceSource
+
+# Number of trading days used to annualize (same as data_pipeline.TRADING_DAYS)
+TRADING_DAYS = 252
+
+
+def synthetic_returns(n: int, days: int, num_sectors: int = 4, market_correlation: float = 0.2,
+                      sector_correlation: float = 0.3, volatility: Tuple[float, float] = (0.15, 0.45),
+                      annual_return: Tuple[float, float] = (-0.05, 0.25),
+                      seed: Optional[int] = None) -> np.ndarray:
+    """
+    (days x n) daily log returns from the factor model above. 'volatility' and
+    'annual_return' are the ranges the annualized per-asset values are drawn from.
+    """
+    if market_correlation < 0 or sector_correlation < 0 or market_correlation + sector_correlation > 1:
+        raise ValueError("Need market_correlation, sector_correlation >= 0 with a sum of at most 1.")
+
+    rng = np.random.default_rng(seed)
+    sector = np.arange(n) % max(1, num_sectors)
+    vol = rng.uniform(*volatility, n) / np.sqrt(TRADING_DAYS)
+    drift = rng.uniform(*annual_return, n) / TRADING_DAYS
+
+    market = rng.standard_normal((days, 1))
+    sectors = rng.standard_normal((days, max(1, num_sectors)))
+    noise = rng.standard_normal((days, n))
+    shocks = (np.sqrt(market_correlation) * market + np.sqrt(sector_correlation) * sectors[:, sector]
+              + np.sqrt(1.0 - market_correlation - sector_correlation) * noise)
+    return drift + vol * shocks
+
+
+def synthetic_prices(n: int, days: int = 3 * TRADING_DAYS, start_date: str = "2021-01-01",
+                     tickers: Optional[List[str]] = None, seed: Optional[int] = None, **options) -> pd.DataFrame:
+    """
+    (dates x tickers) price DataFrame starting at 100, on business days from 'start_date'.
+    'days' is the number of returns (so there are days + 1 price rows).
+    **options go to synthetic_returns (num_sectors, market_correlation, ...).
+    """
+    if tickers is None:
+        tickers = [f"SYN{i:03d}" for i in range(n)]
+    returns = synthetic_returns(n, days, seed=seed, **options)
+    log_prices = np.vstack([np.zeros(n), np.cumsum(returns, axis=0)])
+    return pd.DataFrame(100.0 * np.exp(log_prices), columns=list(tickers),
+                        index=pd.bdate_range(start_date, periods=days + 1))
+
+
+def synthetic_mu_sigma(n: int, days: int = 3 * TRADING_DAYS, seed: Optional[int] = None,
+                       **options) -> Tuple[pd.Series, pd.DataFrame]:
+    """mu and Σ estimated from synthetic prices, exactly as calculate_mu_and_sigma does."""
+    from data_pipeline import calculate_mu_and_sigma
+    return calculate_mu_and_sigma(synthetic_prices(n, days=days, seed=seed, **options))
+
+
+class SyntheticSource(PriceSource):
+    """
+    A PriceSource (price_cache.py) that makes up prices, so fetch_stock_data(...,
+    source=SyntheticSource(seed=1)) runs offline. The same tickers, dates and seed
+    always give the same prices.
+    """
+
+    def __init__(self, seed: Optional[int] = None, **options):
+        self.seed = seed
+        self.options = options
+
+    def fetch(self, tickers: List[str], start_date: str, end_date: str) -> pd.DataFrame:
+        # Business days in [start_date, end_date), like yf.download
+        dates = pd.bdate_range(start_date, end_date, inclusive="left")
+        if len(dates) < 2:
+            return pd.DataFrame()
+        return synthetic_prices(len(tickers), days=len(dates) - 1, start_date=start_date,
+                                tickers=tickers, seed=self.seed, **self.options)
+
+
+# --- "Testing Block" ---
+# This code runs only when this file is executed directly.
+if __name__ == "__main__":
+
+    print("\n---------------------------------------------------------")
+    print(">>> 'synthetic_market.py' was RUN DIRECTLY (Testing Mode) <<<")
+    print("---------------------------------------------------------")
+
+    prices = synthetic_prices(8, days=20 * TRADING_DAYS, num_sectors=2, market_correlation=0.2,
+                              sector_correlation=0.5, seed=3)
+    assert prices.equals(synthetic_prices(8, days=20 * TRADING_DAYS, num_sectors=2, market_correlation=0.2,
+                                          sector_correlation=0.5, seed=3))
+
+    # Same sector (0 and 2): about 0.7, different sectors (0 and 1): about 0.2
+    correlation = np.log(prices).diff().dropna().corr().values
+    print(f"Correlation same sector: {correlation[0, 2]:.3f}, different sectors: {correlation[0, 1]:.3f}")
+    assert abs(correlation[0, 2] - 0.7) < 0.05 and abs(correlation[0, 1] - 0.2) < 0.05